@@ -1,63 +1,167 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
-from backend.models.models import Base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from backend.database.fulltext import init_fulltext
+from backend.database.migrations import run_migrations
+from backend.services.metrics import instrument_engine
+import asyncio
 import os
 from dotenv import load_dotenv
 
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
 
+SQLITE_FALLBACK_URL = "sqlite:///./blog_agent.db"
+
+# Resolved by init_engines() at startup; importing this module does no IO
 DATABASE_URL = os.getenv("DATABASE_URL")
+engine = None
+async_engine = None
+
+# Session factories are bound to their engines once init_engines() has run.
+# Sync engine/session: migrations and scripts
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+# Async engine/session: used by the API routes so queries never block the event loop.
+# expire_on_commit=False: attributes stay readable after commit without lazy IO
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver (aiosqlite / asyncpg)"""
+    scheme, rest = url.split("://", 1)
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    if scheme.startswith("postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def pool_settings() -> dict:
+    """Connection pool options, configurable from the environment"""
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
 
-if not DATABASE_URL:
+
+def _sqlite_on_connect(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a writer holds the database
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}")
+    cursor.close()
+
+
+async def _postgres_url_if_reachable():
+    """Build the Postgres URL from POSTGRES_* settings and return it if a connection succeeds"""
     user = os.getenv("POSTGRES_USER", "postgres")
     pw = os.getenv("POSTGRES_PASSWORD", "Aqsa1052.")
     host = os.getenv("POSTGRES_HOST", "localhost")
     port = os.getenv("POSTGRES_PORT", "5432")
     db = os.getenv("POSTGRES_DB", "ai_blog_db")
-    
+    timeout = float(os.getenv("POSTGRES_CONNECT_TIMEOUT", "3"))
+
     pg_url = f"postgresql://{user}:{pw}@{host}:{port}/{db}"
-    
+    probe = create_async_engine(to_async_url(pg_url), connect_args={"timeout": timeout})
     try:
-        # Quick test connection
         print(f"Attempting to connect to Postgres at {host}...")
-        temp_engine = create_engine(pg_url, connect_args={'connect_timeout': 3})
-        with temp_engine.connect() as conn:
-            DATABASE_URL = pg_url
-            print("Postgres connection successful!")
+        async with probe.connect() as conn:
+            await asyncio.wait_for(conn.execute(text("SELECT 1")), timeout=timeout)
+        print("Postgres connection successful!")
+        return pg_url
     except Exception as e:
         print(f"Postgres failed: {e}. Switching to SQLite fallback.")
-        DATABASE_URL = "sqlite:///./blog_agent.db"
-
-# Engine configuration
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL, 
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool
-    )
-else:
-    engine = create_engine(DATABASE_URL)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def init_db():
-    """Initialize database tables and handle migrations"""
-    Base.metadata.create_all(bind=engine)
-    
-    # Force add image_url column if it's missing (Postgres specific)
+        return None
+    finally:
+        await probe.dispose()
+
+
+async def init_engines():
+    """Resolve the database URL, build both engines and bind the session factories"""
+    global DATABASE_URL, engine, async_engine
+    if engine is not None:
+        return
+
+    if not DATABASE_URL:
+        DATABASE_URL = await _postgres_url_if_reachable() or SQLITE_FALLBACK_URL
+
+    pool = pool_settings()
+    if DATABASE_URL.startswith("sqlite"):
+        # Each pooled connection is used by one thread at a time
+        engine = create_engine(
+            DATABASE_URL,
+            connect_args={"check_same_thread": False},
+            poolclass=QueuePool,
+            **pool,
+        )
+        async_engine = create_async_engine(
+            to_async_url(DATABASE_URL), poolclass=AsyncAdaptedQueuePool, **pool
+        )
+        event.listen(engine, "connect", _sqlite_on_connect)
+        event.listen(async_engine.sync_engine, "connect", _sqlite_on_connect)
+    else:
+        engine = create_engine(DATABASE_URL, **pool)
+        async_engine = create_async_engine(to_async_url(DATABASE_URL), **pool)
+
+    # API routes use the async engine; time their statements
+    instrument_engine(async_engine.sync_engine)
+
+    SessionLocal.configure(bind=engine)
+    AsyncSessionLocal.configure(bind=async_engine)
+
+
+def init_engines_sync():
+    """init_engines() for scripts and other code running outside an event loop"""
+    if engine is None:
+        asyncio.run(init_engines())
+
+
+async def check_db() -> bool:
+    """Async health check: True if the database answers a trivial query"""
+    if async_engine is None:
+        return False
     try:
-        from sqlalchemy import text
-        with engine.connect() as conn:
-            conn.execute(text("ALTER TABLE messages ADD COLUMN IF NOT EXISTS image_url TEXT"))
-            conn.commit()
-            # If sources column still exists, we can try to migrate data if needed in future
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return True
     except Exception as e:
-        print(f"Schema update note: {e}")
+        print(f"Database health check failed: {e}")
+        return False
+
+
+async def init_db():
+    """Build engines, apply pending schema migrations and enable optional features"""
+    await init_engines()
+    # Migrations use the sync engine; keep them off the event loop
+    await asyncio.to_thread(run_migrations, engine)
+    await asyncio.to_thread(init_fulltext, engine)
 
     print(f"Database tables initialized on {DATABASE_URL}")
 
-def get_db():
+
+async def dispose_engines():
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_sync_db():
+    # Scripts use this without the app's startup, so bind the engines on first use
+    init_engines_sync()
     db = SessionLocal()
     try:
         yield db
@@ -0,0 +1,282 @@
+"""
+Full-text search over blogs and messages.
+Uses FTS5 virtual tables on SQLite and tsvector columns with GIN indexes on
+Postgres. Index rows are written explicitly alongside the ORM writes so they
+share the caller's transaction.
+"""
+import re
+from typing import Any, Dict, Iterable, List
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+
+# Set by init_fulltext(); False means the dialect lacks support and search falls back to LIKE
+_fts_ready = False
+
+_PG_BLOG_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(topic, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+)
+_PG_MESSAGE_VECTOR = "to_tsvector('english', coalesce(content, ''))"
+# Same vectors built from bound values, for rows whose pending changes may not be flushed yet
+_PG_BLOG_VECTOR_PARAMS = (
+    "setweight(to_tsvector('english', CAST(:topic AS text)), 'A') || "
+    "setweight(to_tsvector('english', CAST(:content AS text)), 'B')"
+)
+_PG_MESSAGE_VECTOR_PARAMS = "to_tsvector('english', CAST(:content AS text))"
+
+
+def _dialect(db_or_engine) -> str:
+    bind = db_or_engine.get_bind() if isinstance(db_or_engine, Session) else db_or_engine
+    return bind.dialect.name
+
+
+def create_fulltext(conn):
+    """
+    Create the search structures and index rows written before they existed.
+    Run once by the schema migrations.
+    """
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS blogs_fts "
+            "USING fts5(topic, content, tokenize='porter unicode61')"
+        ))
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts "
+            "USING fts5(content, tokenize='porter unicode61')"
+        ))
+        conn.execute(text(
+            "INSERT INTO blogs_fts (rowid, topic, content) "
+            "SELECT id, topic, content FROM blogs "
+            "WHERE id NOT IN (SELECT rowid FROM blogs_fts)"
+        ))
+        conn.execute(text(
+            "INSERT INTO messages_fts (rowid, content) "
+            "SELECT id, content FROM messages "
+            "WHERE id NOT IN (SELECT rowid FROM messages_fts)"
+        ))
+    elif dialect == "postgresql":
+        conn.execute(text("ALTER TABLE blogs ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+        conn.execute(text("ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_blogs_search_vector ON blogs USING GIN (search_vector)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_messages_search_vector ON messages USING GIN (search_vector)"
+        ))
+        conn.execute(text(
+            f"UPDATE blogs SET search_vector = {_PG_BLOG_VECTOR} WHERE search_vector IS NULL"
+        ))
+        conn.execute(text(
+            f"UPDATE messages SET search_vector = {_PG_MESSAGE_VECTOR} WHERE search_vector IS NULL"
+        ))
+
+
+def init_fulltext(engine):
+    """Enable full-text search if its structures exist (read-only check, no DDL)"""
+    global _fts_ready
+    dialect = _dialect(engine)
+    try:
+        with engine.connect() as conn:
+            if dialect == "sqlite":
+                found = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'blogs_fts'"
+                )).first()
+            elif dialect == "postgresql":
+                found = conn.execute(text(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'blogs' AND column_name = 'search_vector'"
+                )).first()
+            else:
+                found = None
+        _fts_ready = found is not None
+    except Exception as e:
+        print(f"Full-text search check note: {e}")
+        _fts_ready = False
+    print(f"Full-text search {'ready' if _fts_ready else 'unavailable, using LIKE fallback'} ({dialect})")
+
+
+def index_blog(db: Session, blog_id: int, topic: str, content: str):
+    """(Re)index one blog inside the caller's transaction"""
+    if not _fts_ready:
+        return
+    if _dialect(db) == "sqlite":
+        db.execute(text("DELETE FROM blogs_fts WHERE rowid = :id"), {"id": blog_id})
+        db.execute(
+            text("INSERT INTO blogs_fts (rowid, topic, content) VALUES (:id, :topic, :content)"),
+            {"id": blog_id, "topic": topic, "content": content},
+        )
+    else:
+        db.execute(
+            text(f"UPDATE blogs SET search_vector = {_PG_BLOG_VECTOR_PARAMS} WHERE id = :id"),
+            {"id": blog_id, "topic": topic or "", "content": content or ""},
+        )
+
+
+def index_message(db: Session, message_id: int, content: str):
+    """(Re)index one message inside the caller's transaction"""
+    if not _fts_ready:
+        return
+    if _dialect(db) == "sqlite":
+        db.execute(text("DELETE FROM messages_fts WHERE rowid = :id"), {"id": message_id})
+        db.execute(
+            text("INSERT INTO messages_fts (rowid, content) VALUES (:id, :content)"),
+            {"id": message_id, "content": content},
+        )
+    else:
+        db.execute(
+            text(f"UPDATE messages SET search_vector = {_PG_MESSAGE_VECTOR_PARAMS} WHERE id = :id"),
+            {"id": message_id, "content": content or ""},
+        )
+
+
+def unindex(db: Session, table: str, ids: Iterable[int]):
+    """Drop index rows for deleted blogs/messages (Postgres vectors go with their rows)"""
+    ids = list(ids)
+    if not _fts_ready or not ids or _dialect(db) != "sqlite":
+        return
+    fts_table = {"blogs": "blogs_fts", "messages": "messages_fts"}[table]
+    params = {f"id{i}": row_id for i, row_id in enumerate(ids)}
+    placeholders = ", ".join(f":{key}" for key in params)
+    db.execute(text(f"DELETE FROM {fts_table} WHERE rowid IN ({placeholders})"), params)
+
+
+def _terms(query: str) -> List[str]:
+    return re.findall(r"\w+", query.lower())
+
+
+def _fts5_query(query: str) -> str:
+    """Quote every term so user input can't inject FTS5 syntax; last term matches as a prefix"""
+    terms = _terms(query)
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _python_snippet(content: str, terms: List[str], width: int = 160) -> str:
+    lower = content.lower()
+    positions = [lower.find(term) for term in terms if lower.find(term) >= 0]
+    start = max(min(positions) - width // 3, 0) if positions else 0
+    snippet = content[start:start + width]
+    for term in terms:
+        snippet = re.sub(
+            f"({re.escape(term)})", f"{HIGHLIGHT_START}\\1{HIGHLIGHT_END}", snippet, flags=re.IGNORECASE
+        )
+    return ("..." if start else "") + snippet + ("..." if start + width < len(content) else "")
+
+
+def search_blogs(db: Session, query: str, user_id: int, limit: int, offset: int) -> List[Dict[str, Any]]:
+    """Ranked blog matches with a highlighted snippet, best first"""
+    columns = "b.id, b.topic, b.excerpt, b.word_count, b.image_url, b.image_variants, b.timestamp"
+    params = {"user_id": user_id, "limit": limit, "offset": offset}
+
+    if _fts_ready and _dialect(db) == "sqlite":
+        match = _fts5_query(query)
+        if not match:
+            return []
+        rows = db.execute(text(
+            f"SELECT {columns}, "
+            f"snippet(blogs_fts, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '...', 24) AS snippet, "
+            "bm25(blogs_fts, 10.0, 1.0) AS rank "
+            "FROM blogs_fts JOIN blogs b ON b.id = blogs_fts.rowid "
+            "WHERE blogs_fts MATCH :match AND b.user_id = :user_id "
+            "ORDER BY rank LIMIT :limit OFFSET :offset"
+        ), {**params, "match": match})
+        return [dict(row._mapping) for row in rows]
+
+    if _fts_ready:
+        # Rank first, then build headlines only for the rows on this page
+        rows = db.execute(text(
+            "WITH q AS (SELECT websearch_to_tsquery('english', :query) AS query), "
+            "hits AS ("
+            "  SELECT b.id, ts_rank_cd(b.search_vector, q.query) AS rank FROM blogs b, q "
+            "  WHERE b.user_id = :user_id AND b.search_vector @@ q.query "
+            "  ORDER BY rank DESC, b.id DESC LIMIT :limit OFFSET :offset"
+            ") "
+            f"SELECT {columns}, "
+            "ts_headline('english', b.content, q.query, "
+            f"'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=24, MinWords=8') AS snippet, "
+            "hits.rank FROM hits JOIN blogs b ON b.id = hits.id, q "
+            "ORDER BY hits.rank DESC, b.id DESC"
+        ), {**params, "query": query})
+        return [dict(row._mapping) for row in rows]
+
+    # LIKE fallback: unranked, newest first
+    terms = _terms(query)
+    if not terms:
+        return []
+    conditions = " AND ".join(
+        f"(lower(b.topic) LIKE :t{i} OR lower(b.content) LIKE :t{i})" for i in range(len(terms))
+    )
+    term_params = {f"t{i}": f"%{term}%" for i, term in enumerate(terms)}
+    rows = db.execute(text(
+        f"SELECT {columns}, b.content FROM blogs b WHERE b.user_id = :user_id AND {conditions} "
+        "ORDER BY b.timestamp DESC, b.id DESC LIMIT :limit OFFSET :offset"
+    ), {**params, **term_params})
+    results = []
+    for row in rows:
+        item = dict(row._mapping)
+        item["snippet"] = _python_snippet(item.pop("content"), terms)
+        item["rank"] = None
+        results.append(item)
+    return results
+
+
+def search_messages(db: Session, query: str, user_id: int, limit: int, offset: int) -> List[Dict[str, Any]]:
+    """Ranked message matches across the user's chats with a highlighted snippet"""
+    columns = "m.id, m.chat_id, m.role, m.created_at"
+    params = {"user_id": user_id, "limit": limit, "offset": offset}
+    joins = "JOIN chats c ON c.id = m.chat_id"
+
+    if _fts_ready and _dialect(db) == "sqlite":
+        match = _fts5_query(query)
+        if not match:
+            return []
+        rows = db.execute(text(
+            f"SELECT {columns}, "
+            f"snippet(messages_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '...', 24) AS snippet, "
+            "bm25(messages_fts) AS rank "
+            f"FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid {joins} "
+            "WHERE messages_fts MATCH :match AND c.user_id = :user_id "
+            "ORDER BY rank LIMIT :limit OFFSET :offset"
+        ), {**params, "match": match})
+        return [dict(row._mapping) for row in rows]
+
+    if _fts_ready:
+        rows = db.execute(text(
+            "WITH q AS (SELECT websearch_to_tsquery('english', :query) AS query), "
+            "hits AS ("
+            f"  SELECT m.id, ts_rank_cd(m.search_vector, q.query) AS rank FROM messages m {joins}, q "
+            "  WHERE c.user_id = :user_id AND m.search_vector @@ q.query "
+            "  ORDER BY rank DESC, m.id DESC LIMIT :limit OFFSET :offset"
+            ") "
+            f"SELECT {columns}, "
+            "ts_headline('english', m.content, q.query, "
+            f"'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=24, MinWords=8') AS snippet, "
+            "hits.rank FROM hits JOIN messages m ON m.id = hits.id, q "
+            "ORDER BY hits.rank DESC, m.id DESC"
+        ), {**params, "query": query})
+        return [dict(row._mapping) for row in rows]
+
+    terms = _terms(query)
+    if not terms:
+        return []
+    conditions = " AND ".join(f"lower(m.content) LIKE :t{i}" for i in range(len(terms)))
+    term_params = {f"t{i}": f"%{term}%" for i, term in enumerate(terms)}
+    rows = db.execute(text(
+        f"SELECT {columns}, m.content FROM messages m {joins} "
+        f"WHERE c.user_id = :user_id AND {conditions} "
+        "ORDER BY m.created_at DESC, m.id DESC LIMIT :limit OFFSET :offset"
+    ), {**params, **term_params})
+    results = []
+    for row in rows:
+        item = dict(row._mapping)
+        item["snippet"] = _python_snippet(item.pop("content"), terms)
+        item["rank"] = None
+        results.append(item)
+    return results
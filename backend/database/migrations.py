@@ -0,0 +1,196 @@
+"""
+Versioned schema migrations.
+Each migration runs once, in its own transaction, and is recorded in the
+schema_migrations table. Works on both SQLite and Postgres; when every
+version is already applied, startup performs no DDL at all.
+"""
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text, inspect, text
+from backend.models.models import Blog, GenerationBatch, GenerationCacheEntry
+from backend.database.fulltext import create_fulltext
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable
+
+
+def _add_column_if_missing(conn, table: str, column: str, ddl_type: str):
+    columns = {col["name"] for col in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+
+# Schema as it stood when migrations were introduced. Frozen: later changes belong in
+# new migrations, never here, so every database walks through the same steps.
+_initial_metadata = MetaData()
+
+Table(
+    "users", _initial_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String(100), unique=True, nullable=False),
+    Column("email", String(100), unique=True, nullable=False),
+    Column("created_at", DateTime),
+)
+Table(
+    "chats", _initial_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("title", String(200), nullable=False),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+)
+Table(
+    "messages", _initial_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("chat_id", Integer, ForeignKey("chats.id"), nullable=False),
+    Column("role", String(20), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("image_url", Text, nullable=True),
+    Column("created_at", DateTime),
+)
+Table(
+    "blogs", _initial_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("chat_id", Integer, ForeignKey("chats.id"), nullable=True),
+    Column("topic", String(500), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("timestamp", DateTime),
+)
+Table(
+    "generation_jobs", _initial_metadata,
+    Column("id", String(36), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("chat_id", Integer, nullable=True),
+    Column("topic", String(500), nullable=False),
+    Column("status", String(20), nullable=False),
+    Column("stage", String(50), nullable=True),
+    Column("progress", Integer, nullable=False),
+    Column("blog_id", Integer, nullable=True),
+    Column("assistant_message_id", Integer, nullable=True),
+    Column("image_url", Text, nullable=True),
+    Column("error", Text, nullable=True),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+)
+
+
+def _initial_schema(conn):
+    # Creates only missing tables, so it is safe on databases that predate migrations
+    _initial_metadata.create_all(bind=conn)
+
+
+def _media_and_summary_columns(conn):
+    _add_column_if_missing(conn, "messages", "image_url", "TEXT")
+    _add_column_if_missing(conn, "messages", "image_variants", "TEXT")
+    _add_column_if_missing(conn, "blogs", "image_url", "TEXT")
+    _add_column_if_missing(conn, "blogs", "image_variants", "TEXT")
+    _add_column_if_missing(conn, "blogs", "excerpt", "VARCHAR(300)")
+    _add_column_if_missing(conn, "blogs", "word_count", "INTEGER")
+
+
+def _backfill_blog_summaries(conn):
+    """Fill excerpt/word_count for blogs written before those columns existed"""
+    rows = conn.execute(text("SELECT id, content FROM blogs WHERE word_count IS NULL")).fetchall()
+    for row_id, content in rows:
+        conn.execute(
+            text("UPDATE blogs SET excerpt = :excerpt, word_count = :word_count WHERE id = :id"),
+            {"id": row_id, **Blog.summary_fields(content)},
+        )
+
+
+def _hot_path_indexes(conn):
+    # Composite indexes matching the list queries' filter + sort order
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_messages_chat_id_created_at ON messages (chat_id, created_at)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_blogs_user_id_timestamp ON blogs (user_id, timestamp, id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_blogs_chat_id ON blogs (chat_id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_chats_user_id_updated_at ON chats (user_id, updated_at, id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_generation_jobs_status_created_at "
+        "ON generation_jobs (status, created_at)"
+    ))
+
+
+def _generation_batches(conn):
+    GenerationBatch.__table__.create(bind=conn, checkfirst=True)
+    _add_column_if_missing(conn, "generation_jobs", "batch_id", "VARCHAR(36) REFERENCES generation_batches (id)")
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_generation_jobs_batch_id ON generation_jobs (batch_id)"
+    ))
+
+
+def _generation_cache(conn):
+    # create() also builds the table's indexes
+    GenerationCacheEntry.__table__.create(bind=conn, checkfirst=True)
+    _add_column_if_missing(conn, "generation_batches", "use_cache", "BOOLEAN NOT NULL DEFAULT TRUE")
+    _add_column_if_missing(conn, "generation_batches", "refresh", "BOOLEAN NOT NULL DEFAULT FALSE")
+
+
+def _generation_job_options(conn):
+    _add_column_if_missing(conn, "generation_jobs", "use_cache", "BOOLEAN NOT NULL DEFAULT TRUE")
+    _add_column_if_missing(conn, "generation_jobs", "refresh", "BOOLEAN NOT NULL DEFAULT FALSE")
+    _add_column_if_missing(conn, "generation_jobs", "polish", "BOOLEAN NOT NULL DEFAULT TRUE")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "initial schema", _initial_schema),
+    Migration(2, "image and blog summary columns", _media_and_summary_columns),
+    Migration(3, "backfill blog excerpts and word counts", _backfill_blog_summaries),
+    Migration(4, "full-text search structures", create_fulltext),
+    Migration(5, "hot-path composite indexes", _hot_path_indexes),
+    Migration(6, "generation batches", _generation_batches),
+    Migration(7, "generation result cache", _generation_cache),
+    Migration(8, "generation job cache and polish options", _generation_job_options),
+]
+
+LATEST_VERSION = max(m.version for m in MIGRATIONS)
+
+
+def _applied_versions(engine) -> set:
+    with engine.connect() as conn:
+        if not inspect(conn).has_table("schema_migrations"):
+            return set()
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def run_migrations(engine):
+    """Apply pending migrations in order; a no-op (and DDL-free) when the schema is current"""
+    applied = _applied_versions(engine)
+    pending = [m for m in MIGRATIONS if m.version not in applied]
+    if not pending:
+        print(f"Database schema is current (version {LATEST_VERSION})")
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, description VARCHAR(200) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+
+    for migration in pending:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Serialize concurrent workers; released at the end of the transaction
+                conn.execute(text("SELECT pg_advisory_xact_lock(4815162342)"))
+            already = conn.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :v"), {"v": migration.version}
+            ).first()
+            if already:
+                continue
+            print(f"Applying migration {migration.version}: {migration.description}")
+            migration.upgrade(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": migration.version, "d": migration.description, "t": datetime.utcnow()},
+            )
@@ -6,12 +6,15 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if BASE_DIR not in sys.path:
     sys.path.append(BASE_DIR)
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from backend.routes.api import router as api_router
-from backend.database.database import init_db
+from backend.routes.api import router as api_router, start_job_queue, stop_job_queue
+from backend.database.database import init_db, dispose_engines
+from backend.services.http_transport import get_http_transport
+from backend.services.image_service import ImageService
+from backend.services.metrics import MetricsMiddleware, render_metrics
 
 app = FastAPI(title="AI Blog Generation Agent", version="1.0.0")
 
@@ -24,6 +27,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency by route for /metrics
+app.add_middleware(MetricsMiddleware)
+
 
 # Initialize database on startup
 @app.on_event("startup")
@@ -31,17 +37,38 @@ async def startup_event():
     print("Starting AI Blog Generation Agent...")
     try:
         print("Checking database connection...")
-        init_db()
+        await init_db()
         print("Database initialized successfully!")
     except Exception as e:
         print(f"DATABASE ERROR ON STARTUP: {str(e)}")
         print("Continuing without DB for now (Frontend should still load)...")
+    await get_http_transport().start()
+    try:
+        await start_job_queue()
+    except Exception as e:
+        print(f"JOB QUEUE ERROR ON STARTUP: {str(e)}")
     print("Backend is ready and listening on port 8000")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_job_queue()
+    await get_http_transport().close()
+    ImageService.shutdown_pool()
+    await dispose_engines()
+
+
 # Include API routes
 app.include_router(api_router, prefix="/api", tags=["API"])
 
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+
 # Serve static files
 app.mount(
     "/static",
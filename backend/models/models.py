@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
+import re
 
 Base = declarative_base()
 
@@ -32,6 +33,8 @@ class Chat(Base):
         "Message", back_populates="chat", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (Index("ix_chats_user_id_updated_at", "user_id", "updated_at", "id"),)
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -41,10 +44,13 @@ class Message(Base):
     role = Column(String(20), nullable=False)  # 'user' or 'assistant'
     content = Column(Text, nullable=False)
     image_url = Column(Text, nullable=True)
+    image_variants = Column(Text, nullable=True)  # JSON: {variant: {format: url}}
     created_at = Column(DateTime, default=datetime.utcnow)
 
     chat = relationship("Chat", back_populates="messages")
 
+    __table_args__ = (Index("ix_messages_chat_id_created_at", "chat_id", "created_at"),)
+
 
 class Blog(Base):
     __tablename__ = "blogs"
@@ -54,6 +60,92 @@ class Blog(Base):
     chat_id = Column(Integer, ForeignKey("chats.id"), nullable=True)
     topic = Column(String(500), nullable=False)
     content = Column(Text, nullable=False)
+    # Denormalized so list views never have to load `content`
+    excerpt = Column(String(300), nullable=True)
+    word_count = Column(Integer, nullable=True)
+    image_url = Column(Text, nullable=True)
+    image_variants = Column(Text, nullable=True)  # JSON: {variant: {format: url}}
     timestamp = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="blogs")
+
+    __table_args__ = (
+        Index("ix_blogs_user_id_timestamp", "user_id", "timestamp", "id"),
+        Index("ix_blogs_chat_id", "chat_id"),
+    )
+
+    @staticmethod
+    def summary_fields(content: str) -> dict:
+        """Excerpt (markdown stripped) and word count derived from blog content"""
+        plain = " ".join(re.sub(r"[#*_>`\[\]]", "", content or "").split())
+        excerpt = plain if len(plain) <= 280 else plain[:280].rsplit(" ", 1)[0] + "..."
+        return {"excerpt": excerpt, "word_count": len((content or "").split())}
+
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    id = Column(String(36), primary_key=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Set for items of a batch; those are run by the batch runner, not the job queue
+    batch_id = Column(String(36), ForeignKey("generation_batches.id"), nullable=True)
+    # Plain ids (no FK) so deleting a chat doesn't fail on its job history
+    chat_id = Column(Integer, nullable=True)
+    topic = Column(String(500), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued/running/succeeded/failed
+    stage = Column(String(50), nullable=True)
+    progress = Column(Integer, nullable=False, default=0)
+    blog_id = Column(Integer, nullable=True)
+    assistant_message_id = Column(Integer, nullable=True)
+    image_url = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    # Generation options from the request (same meaning as on /generate-blog)
+    use_cache = Column(Boolean, nullable=False, default=True)
+    refresh = Column(Boolean, nullable=False, default=False)
+    polish = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_generation_jobs_status_created_at", "status", "created_at"),
+        Index("ix_generation_jobs_batch_id", "batch_id"),
+    )
+
+
+class GenerationBatch(Base):
+    __tablename__ = "generation_batches"
+
+    id = Column(String(36), primary_key=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued/running/completed/failed
+    total = Column(Integer, nullable=False, default=0)
+    succeeded = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    concurrency = Column(Integer, nullable=False)
+    rate_per_minute = Column(Integer, nullable=False, default=0)  # 0 = unlimited
+    use_cache = Column(Boolean, nullable=False, default=True)
+    refresh = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (Index("ix_generation_batches_status_created_at", "status", "created_at"),)
+
+
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+
+    # sha256 of normalized topic + model + prompt version
+    key = Column(String(64), primary_key=True)
+    topic = Column(String(500), nullable=False)
+    model = Column(String(100), nullable=False)
+    prompt_version = Column(String(32), nullable=False)
+    result = Column(Text, nullable=False)  # JSON of the generation result
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_generation_cache_expires_at", "expires_at"),
+        Index("ix_generation_cache_last_used_at", "last_used_at"),
+    )
@@ -1,12 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from pydantic import BaseModel
-from backend.database.database import get_db
-from backend.models.models import User, Chat, Message, Blog
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import BaseModel, field_validator, computed_field
+from backend.database.database import get_db, AsyncSessionLocal, check_db
+from backend.database import fulltext
+from backend.models.models import User, Chat, Message, Blog, GenerationJob, GenerationBatch
 from backend.services.search_service import WebSearchService
 from backend.services.ai_agent import GeminiAgent
-from datetime import datetime
+from backend.services.search_cache import get_search_cache
+from backend.services.job_queue import get_job_queue, QueueFullError
+from backend.services.batch_service import BatchGenerator
+from backend.services.generation_cache import get_generation_cache
+from backend.services.llm_resilience import get_llm_guard
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import re
+import time
+import uuid
 
 # from backend.services.openai_agent import OpenAIBlogAgent
 
@@ -16,6 +36,7 @@ router = APIRouter()
 # Initialize services
 search_service = WebSearchService()
 ai_agent = GeminiAgent()
+generation_cache = get_generation_cache()
 
 
 # Pydantic models for request/response
@@ -23,24 +44,51 @@ class TopicRequest(BaseModel):
     topic: str
     user_id: int = 1
     chat_id: Optional[int] = None
+    use_cache: bool = True  # False: neither read nor write the generation cache
+    refresh: bool = False  # True: regenerate and overwrite the cached result
+    polish: bool = True  # False: return the agent's draft without the polish pass
 
 
 class ChatResponse(BaseModel):
     id: int
     title: str
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class ChatPage(BaseModel):
+    items: List[ChatResponse]
+    next_cursor: Optional[str] = None
+
+
+def _parse_variants(value: Any) -> Optional[Dict[str, Dict[str, str]]]:
+    """image_variants is stored as a JSON string"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+
+def _pick_variant(variants: Optional[Dict[str, Dict[str, str]]], name: str) -> Optional[str]:
+    formats = (variants or {}).get(name) or {}
+    return formats.get("webp") or formats.get("jpeg")
+
+
 class MessageResponse(BaseModel):
     id: int
     role: str
     content: str
     image_url: Optional[str] = None
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
     created_at: datetime
 
+    _parse_image_variants = field_validator("image_variants", mode="before")(_parse_variants)
+
     class Config:
         from_attributes = True
 
@@ -49,172 +97,1109 @@ class BlogResponse(BaseModel):
     id: int
     topic: str
     content: str
+    image_url: Optional[str] = None
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
+    timestamp: datetime
+
+    _parse_image_variants = field_validator("image_variants", mode="before")(_parse_variants)
+
+    @computed_field
+    @property
+    def thumbnail_url(self) -> Optional[str]:
+        return _pick_variant(self.image_variants, "thumbnail") or self.image_url
+
+    class Config:
+        from_attributes = True
+
+
+class BlogSummary(BaseModel):
+    id: int
+    topic: str
+    excerpt: Optional[str] = None
+    word_count: Optional[int] = None
+    image_url: Optional[str] = None
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
     timestamp: datetime
 
+    _parse_image_variants = field_validator("image_variants", mode="before")(_parse_variants)
+
+    @computed_field
+    @property
+    def thumbnail_url(self) -> Optional[str]:
+        return _pick_variant(self.image_variants, "thumbnail") or self.image_url
+
     class Config:
         from_attributes = True
 
 
+# Columns selected for summary views; `content` is deliberately absent
+BLOG_SUMMARY_COLUMNS = (
+    Blog.id,
+    Blog.topic,
+    Blog.excerpt,
+    Blog.word_count,
+    Blog.image_url,
+    Blog.image_variants,
+    Blog.timestamp,
+)
+
+
+class BlogSummaryPage(BaseModel):
+    items: List[BlogSummary]
+    next_cursor: Optional[str] = None
+
+
+def _encode_cursor(sort_value: datetime, row_id: int) -> str:
+    raw = f"{sort_value.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    """Inverse of _encode_cursor; returns (datetime, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _keyset_page(
+    db: AsyncSession, stmt, sort_column, id_column, cursor: Optional[str], limit: int, scalars: bool = False
+):
+    """
+    Apply keyset pagination (newest first) on (sort_column, id_column).
+    Returns (rows, next_cursor); rows are ORM objects when `scalars` is set.
+    """
+    if cursor:
+        sort_value, row_id = _decode_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, id_column < row_id),
+            )
+        )
+    result = await db.execute(stmt.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1))
+    rows = result.scalars().all() if scalars else result.all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
+
+
+def _insert_for(db: AsyncSession, model):
+    """Dialect-specific INSERT construct (supports ON CONFLICT) for the session's database"""
+    if db.get_bind().dialect.name == "postgresql":
+        return pg_insert(model)
+    return sqlite_insert(model)
+
+
+async def _ensure_user(db: AsyncSession, user_id: int):
+    """Create the user row if it doesn't exist yet, inside the caller's transaction"""
+    await db.execute(
+        _insert_for(db, User)
+        .values(
+            id=user_id,
+            username=f"user_{user_id}",
+            email=f"user{user_id}@example.com",
+        )
+        .on_conflict_do_nothing()
+    )
+
+
+async def _ensure_user_and_chat(db: AsyncSession, request: TopicRequest):
+    """
+    Upsert the requesting user and resolve the chat, inside the caller's transaction.
+    An existing chat is touched (updated_at) so it sorts first; otherwise a new one
+    is inserted. Returns (user_id, chat_id).
+    """
+    await _ensure_user(db, request.user_id)
+
+    chat_id = None
+    if request.chat_id:
+        result = await db.execute(
+            update(Chat)
+            .where(Chat.id == request.chat_id)
+            .values(updated_at=datetime.utcnow())
+            .returning(Chat.id)
+        )
+        chat_id = result.scalar()
+    if chat_id is None:
+        result = await db.execute(
+            insert(Chat)
+            .values(user_id=request.user_id, title=request.topic[:100])
+            .returning(Chat.id)
+        )
+        chat_id = result.scalar_one()
+
+    return request.user_id, chat_id
+
+
+def _user_prompt(topic: str) -> str:
+    return f"Generate a blog about: {topic}"
+
+
+async def _add_user_message(db: AsyncSession, chat_id: int, topic: str) -> int:
+    """Insert the user's prompt message (committed by the caller); returns its id"""
+    content = _user_prompt(topic)
+    result = await db.execute(
+        insert(Message).values(chat_id=chat_id, role="user", content=content).returning(Message.id)
+    )
+    message_id = result.scalar_one()
+    await db.run_sync(fulltext.index_message, message_id, content)
+    return message_id
+
+
+def _index_generations(sync_db, blogs: List[Dict[str, Any]], messages: List[Dict[str, Any]]):
+    for blog in blogs:
+        fulltext.index_blog(sync_db, blog["id"], blog["topic"], blog["content"])
+    for message in messages:
+        fulltext.index_message(sync_db, message["id"], message["content"])
+
+
+async def _save_generations(
+    db: AsyncSession,
+    user_id: int,
+    entries: List[Tuple[int, str, dict]],
+    include_user_message: bool = False,
+) -> List[Dict[str, int]]:
+    """
+    Bulk-insert blogs and their chat messages for (chat_id, topic, ai_result)
+    entries: one multi-row INSERT ... RETURNING per table, in the caller's
+    transaction (the caller commits). Returns the new row ids per entry.
+    """
+    blogs = []
+    messages = []
+    for chat_id, topic, ai_result in entries:
+        blog_content = ai_result["blog_content"]
+        image_url = ai_result.get("image_url")
+        image_variants = json.dumps(ai_result["image_variants"]) if ai_result.get("image_variants") else None
+        blogs.append({
+            "user_id": user_id,
+            "chat_id": chat_id,
+            "topic": topic,
+            "content": blog_content,
+            "image_url": image_url,
+            "image_variants": image_variants,
+            **Blog.summary_fields(blog_content),
+        })
+        if include_user_message:
+            messages.append({"chat_id": chat_id, "role": "user", "content": _user_prompt(topic),
+                             "image_url": None, "image_variants": None})
+        messages.append({"chat_id": chat_id, "role": "assistant", "content": blog_content,
+                         "image_url": image_url, "image_variants": image_variants})
+
+    result = await db.execute(insert(Blog).returning(Blog.id, sort_by_parameter_order=True), blogs)
+    for blog, blog_id in zip(blogs, result.scalars().all()):
+        blog["id"] = blog_id
+    result = await db.execute(insert(Message).returning(Message.id, sort_by_parameter_order=True), messages)
+    for message, message_id in zip(messages, result.scalars().all()):
+        message["id"] = message_id
+
+    await db.run_sync(_index_generations, blogs, messages)
+
+    per_entry = 2 if include_user_message else 1
+    saved = []
+    for i, blog in enumerate(blogs):
+        ids = {"blog_id": blog["id"], "assistant_message_id": messages[i * per_entry + per_entry - 1]["id"]}
+        if include_user_message:
+            ids["user_message_id"] = messages[i * per_entry]["id"]
+        saved.append(ids)
+    print(f"Saved {len(saved)} blogs to DB (IDs: {[ids['blog_id'] for ids in saved]})")
+    return saved
+
+
+async def _save_generation(
+    db: AsyncSession,
+    user_id: int,
+    chat_id: int,
+    topic: str,
+    ai_result: dict,
+    include_user_message: bool = False,
+) -> Dict[str, int]:
+    """Insert one blog and its chat messages (the caller commits); returns the new row ids"""
+    saved = await _save_generations(db, user_id, [(chat_id, topic, ai_result)], include_user_message)
+    return saved[0]
+
+
+async def _persist_generation(db: AsyncSession, request: TopicRequest, ai_result: dict) -> Dict[str, int]:
+    """Write user, chat, prompt, blog and reply in a single transaction"""
+    try:
+        user_id, chat_id = await _ensure_user_and_chat(db, request)
+        ids = await _save_generation(
+            db, user_id, chat_id, request.topic, ai_result, include_user_message=True
+        )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return {"chat_id": chat_id, **ids}
+
+
 @router.post("/generate-blog")
-async def generate_blog(request: TopicRequest, db: Session = Depends(get_db)):
+async def generate_blog(request: TopicRequest, db: AsyncSession = Depends(get_db)):
     """
     Main endpoint to generate blog:
     1. Perform web searches
     2. Summarize results
     3. Generate blog with AI
-    4. Save to database
+    4. Save to database in one transaction
+
+    The session is untouched until step 4, so no pooled connection is held
+    while the model runs.
     """
     try:
-        # Step 1: Get or create user
-        user = db.query(User).filter(User.id == request.user_id).first()
-        if not user:
-            user = User(
-                id=request.user_id,
-                username=f"user_{request.user_id}",
-                email=f"user{request.user_id}@example.com",
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-
-        # Step 2: Get or Create chat
-        if request.chat_id:
-            chat = db.query(Chat).filter(Chat.id == request.chat_id).first()
-            if not chat:
-                chat = Chat(user_id=user.id, title=request.topic[:100])
-                db.add(chat)
-                db.commit()
-                db.refresh(chat)
-        else:
-            chat = Chat(user_id=user.id, title=request.topic[:100])
-            db.add(chat)
-            db.commit()
-            db.refresh(chat)
-
-        # Step 3: Save user message
-        user_message = Message(
-            chat_id=chat.id,
-            role="user",
-            content=f"Generate a blog about: {request.topic}",
+        # Step 1-3: Process with AI Agent (Matched with SDK Pattern)
+        print(f"Generating blog with AI Agent SDK...")
+        ai_result = await generation_cache.generate(
+            ai_agent, request.topic, use_cache=request.use_cache, refresh=request.refresh, polish=request.polish
         )
-        db.add(user_message)
-        db.commit()
 
-        # Step 4: Process with AI Agent (Matched with SDK Pattern)
-        print(f"Generating blog with AI Agent SDK...")
-        ai_result = await ai_agent.process_topic(request.topic)
+        if ai_result.get("retry_after") is not None:
+            # Gemini is over quota or down: don't store an error as the blog
+            raise HTTPException(
+                status_code=503,
+                detail=ai_result["error"],
+                headers={"Retry-After": str(math.ceil(ai_result["retry_after"]))},
+            )
 
         blog_content = ai_result["blog_content"]
 
-        # Step 6: Save blog to database
-        blog = Blog(
-            user_id=user.id, chat_id=chat.id, topic=request.topic, content=blog_content
-        )
-        db.add(blog)
-
-        # Step 7: Save assistant message
-        assistant_message = Message(
-            chat_id=chat.id, 
-            role="assistant", 
-            content=blog_content,
-            image_url=ai_result.get("image_url")
-        )
-        db.add(assistant_message)
+        # Step 4: Save user, chat, messages and blog
+        ids = await _persist_generation(db, request, ai_result)
 
-        db.commit()
-        db.refresh(blog)
-
-        print(f"Blog saved to DB with ID: {blog.id}")
         print(f"Blog generated successfully!")
 
         return {
             "success": True,
-            "chat_id": chat.id,
-            "blog_id": blog.id,
-            "user_message_id": user_message.id,
-            "assistant_message_id": assistant_message.id,
+            **ids,
             "topic": request.topic,
             "content": blog_content,
-            "image_url": ai_result.get("image_url")
+            "image_url": ai_result.get("image_url"),
+            "image_variants": ai_result.get("image_variants", {}),
+            "sources": ai_result.get("sources", []),
+            "cached": ai_result.get("cached", False),
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse(event: str, data: dict) -> str:
+    """Format one server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/generate-blog/stream")
+async def generate_blog_stream(request: TopicRequest):
+    """
+    Streaming variant of /generate-blog using server-sent events.
+    Emits agent/tool/polish progress as it happens, the image once it is
+    ready and finally the saved chat/message/blog ids.
+    """
+
+    async def event_stream():
+        try:
+            yield _sse("started", {"topic": request.topic})
+
+            ai_result = None
+            if request.use_cache and not request.refresh:
+                ai_result = await generation_cache.lookup(ai_agent, request.topic, request.polish)
+                if ai_result is not None:
+                    yield _sse("cache_hit", {})
+            if ai_result is None:
+                async for item in ai_agent.process_topic_stream(request.topic, polish=request.polish):
+                    if item["event"] == "result":
+                        ai_result = item["data"]
+                    else:
+                        yield _sse(item["event"], item["data"])
+                if request.use_cache:
+                    await generation_cache.store(ai_agent, request.topic, ai_result, request.polish)
+
+            if ai_result.get("retry_after") is not None:
+                # Gemini is over quota or down: nothing is saved
+                yield _sse("error", {"detail": ai_result["error"], "retry_after": ai_result["retry_after"]})
+                return
+
+            # The session is opened only now, after the model has finished
+            async with AsyncSessionLocal() as db:
+                ids = await _persist_generation(db, request, ai_result)
+
+            yield _sse(
+                "done",
+                {
+                    "success": True,
+                    **ids,
+                    "topic": request.topic,
+                    "content": ai_result["blog_content"],
+                    "image_url": ai_result.get("image_url"),
+                    "image_variants": ai_result.get("image_variants", {}),
+                    "sources": ai_result.get("sources", []),
+                    "timings": ai_result.get("timings", {}),
+                    "cached": ai_result.get("cached", False),
+                },
+            )
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/chats", response_model=List[ChatResponse])
-async def get_chats(user_id: int = 1, db: Session = Depends(get_db)):
+async def get_chats(user_id: int = 1, db: AsyncSession = Depends(get_db)):
     """Get all chats for a user"""
-    chats = (
-        db.query(Chat)
-        .filter(Chat.user_id == user_id)
+    result = await db.execute(
+        select(Chat)
+        .where(Chat.user_id == user_id)
         .order_by(Chat.updated_at.desc())
-        .all()
     )
-    return chats
+    return result.scalars().all()
+
+
+@router.get("/chats/page", response_model=ChatPage)
+async def get_chats_page(
+    user_id: int = 1,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Keyset-paginated chats for a user, most recently updated first"""
+    stmt = select(Chat).where(Chat.user_id == user_id)
+    chats, next_cursor = await _keyset_page(
+        db, stmt, Chat.updated_at, Chat.id, cursor, limit, scalars=True
+    )
+    return {"items": chats, "next_cursor": next_cursor}
 
 
 @router.get("/chats/{chat_id}/messages", response_model=List[MessageResponse])
-async def get_chat_messages(chat_id: int, db: Session = Depends(get_db)):
+async def get_chat_messages(chat_id: int, db: AsyncSession = Depends(get_db)):
     """Get all messages for a specific chat"""
-    messages = (
-        db.query(Message)
-        .filter(Message.chat_id == chat_id)
+    result = await db.execute(
+        select(Message)
+        .where(Message.chat_id == chat_id)
         .order_by(Message.created_at)
-        .all()
     )
-    return messages
+    return result.scalars().all()
 
 
 @router.delete("/chats/{chat_id}")
-async def delete_chat(chat_id: int, db: Session = Depends(get_db)):
+async def delete_chat(chat_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a chat and all its messages"""
-    chat = db.query(Chat).filter(Chat.id == chat_id).first()
+    chat = await db.get(Chat, chat_id)
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
 
     # Step 1: Delete associated blogs manually to ensure no FK violations
-    db.query(Blog).filter(Blog.chat_id == chat_id).delete()
+    result = await db.execute(delete(Blog).where(Blog.chat_id == chat_id).returning(Blog.id))
+    await db.run_sync(fulltext.unindex, "blogs", result.scalars().all())
     
     # Step 2: Delete associated messages (cascade might fail if DB state is weird)
-    db.query(Message).filter(Message.chat_id == chat_id).delete()
+    result = await db.execute(delete(Message).where(Message.chat_id == chat_id).returning(Message.id))
+    await db.run_sync(fulltext.unindex, "messages", result.scalars().all())
 
     # Step 3: Delete the chat
-    db.delete(chat)
-    db.commit()
+    await db.delete(chat)
+    await db.commit()
     return {"success": True, "message": "Chat deleted successfully"}
 
 
 @router.delete("/messages/{message_id}")
-async def delete_message(message_id: int, db: Session = Depends(get_db)):
+async def delete_message(message_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a single message"""
-    msg = db.query(Message).filter(Message.id == message_id).first()
+    msg = await db.get(Message, message_id)
     if not msg:
         raise HTTPException(status_code=404, detail="Message not found")
-    db.delete(msg)
-    db.commit()
+    await db.delete(msg)
+    await db.run_sync(fulltext.unindex, "messages", [message_id])
+    await db.commit()
     return {"success": True}
 
 
 @router.patch("/messages/{message_id}")
-async def edit_message(message_id: int, content: str, db: Session = Depends(get_db)):
+async def edit_message(message_id: int, content: str, db: AsyncSession = Depends(get_db)):
     """Edit a single message"""
-    msg = db.query(Message).filter(Message.id == message_id).first()
+    msg = await db.get(Message, message_id)
     if not msg:
         raise HTTPException(status_code=404, detail="Message not found")
     msg.content = content
-    db.commit()
+    await db.run_sync(fulltext.index_message, msg.id, content)
+    await db.commit()
     return {"success": True}
 
 
 @router.get("/blogs", response_model=List[BlogResponse])
-async def get_blogs(user_id: int = 1, db: Session = Depends(get_db)):
+async def get_blogs(user_id: int = 1, db: AsyncSession = Depends(get_db)):
     """Get all blogs for a user"""
-    blogs = (
-        db.query(Blog)
-        .filter(Blog.user_id == user_id)
+    result = await db.execute(
+        select(Blog)
+        .where(Blog.user_id == user_id)
         .order_by(Blog.timestamp.desc())
-        .all()
     )
-    return blogs
+    return result.scalars().all()
+
+
+@router.get("/blogs/summaries", response_model=BlogSummaryPage)
+async def get_blog_summaries(
+    user_id: int = 1,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Keyset-paginated blog summaries for a user, newest first.
+    Only summary columns are selected; `content` is never loaded.
+    """
+    stmt = select(*BLOG_SUMMARY_COLUMNS).where(Blog.user_id == user_id)
+    rows, next_cursor = await _keyset_page(db, stmt, Blog.timestamp, Blog.id, cursor, limit)
+    return {
+        "items": [BlogSummary.model_validate(dict(row._mapping)) for row in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+class BlogSearchHit(BlogSummary):
+    snippet: Optional[str] = None
+    rank: Optional[float] = None
+
+
+class MessageSearchHit(BaseModel):
+    id: int
+    chat_id: int
+    role: str
+    snippet: Optional[str] = None
+    rank: Optional[float] = None
+    created_at: datetime
+
+
+@router.get("/blogs/search", response_model=List[BlogSearchHit])
+async def search_blogs(
+    q: str = Query(..., min_length=1, max_length=200),
+    user_id: int = 1,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """Ranked full-text search over blog topics and content with highlighted snippets"""
+    return await db.run_sync(fulltext.search_blogs, q, user_id, limit, offset)
+
+
+@router.get("/messages/search", response_model=List[MessageSearchHit])
+async def search_messages(
+    q: str = Query(..., min_length=1, max_length=200),
+    user_id: int = 1,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """Ranked full-text search over the user's chat messages"""
+    return await db.run_sync(fulltext.search_messages, q, user_id, limit, offset)
+
+
+BLOG_CACHE_MAX_AGE = int(os.getenv("BLOG_CACHE_MAX_AGE", "60"))
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against the resource"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison (RFC 9110 13.1.2): proxies such as nginx gzip turn our strong tag into W/"..."
+        candidates = {_opaque_tag(tag) for tag in if_none_match.split(",")}
+        return "*" in candidates or _opaque_tag(etag) in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+@router.get("/blogs/{blog_id}", response_model=BlogResponse)
+async def get_blog(blog_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """
+    Get a single blog.
+    Sends a strong ETag and Last-Modified and answers conditional requests with 304.
+    """
+    blog = await db.get(Blog, blog_id)
+    if not blog:
+        raise HTTPException(status_code=404, detail="Blog not found")
+
+    body = BlogResponse.model_validate(blog)
+    etag = '"' + hashlib.sha256(body.model_dump_json().encode()).hexdigest()[:32] + '"'
+    # Timestamps are stored as naive UTC
+    last_modified = blog.timestamp.replace(tzinfo=timezone.utc)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": f"public, max-age={BLOG_CACHE_MAX_AGE}, must-revalidate",
+    }
+
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return body
+
+
+def _topic_terms(topic: str) -> set:
+    return {word for word in re.findall(r"[a-z0-9]+", topic.lower()) if len(word) > 2}
+
+
+@router.get("/blogs/{blog_id}/related", response_model=List[BlogSummary])
+async def get_related_blogs(
+    blog_id: int,
+    response: Response,
+    limit: int = Query(3, ge=1, le=12),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Cheap related-blog lookup: ranks the author's recent blog summaries by
+    topic word overlap, falling back to recency. Never loads `content`.
+    """
+    result = await db.execute(select(Blog.id, Blog.user_id, Blog.topic).where(Blog.id == blog_id))
+    blog = result.first()
+    if not blog:
+        raise HTTPException(status_code=404, detail="Blog not found")
+
+    result = await db.execute(
+        select(*BLOG_SUMMARY_COLUMNS)
+        .where(Blog.user_id == blog.user_id, Blog.id != blog_id)
+        .order_by(Blog.timestamp.desc(), Blog.id.desc())
+        .limit(50)
+    )
+    candidates = result.all()
+    terms = _topic_terms(blog.topic)
+    # sorted() is stable, so equal overlaps keep their recency order
+    ranked = sorted(candidates, key=lambda row: -len(terms & _topic_terms(row.topic)))
+
+    response.headers["Cache-Control"] = f"public, max-age={BLOG_CACHE_MAX_AGE}"
+    return [BlogSummary.model_validate(dict(row._mapping)) for row in ranked[:limit]]
+
+
+# Background generation jobs
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    stage: Optional[str] = None
+    progress: int
+    topic: str
+    chat_id: Optional[int] = None
+    blog_id: Optional[int] = None
+    assistant_message_id: Optional[int] = None
+    image_url: Optional[str] = None
+    content: Optional[str] = None
+    error: Optional[str] = None
+    use_cache: bool = True
+    refresh: bool = False
+    polish: bool = True
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# Stream events that move a job to a new stage, with the progress they represent
+JOB_STAGES = {
+    "search_started": ("researching", 20),
+    "search_finished": ("writing", 40),
+    "image_ready": ("writing", 60),
+    "agent_done": ("polishing", 75),
+}
+
+
+async def _update_job(db: AsyncSession, job: GenerationJob, **fields):
+    for key, value in fields.items():
+        setattr(job, key, value)
+    await db.commit()
+
+
+async def run_generation_job(job_id: str):
+    """Job handler: run the agent for a queued job and persist its outcome"""
+    db = AsyncSessionLocal()
+    try:
+        job = await db.get(GenerationJob, job_id)
+        if not job or job.status not in ("queued", "running"):
+            return
+        await _update_job(db, job, status="running", stage="starting", progress=5, error=None)
+
+        # Same cache lookup and store path as /generate-blog/stream
+        ai_result = None
+        if job.use_cache and not job.refresh:
+            ai_result = await generation_cache.lookup(ai_agent, job.topic, job.polish)
+        if ai_result is None:
+            async for item in ai_agent.process_topic_stream(job.topic, polish=job.polish):
+                if item["event"] == "result":
+                    ai_result = item["data"]
+                elif item["event"] in JOB_STAGES:
+                    stage, progress = JOB_STAGES[item["event"]]
+                    if progress > job.progress:
+                        await _update_job(db, job, stage=stage, progress=progress)
+            if job.use_cache and ai_result is not None:
+                await generation_cache.store(ai_agent, job.topic, ai_result, job.polish)
+
+        if ai_result is None or ai_result.get("error"):
+            # Don't store an agent failure (e.g. Gemini over quota or down) as the blog
+            error = ai_result["error"] if ai_result else "Generation produced no result"
+            await _update_job(db, job, status="failed", stage="failed", error=error)
+            return
+
+        await _update_job(db, job, stage="saving", progress=90)
+        # Results and the final job state are committed together
+        ids = await _save_generation(db, job.user_id, job.chat_id, job.topic, ai_result)
+        await _update_job(
+            db,
+            job,
+            status="succeeded",
+            stage="completed",
+            progress=100,
+            blog_id=ids["blog_id"],
+            assistant_message_id=ids["assistant_message_id"],
+            image_url=ai_result.get("image_url"),
+        )
+    except Exception as e:
+        print(f"Job {job_id} failed: {str(e)}")
+        await db.rollback()
+        job = await db.get(GenerationJob, job_id)
+        if job:
+            await _update_job(db, job, status="failed", stage="failed", error=str(e))
+    finally:
+        await db.close()
+
+
+async def start_job_queue():
+    """Start the job workers and re-enqueue jobs left unfinished by a previous run"""
+    queue = get_job_queue()
+    queue.set_handler(run_generation_job)
+    await queue.start()
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(GenerationJob.id)
+            .where(GenerationJob.status.in_(["queued", "running"]), GenerationJob.batch_id.is_(None))
+            .order_by(GenerationJob.created_at)
+        )
+        unfinished = result.scalars().all()
+        for job_id in unfinished:
+            try:
+                await queue.enqueue(job_id)
+            except QueueFullError:
+                break
+        if unfinished:
+            print(f"Re-enqueued {len(unfinished)} unfinished jobs")
+
+    await _resume_batches()
+
+
+async def stop_job_queue():
+    await get_job_queue().stop()
+    await _stop_batches()
+
+
+@router.post("/jobs", status_code=202)
+async def create_job(request: TopicRequest, db: AsyncSession = Depends(get_db)):
+    """Enqueue a blog generation job and return its id immediately"""
+    user_id, chat_id = await _ensure_user_and_chat(db, request)
+    user_message_id = await _add_user_message(db, chat_id, request.topic)
+
+    job = GenerationJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        chat_id=chat_id,
+        topic=request.topic,
+        status="queued",
+        stage="queued",
+        progress=0,
+        use_cache=request.use_cache,
+        refresh=request.refresh,
+        polish=request.polish,
+    )
+    db.add(job)
+    await db.commit()
+
+    try:
+        await get_job_queue().enqueue(job.id)
+    except (QueueFullError, RuntimeError) as e:
+        await _update_job(db, job, status="failed", stage="failed", error=str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "chat_id": chat_id,
+        "user_message_id": user_message_id,
+    }
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Get status, progress and (once finished) the result of a generation job"""
+    job = await db.get(GenerationJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    response = JobResponse.model_validate(job)
+    if job.status == "succeeded" and job.blog_id:
+        blog = await db.get(Blog, job.blog_id)
+        if blog:
+            response.content = blog.content
+    return response
+
+
+# --- Batch generation ---
+
+BATCH_MAX_TOPICS = int(os.getenv("BATCH_MAX_TOPICS", "200"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+# Finished items are written together, every BATCH_WRITE_SIZE results or BATCH_FLUSH_SECONDS
+BATCH_WRITE_SIZE = int(os.getenv("BATCH_WRITE_SIZE", "10"))
+BATCH_FLUSH_SECONDS = float(os.getenv("BATCH_FLUSH_SECONDS", "5"))
+
+# Running batch tasks by batch id (held so they aren't garbage collected)
+_batch_tasks: Dict[str, asyncio.Task] = {}
+
+
+class BatchRequest(BaseModel):
+    topics: List[str]
+    user_id: int = 1
+    concurrency: Optional[int] = None
+    rate_per_minute: Optional[int] = None  # generations started per minute, 0 = unlimited
+    use_cache: bool = True
+    refresh: bool = False
+
+
+class BatchItemResponse(BaseModel):
+    id: str
+    topic: str
+    status: str
+    stage: Optional[str] = None
+    progress: int
+    chat_id: Optional[int] = None
+    blog_id: Optional[int] = None
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class BatchResponse(BaseModel):
+    id: str
+    status: str
+    total: int
+    succeeded: int
+    failed: int
+    concurrency: int
+    rate_per_minute: int
+    use_cache: bool
+    refresh: bool
+    created_at: datetime
+    updated_at: datetime
+    items: List[BatchItemResponse] = []
+
+    class Config:
+        from_attributes = True
+
+
+async def _mark_item_started(job_id: str):
+    # Own session: items start concurrently with the runner's bulk writes
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == job_id)
+            .values(status="running", stage="generating", progress=10, error=None)
+        )
+        await db.commit()
+
+
+async def _write_batch_items(
+    db: AsyncSession,
+    batch: GenerationBatch,
+    finished: List[Tuple[str, str, dict]],
+    failures: List[Tuple[str, str]],
+):
+    """
+    Save finished (job_id, topic, ai_result) items with bulk inserts, mark the
+    (job_id, error) failures and update the batch counters, in one transaction.
+    """
+    job_updates = []
+    if finished:
+        result = await db.execute(
+            insert(Chat).returning(Chat.id, sort_by_parameter_order=True),
+            [{"user_id": batch.user_id, "title": topic[:100]} for _, topic, _ in finished],
+        )
+        chat_ids = result.scalars().all()
+        saved = await _save_generations(
+            db,
+            batch.user_id,
+            [(chat_id, topic, ai_result) for chat_id, (_, topic, ai_result) in zip(chat_ids, finished)],
+            include_user_message=True,
+        )
+        job_updates = [
+            {
+                "id": job_id,
+                "status": "succeeded",
+                "stage": "completed",
+                "progress": 100,
+                "error": None,
+                "chat_id": chat_id,
+                "blog_id": ids["blog_id"],
+                "assistant_message_id": ids["assistant_message_id"],
+                "image_url": ai_result.get("image_url"),
+            }
+            for chat_id, ids, (job_id, _, ai_result) in zip(chat_ids, saved, finished)
+        ]
+        # Bulk UPDATE by primary key (executemany)
+        await db.execute(update(GenerationJob), job_updates)
+    if failures:
+        await db.execute(
+            update(GenerationJob),
+            [{"id": job_id, "status": "failed", "stage": "failed", "error": error} for job_id, error in failures],
+        )
+    batch.succeeded += len(finished)
+    batch.failed += len(failures)
+    await db.commit()
+
+
+async def _save_batch_results(db: AsyncSession, batch: GenerationBatch, entries: List[Tuple[str, str, dict]]):
+    """
+    Write a group of finished (job_id, topic, ai_result) batch items in one
+    transaction using bulk inserts. If that fails, items are written one
+    transaction each so a bad item fails alone.
+    """
+    batch_id = batch.id
+    finished = [entry for entry in entries if not entry[2].get("error")]
+    failures = [(job_id, ai_result["error"]) for job_id, _, ai_result in entries if ai_result.get("error")]
+    try:
+        await _write_batch_items(db, batch, finished, failures)
+        return
+    except Exception as e:
+        print(f"Batch {batch_id} bulk write failed: {str(e)}; saving items one by one")
+        await db.rollback()
+        # Rollback expires loaded rows; reload the counters before touching them
+        await db.refresh(batch)
+
+    for entry in finished:
+        try:
+            await _write_batch_items(db, batch, [entry], [])
+        except Exception as e:
+            print(f"Batch {batch_id} item {entry[0]} write failed: {str(e)}")
+            await db.rollback()
+            await db.refresh(batch)
+            failures.append((entry[0], f"Saving failed: {str(e)}"))
+    if failures:
+        await _write_batch_items(db, batch, [], failures)
+
+
+async def _fail_batch(db: AsyncSession, batch_id: str, error: str):
+    """Mark a batch that stopped unexpectedly, and its unfinished jobs, as failed"""
+    result = await db.execute(
+        update(GenerationJob)
+        .where(GenerationJob.batch_id == batch_id, GenerationJob.status.in_(["queued", "running"]))
+        .values(status="failed", stage="failed", error=error)
+    )
+    batch = await db.get(GenerationBatch, batch_id)
+    if batch:
+        batch.failed += result.rowcount
+        batch.status = "failed"
+    await db.commit()
+
+
+async def run_batch(batch_id: str):
+    """Generate every unfinished item of a batch and persist results in bulk"""
+    async with AsyncSessionLocal() as db:
+        try:
+            await _run_batch(db, batch_id)
+        except Exception as e:
+            print(f"Batch {batch_id} failed: {str(e)}")
+            await db.rollback()
+            await _fail_batch(db, batch_id, str(e))
+
+
+async def _run_batch(db: AsyncSession, batch_id: str):
+    batch = await db.get(GenerationBatch, batch_id)
+    if not batch or batch.status in ("completed", "failed"):
+        return
+    result = await db.execute(
+        select(GenerationJob)
+        .where(GenerationJob.batch_id == batch_id, GenerationJob.status.in_(["queued", "running"]))
+        .order_by(GenerationJob.created_at, GenerationJob.id)
+    )
+    # Plain values: a failed write rolls back and expires the ORM rows
+    items = [(job.id, job.topic) for job in result.scalars().all()]
+    batch.status = "running"
+    await db.commit()
+    print(f"Batch {batch_id}: generating {len(items)} items, concurrency {batch.concurrency}")
+
+    generator = BatchGenerator(
+        ai_agent,
+        concurrency=batch.concurrency,
+        rate_per_minute=batch.rate_per_minute,
+        cache=generation_cache,
+        use_cache=batch.use_cache,
+        refresh=batch.refresh,
+    )
+
+    async def on_start(index: int):
+        await _mark_item_started(items[index][0])
+
+    pending: List[Tuple[str, str, dict]] = []
+    last_flush = time.monotonic()
+    async for index, ai_result in generator.run([topic for _, topic in items], on_start=on_start):
+        pending.append((*items[index], ai_result))
+        if len(pending) >= BATCH_WRITE_SIZE or time.monotonic() - last_flush >= BATCH_FLUSH_SECONDS:
+            await _save_batch_results(db, batch, pending)
+            pending = []
+            last_flush = time.monotonic()
+    if pending:
+        await _save_batch_results(db, batch, pending)
+
+    batch.status = "completed"
+    await db.commit()
+    print(f"Batch {batch_id} completed: {batch.succeeded} succeeded, {batch.failed} failed")
+
+
+def _start_batch(batch_id: str):
+    task = asyncio.create_task(run_batch(batch_id))
+    _batch_tasks[batch_id] = task
+    task.add_done_callback(lambda _: _batch_tasks.pop(batch_id, None))
+
+
+async def _resume_batches():
+    """Restart batches left unfinished by a previous run; finished items are kept"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(GenerationBatch.id)
+            .where(GenerationBatch.status.in_(["queued", "running"]))
+            .order_by(GenerationBatch.created_at)
+        )
+        unfinished = result.scalars().all()
+    for batch_id in unfinished:
+        _start_batch(batch_id)
+    if unfinished:
+        print(f"Resumed {len(unfinished)} unfinished batches")
+
+
+async def _stop_batches():
+    # Unsaved items stay queued/running and are redone when the batch resumes
+    tasks = list(_batch_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@router.post("/batches", status_code=202)
+async def create_batch(request: BatchRequest, db: AsyncSession = Depends(get_db)):
+    """Queue blog generation for a list of topics and return the batch id immediately"""
+    topics = [topic.strip() for topic in request.topics if topic.strip()]
+    if not topics:
+        raise HTTPException(status_code=400, detail="No topics given")
+    if len(topics) > BATCH_MAX_TOPICS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_TOPICS} topics per batch")
+
+    concurrency = request.concurrency or int(os.getenv("BATCH_CONCURRENCY", "4"))
+    if not 1 <= concurrency <= BATCH_MAX_CONCURRENCY:
+        raise HTTPException(status_code=400, detail=f"concurrency must be between 1 and {BATCH_MAX_CONCURRENCY}")
+    rate_per_minute = request.rate_per_minute
+    if rate_per_minute is None:
+        rate_per_minute = int(os.getenv("BATCH_RATE_PER_MINUTE", "0"))
+    if rate_per_minute < 0:
+        raise HTTPException(status_code=400, detail="rate_per_minute must be 0 (unlimited) or positive")
+
+    await _ensure_user(db, request.user_id)
+    batch = GenerationBatch(
+        id=uuid.uuid4().hex,
+        user_id=request.user_id,
+        status="queued",
+        total=len(topics),
+        succeeded=0,
+        failed=0,
+        concurrency=concurrency,
+        rate_per_minute=rate_per_minute,
+        use_cache=request.use_cache,
+        refresh=request.refresh,
+    )
+    db.add(batch)
+    await db.flush()
+    items = [
+        {
+            "id": uuid.uuid4().hex,
+            "user_id": request.user_id,
+            "batch_id": batch.id,
+            "topic": topic,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0,
+        }
+        for topic in topics
+    ]
+    await db.execute(insert(GenerationJob), items)
+    await db.commit()
+
+    _start_batch(batch.id)
+
+    return {
+        "batch_id": batch.id,
+        "status": batch.status,
+        "total": batch.total,
+        "items": [{"id": item["id"], "topic": item["topic"]} for item in items],
+    }
+
+
+@router.get("/batches/{batch_id}", response_model=BatchResponse)
+async def get_batch(batch_id: str, db: AsyncSession = Depends(get_db)):
+    """Batch totals plus the status, progress and outcome of each item"""
+    batch = await db.get(GenerationBatch, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    result = await db.execute(
+        select(GenerationJob)
+        .where(GenerationJob.batch_id == batch_id)
+        .order_by(GenerationJob.created_at, GenerationJob.id)
+    )
+    response = BatchResponse.model_validate(batch)
+    response.items = [BatchItemResponse.model_validate(job) for job in result.scalars().all()]
+    return response
+
+
+@router.get("/health")
+async def health():
+    """Liveness plus an async database round-trip"""
+    db_ok = await check_db()
+    if not db_ok:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return {"status": "ok", "database": "ok"}
+
+
+@router.get("/search/cache-stats")
+async def get_search_cache_stats():
+    """Hit/miss/eviction counters for the web search cache"""
+    return get_search_cache().stats()
+
+
+@router.get("/llm/stats")
+async def get_llm_stats():
+    """Gemini circuit breaker state and remaining client-side rate budgets"""
+    return get_llm_guard().stats()
+
+
+@router.get("/generation/cache-stats")
+async def get_generation_cache_stats():
+    """Hit/miss counters and entry count for the generation result cache"""
+    return await generation_cache.stats()
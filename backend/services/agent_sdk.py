@@ -2,7 +2,11 @@
 OpenAI Agents SDK Implementation with Gemini Backend
 Professional agent architecture with runners, handoffs, and pipelines
 """
-from typing import List, Dict, Any, Optional
+import asyncio
+import os
+import time
+from collections import deque
+from typing import List, Dict, Any, AsyncIterator, Callable, Deque, Iterator, Optional, Tuple, Union
 from dataclasses import dataclass
 from enum import Enum
 from backend.services.gemini_adapter import get_gemini_adapter
@@ -16,12 +20,106 @@ class AgentRole(Enum):
     COORDINATOR = "coordinator"
 
 
-@dataclass
 class AgentMessage:
-    """Message structure for agent communication"""
-    role: str
-    content: str
-    metadata: Optional[Dict[str, Any]] = None
+    """Message structure for agent communication (slotted: long sessions keep many of these)"""
+    __slots__ = ("role", "content", "metadata", "tokens")
+
+    def __init__(self, role: str, content: str, metadata: Optional[Dict[str, Any]] = None):
+        self.role = role
+        self.content = content
+        self.metadata = metadata
+        self.tokens = estimate_tokens(content)
+
+    def __repr__(self):
+        return f"AgentMessage(role={self.role!r}, content={self.content[:40]!r}, tokens={self.tokens})"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting"""
+    return len(text) // 4 + 1 if text else 0
+
+
+SUMMARY_PROMPT = (
+    "Summarize the earlier part of this conversation for your own future reference. "
+    "Keep facts, decisions, names, open tasks and the user's preferences; drop pleasantries. "
+    "Use at most {words} words. Return only the summary.\n\n"
+)
+
+
+class ConversationHistory:
+    """
+    Bounded conversation history.
+    Keeps the newest messages that fit `max_tokens` (summary included, system
+    instructions excluded) and at most `max_messages`. Older messages slide
+    out of the window; with `keep_evicted` they are held until the agent folds
+    them into the running summary, otherwise they are dropped.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        max_messages: Optional[int] = None,
+        keep_evicted: bool = False,
+    ):
+        self.max_tokens = max_tokens or int(os.getenv("AGENT_HISTORY_MAX_TOKENS", "6000"))
+        self.max_messages = max_messages or int(os.getenv("AGENT_HISTORY_MAX_MESSAGES", "40"))
+        self.keep_evicted = keep_evicted
+        self.summary: Optional[str] = None
+        self._summary_tokens = 0
+        self._messages: Deque[AgentMessage] = deque()
+        self._tokens = 0
+        self._evicted: List[AgentMessage] = []
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[AgentMessage]:
+        return iter(self._messages)
+
+    @property
+    def tokens(self) -> int:
+        return self._tokens + self._summary_tokens
+
+    def append(self, message: AgentMessage):
+        self._messages.append(message)
+        self._tokens += message.tokens
+        self._trim()
+
+    def _evict(self):
+        message = self._messages.popleft()
+        self._tokens -= message.tokens
+        if self.keep_evicted:
+            self._evicted.append(message)
+
+    def _trim(self):
+        # The newest message always stays, even if it alone exceeds the budget
+        while len(self._messages) > 1 and (
+            self.tokens > self.max_tokens or len(self._messages) > self.max_messages
+        ):
+            self._evict()
+        # Don't open the window on a reply whose question was evicted
+        while len(self._messages) > 1 and self._messages[0].role == "assistant":
+            self._evict()
+
+    def take_evicted(self) -> List[AgentMessage]:
+        """Messages evicted since the last call (only collected with keep_evicted)"""
+        evicted, self._evicted = self._evicted, []
+        return evicted
+
+    def set_summary(self, summary: Optional[str]):
+        self.summary = summary or None
+        self._summary_tokens = estimate_tokens(summary or "")
+        self._trim()
+
+    def snapshot(self) -> List[AgentMessage]:
+        """Copy of the current window (bounded, unlike the full session)"""
+        return list(self._messages)
+
+    def clear(self):
+        self._messages.clear()
+        self._evicted = []
+        self._tokens = 0
+        self.set_summary(None)
 
 
 class Agent:
@@ -36,21 +134,39 @@ class Agent:
         instructions: str,
         role: AgentRole = AgentRole.COORDINATOR,
         temperature: float = 0.7,
-        max_tokens: int = 2048
+        max_tokens: int = 2048,
+        model: Optional[str] = None,
+        history_max_tokens: Optional[int] = None,
+        history_max_messages: Optional[int] = None,
+        summarize_history: bool = False
     ):
         self.name = name
         self.instructions = instructions
         self.role = role
         self.temperature = temperature
         self.max_tokens = max_tokens
+        # Gemini model for this agent (None = the adapter's default)
+        self.model = model
         self.gemini = get_gemini_adapter()
-        self.conversation_history: List[AgentMessage] = []
+        # Sliding window over the conversation; older turns are summarized or dropped
+        self.summarize_history = summarize_history
+        self.history_summary_tokens = int(os.getenv("AGENT_HISTORY_SUMMARY_TOKENS", "400"))
+        self.history = ConversationHistory(
+            max_tokens=history_max_tokens,
+            max_messages=history_max_messages,
+            keep_evicted=summarize_history,
+        )
         
         print(f"🤖 Agent '{name}' ({role.value}) initialized")
+
+    @property
+    def conversation_history(self) -> List[AgentMessage]:
+        """Messages currently in the history window"""
+        return self.history.snapshot()
     
     def add_message(self, role: str, content: str, metadata: Optional[Dict] = None):
         """Add message to conversation history"""
-        self.conversation_history.append(
+        self.history.append(
             AgentMessage(role=role, content=content, metadata=metadata)
         )
     
@@ -59,14 +175,63 @@ class Agent:
         messages = [
             {"role": "system", "content": self.instructions}
         ]
+        if self.history.summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation: {self.history.summary}"
+            })
         
-        for msg in self.conversation_history:
+        for msg in self.history:
             messages.append({
                 "role": msg.role,
                 "content": msg.content
             })
         
         return messages
+
+    def _summary_request(self, evicted: List[AgentMessage]) -> List[Dict[str, str]]:
+        words = int(self.history_summary_tokens * 0.75)
+        parts = [SUMMARY_PROMPT.format(words=words)]
+        if self.history.summary:
+            parts.append(f"Summary so far: {self.history.summary}\n")
+        parts.extend(f"{msg.role.capitalize()}: {msg.content}" for msg in evicted)
+        return [{"role": "user", "content": "\n".join(parts)}]
+
+    def _apply_summary(self, response: Dict[str, Any]):
+        summary = response["choices"][0]["message"]["content"].strip()
+        # Never let the summary crowd out the live window
+        limit = self.history_summary_tokens * 4
+        self.history.set_summary(summary[:limit])
+
+    def compact_history(self):
+        """Fold evicted messages into the running summary (sync)"""
+        evicted = self.history.take_evicted()
+        if not evicted:
+            return
+        try:
+            self._apply_summary(self.gemini.create_completion(
+                messages=self._summary_request(evicted),
+                temperature=0.2,
+                max_tokens=self.history_summary_tokens,
+                model=self.model
+            ))
+        except Exception as e:
+            print(f"⚠️ History summary failed for '{self.name}', older turns dropped: {e}")
+
+    async def compact_history_async(self):
+        """Fold evicted messages into the running summary"""
+        evicted = self.history.take_evicted()
+        if not evicted:
+            return
+        try:
+            self._apply_summary(await self.gemini.create_completion_async(
+                messages=self._summary_request(evicted),
+                temperature=0.2,
+                max_tokens=self.history_summary_tokens,
+                model=self.model
+            ))
+        except Exception as e:
+            print(f"⚠️ History summary failed for '{self.name}', older turns dropped: {e}")
     
     def run(self, user_input: str) -> str:
         """
@@ -75,6 +240,7 @@ class Agent:
         """
         # Add user input to history
         self.add_message("user", user_input)
+        self.compact_history()
         
         # Get messages
         messages = self.get_messages_for_api()
@@ -83,7 +249,8 @@ class Agent:
         response = self.gemini.create_completion(
             messages=messages,
             temperature=self.temperature,
-            max_tokens=self.max_tokens
+            max_tokens=self.max_tokens,
+            model=self.model
         )
         
         # Extract response content
@@ -97,22 +264,42 @@ class Agent:
     async def run_async(self, user_input: str) -> str:
         """Async version of run"""
         self.add_message("user", user_input)
+        await self.compact_history_async()
         messages = self.get_messages_for_api()
         
         response = await self.gemini.create_completion_async(
             messages=messages,
             temperature=self.temperature,
-            max_tokens=self.max_tokens
+            max_tokens=self.max_tokens,
+            model=self.model
         )
         
         assistant_message = response["choices"][0]["message"]["content"]
         self.add_message("assistant", assistant_message)
         
         return assistant_message
+
+    async def run_stream(self, user_input: str) -> AsyncIterator[str]:
+        """Streamed version of run_async: yields text deltas, then records the full reply"""
+        self.add_message("user", user_input)
+        await self.compact_history_async()
+        messages = self.get_messages_for_api()
+
+        parts = []
+        async for delta in self.gemini.create_completion_stream(
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            model=self.model
+        ):
+            parts.append(delta)
+            yield delta
+
+        self.add_message("assistant", "".join(parts))
     
     def reset(self):
         """Reset conversation history"""
-        self.conversation_history = []
+        self.history.clear()
 
 
 class Runner:
@@ -149,6 +336,16 @@ class Runner:
             conversation_history=agent.conversation_history
         )
 
+    @staticmethod
+    async def run_streamed(agent: Agent, user_input: str) -> AsyncIterator[str]:
+        """
+        Streamed agent execution
+        Pattern: async for delta in Runner.run_streamed(agent, "prompt")
+        """
+        print(f"🏃 Running agent '{agent.name}' with streaming...")
+        async for delta in agent.run_stream(user_input):
+            yield delta
+
 
 @dataclass
 class RunResult:
@@ -161,55 +358,194 @@ class RunResult:
         return self.final_output
 
 
+@dataclass
+class Handoff:
+    """
+    Routing rule: `to_agent` receives `from_agent`'s output when `condition` holds.
+    The condition is "always", a callable on the output, or text the output must
+    contain (case-insensitive).
+    """
+    from_agent: str
+    to_agent: str
+    condition: Union[str, Callable[[str], bool]] = "always"
+
+    def applies(self, output: str) -> bool:
+        if callable(self.condition):
+            return bool(self.condition(output))
+        if self.condition == "always":
+            return True
+        return self.condition.lower() in output.lower()
+
+
+def merge_outputs(initial_input: str, outputs: Dict[str, str]) -> str:
+    """Default fan-in: the original task followed by each upstream agent's output"""
+    parts = [f"Task: {initial_input}"]
+    parts.extend(f"## Input from {name}\n{output}" for name, output in outputs.items())
+    return "\n\n".join(parts)
+
+
 class AgentPipeline:
     """
-    Pipeline for sequential agent execution with handoffs
+    Pipeline executing agents as a dependency graph with handoffs
     Allows complex workflows with multiple specialized agents
+
+    Each agent runs once all of its upstream agents (declared dependencies
+    and handoff sources) have finished, so independent branches run
+    concurrently, at most `max_concurrency` at a time. An agent with several
+    inputs gets them merged (fan-in). An agent targeted by handoffs only runs
+    if at least one of their conditions held; skipped agents pass nothing on.
     """
     
-    def __init__(self, name: str):
+    def __init__(self, name: str, max_concurrency: Optional[int] = None):
         self.name = name
         self.agents: List[Agent] = []
-        self.handoff_rules: Dict[str, str] = {}
+        self.dependencies: Dict[str, List[str]] = {}
+        self.mergers: Dict[str, Callable[[str, Dict[str, str]], str]] = {}
+        self.handoff_rules: List[Handoff] = []
+        self.max_concurrency = max_concurrency or int(os.getenv("AGENT_PIPELINE_CONCURRENCY", "4"))
         
         print(f"🔄 Pipeline '{name}' created")
     
-    def add_agent(self, agent: Agent):
-        """Add agent to pipeline"""
+    def add_agent(
+        self,
+        agent: Agent,
+        depends_on: Optional[List[str]] = None,
+        merge: Optional[Callable[[str, Dict[str, str]], str]] = None
+    ):
+        """
+        Add agent to pipeline
+        depends_on names the agents whose outputs it needs; None (the default)
+        chains it after the previously added agent, [] makes it a starting agent.
+        merge(initial_input, {agent: output}) builds its input when it has several.
+        """
+        if any(existing.name == agent.name for existing in self.agents):
+            raise ValueError(f"Pipeline '{self.name}' already has an agent named '{agent.name}'")
+        if depends_on is None:
+            depends_on = [self.agents[-1].name] if self.agents else []
         self.agents.append(agent)
+        self.dependencies[agent.name] = list(depends_on)
+        if merge is not None:
+            self.mergers[agent.name] = merge
         print(f"➕ Agent '{agent.name}' added to pipeline")
     
-    def add_handoff(self, from_agent: str, to_agent: str, condition: str = "always"):
+    def add_handoff(
+        self, from_agent: str, to_agent: str, condition: Union[str, Callable[[str], bool]] = "always"
+    ):
         """Define handoff rule between agents"""
-        self.handoff_rules[from_agent] = to_agent
-        print(f"🔀 Handoff rule: {from_agent} → {to_agent} ({condition})")
+        self.handoff_rules.append(Handoff(from_agent, to_agent, condition))
+        label = condition if isinstance(condition, str) else getattr(condition, "__name__", "custom")
+        print(f"🔀 Handoff rule: {from_agent} → {to_agent} ({label})")
+
+    def _upstream(self) -> Dict[str, List[str]]:
+        """Inputs of every agent in order (dependencies, then handoff sources); rejects unknown names and cycles"""
+        names = {agent.name for agent in self.agents}
+        upstream = {name: list(deps) for name, deps in self.dependencies.items()}
+        for rule in self.handoff_rules:
+            for name in (rule.from_agent, rule.to_agent):
+                if name not in names:
+                    raise ValueError(f"Handoff refers to unknown agent '{name}'")
+            if rule.from_agent not in upstream[rule.to_agent]:
+                upstream[rule.to_agent].append(rule.from_agent)
+        for name, deps in upstream.items():
+            for dep in deps:
+                if dep not in names:
+                    raise ValueError(f"Agent '{name}' depends on unknown agent '{dep}'")
+
+        # Kahn's algorithm: anything left unvisited sits on a cycle
+        remaining = {name: len(deps) for name, deps in upstream.items()}
+        ready = [name for name, count in remaining.items() if count == 0]
+        visited = 0
+        while ready:
+            current = ready.pop()
+            visited += 1
+            for name, deps in upstream.items():
+                if current in deps:
+                    remaining[name] -= 1
+                    if remaining[name] == 0:
+                        ready.append(name)
+        if visited != len(upstream):
+            cyclic = sorted(name for name, count in remaining.items() if count > 0)
+            raise ValueError(f"Pipeline '{self.name}' has a cycle involving {', '.join(cyclic)}")
+        return upstream
+
+    def _should_run(self, name: str, outputs: Dict[str, str]) -> bool:
+        handoffs = [rule for rule in self.handoff_rules if rule.to_agent == name]
+        if handoffs and not any(
+            rule.from_agent in outputs and rule.applies(outputs[rule.from_agent]) for rule in handoffs
+        ):
+            return False
+        deps = self.dependencies[name]
+        # Nothing to work on if every declared input was skipped
+        return not deps or any(dep in outputs for dep in deps)
+
+    def _input_for(self, name: str, upstream: List[str], outputs: Dict[str, str], initial_input: str) -> str:
+        inputs = {dep: outputs[dep] for dep in upstream if dep in outputs}
+        if not inputs:
+            return initial_input
+        if len(inputs) == 1 and name not in self.mergers:
+            return next(iter(inputs.values()))
+        return self.mergers.get(name, merge_outputs)(initial_input, inputs)
+
+    async def _run_agent(self, semaphore: asyncio.Semaphore, agent: Agent, agent_input: str) -> Tuple[str, float]:
+        async with semaphore:
+            print(f"\n📍 Agent '{agent.name}' started")
+            started = time.perf_counter()
+            result = await Runner.run_async(agent, agent_input)
+            print(f"✅ Agent '{agent.name}' completed")
+            return result.final_output, time.perf_counter() - started
     
     async def run_pipeline(self, initial_input: str) -> Dict[str, Any]:
         """
         Execute entire pipeline with agent handoffs
         """
-        print(f"\n🚀 Starting pipeline '{self.name}'...")
-        results = {}
-        current_input = initial_input
-        
-        for i, agent in enumerate(self.agents):
-            print(f"\n📍 Step {i+1}/{len(self.agents)}: Agent '{agent.name}'")
-            
-            # Run current agent
-            result = await Runner.run_async(agent, current_input)
-            results[agent.name] = result.final_output
-            
-            # Use output as input for next agent (handoff)
-            current_input = result.final_output
-            
-            print(f"✅ Agent '{agent.name}' completed")
-        
+        upstream = self._upstream()
+        print(f"\n🚀 Starting pipeline '{self.name}' ({len(self.agents)} agents, up to {self.max_concurrency} at once)...")
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        pending = {agent.name: agent for agent in self.agents}
+        running: Dict[asyncio.Task, str] = {}
+        outputs: Dict[str, str] = {}
+        skipped: List[str] = []
+        timings: Dict[str, float] = {}
+
+        def schedule():
+            # Skipping one agent can unblock others, so repeat until nothing changes
+            progressed = True
+            while progressed:
+                progressed = False
+                for name in list(pending):
+                    if any(dep in pending or dep in running.values() for dep in upstream[name]):
+                        continue
+                    agent = pending.pop(name)
+                    progressed = True
+                    if not self._should_run(name, outputs):
+                        skipped.append(name)
+                        print(f"⏭️ Agent '{name}' skipped (no handoff or input)")
+                        continue
+                    agent_input = self._input_for(name, upstream[name], outputs, initial_input)
+                    running[asyncio.create_task(self._run_agent(semaphore, agent, agent_input))] = name
+
+        try:
+            schedule()
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    outputs[name], timings[name] = task.result()
+                schedule()
+        finally:
+            for task in running:
+                task.cancel()
+
+        ordered = {agent.name: outputs[agent.name] for agent in self.agents if agent.name in outputs}
         print(f"\n🎉 Pipeline '{self.name}' completed!")
         
         return {
             "pipeline_name": self.name,
-            "final_output": current_input,
-            "agent_outputs": results
+            # The last agent (in the order added) that actually ran
+            "final_output": next(reversed(list(ordered.values())), initial_input),
+            "agent_outputs": ordered,
+            "skipped": skipped,
+            "timings": {name: round(seconds, 3) for name, seconds in timings.items()},
         }
 
 
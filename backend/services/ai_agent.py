@@ -1,18 +1,30 @@
 import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+from functools import cached_property
 from dotenv import load_dotenv
 from datetime import datetime
-from agents import Agent, Runner, function_tool, OpenAIChatCompletionsModel, set_tracing_disabled
+from agents import Agent, Runner, RunContextWrapper, RunHooks, function_tool, OpenAIChatCompletionsModel, set_tracing_disabled
+from openai.types.responses import ResponseTextDeltaEvent
 from openai import AsyncOpenAI
 from openai.resources.chat import AsyncChat, AsyncCompletions
-from typing import Any, Mapping, List, Dict
+from typing import Any, Mapping, List, Dict, AsyncIterator, Optional
+from dataclasses import dataclass, field
 from backend.services.search_service import WebSearchService
+from backend.services.http_transport import HTTPTransport, get_http_transport
 from backend.services.image_service import ImageService
+from backend.services.research_context import build_research_context
+from backend.services.llm_resilience import get_llm_guard, is_upstream_unavailable, retry_after_seconds
+from backend.services.metrics import AGENT_TURN_DURATION, GENERATIONS_IN_FLIGHT, STAGE_DURATION, TOOL_CALL_DURATION
 
 load_dotenv(override=True)
 
 # Configure environment for Gemini's OpenAI Compatibility
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/openai/")
 
 os.environ["OPENAI_API_KEY"] = GEMINI_API_KEY or ""
 os.environ["OPENAI_BASE_URL"] = GEMINI_BASE_URL
@@ -20,8 +32,105 @@ os.environ["OPENAI_BASE_URL"] = GEMINI_BASE_URL
 # Disable tracing as it requires a real OpenAI key
 set_tracing_disabled(True)
 
-# Global variables for the current request
-current_image_url = None
+MODEL_NAME = "gemini-2.5-flash"
+
+AGENT_INSTRUCTIONS = """You are a professional AI Assistant specializing in Blogs and Image Generation.
+Today's Date: {current_time}.
+
+Workflow:
+1. Determine if the user wants an image or a blog post.
+2. If requesting an IMAGE:
+   - Use 'image_tool' with a detailed prompt.
+   - Reply with a brief confirmation (e.g., "Generated your image of [description]").
+3. If requesting a BLOG:
+   - Use 'search_tool' for research.
+   - Write a high-quality blog post.
+   - ALWAYS call 'image_tool' at the end to generate one featured image.
+   - Return ONLY the blog content.
+4. For general talk, be polite and helpful in the user's language.
+"""
+
+POLISH_INSTRUCTIONS = (
+    "You are a professional blog editor. Please polish and refine the following blog post. "
+    "Improve the flow, grammar, and professional tone while keeping the core information intact. "
+    "CRITICAL: Return ONLY the polished blog post as plain text or markdown. "
+    "DO NOT include any introductory sentences, meta-talk, options, or explanations. "
+    "Just the final polished content.\n\n"
+)
+
+# Used when a long post is polished one section at a time
+POLISH_SECTION_INSTRUCTIONS = (
+    "You are a professional blog editor. Please polish and refine the following section of a longer blog post. "
+    "Improve the flow, grammar, and professional tone while keeping the core information intact. "
+    "Keep the section's heading exactly as it is and do not add an introduction or conclusion for the post. "
+    "CRITICAL: Return ONLY the polished section as plain text or markdown. "
+    "DO NOT include any introductory sentences, meta-talk, options, or explanations.\n\n"
+)
+
+# Identifies the prompt set; cached generations are only reused while it is unchanged.
+# Hashes the instruction template, so the date filled in at startup doesn't affect it.
+PROMPT_VERSION = hashlib.sha256(
+    "\x00".join([AGENT_INSTRUCTIONS, POLISH_INSTRUCTIONS, POLISH_SECTION_INSTRUCTIONS]).encode("utf-8")
+).hexdigest()[:16]
+
+_HEADING_RE = re.compile(r"^#{1,6}\s")
+
+
+class PolishFallback:
+    """Yielded by a polish stream that failed: its section falls back to `text`"""
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+@dataclass
+class GenerationContext:
+    """
+    Per-run state handed to the SDK as the run context.
+    Tools write into it instead of module globals, so one GeminiAgent can
+    serve many concurrent process_topic calls.
+    """
+    topic: str
+    image_urls: List[str] = field(default_factory=list)
+    image_variants: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    sources: List[Dict[str, str]] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    # Pre-fetched search results (batch runs share research across topics)
+    research: Optional[List[Dict[str, str]]] = None
+
+    @property
+    def image_url(self) -> Optional[str]:
+        return self.image_urls[-1] if self.image_urls else None
+
+    def add_timing(self, stage: str, started: float):
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.labels(stage).observe(elapsed)
+        self.timings[stage] = round(self.timings.get(stage, 0.0) + elapsed, 3)
+
+
+class MetricsRunHooks(RunHooks[GenerationContext]):
+    """Times each model turn and tool call of one run into the Prometheus histograms"""
+
+    def __init__(self):
+        self._turn_started: Dict[str, float] = {}
+        self._tool_started: Dict[str, List[float]] = {}
+
+    async def on_llm_start(self, context, agent, system_prompt, input_items) -> None:
+        self._turn_started[agent.name] = time.perf_counter()
+
+    async def on_llm_end(self, context, agent, response) -> None:
+        started = self._turn_started.pop(agent.name, None)
+        if started is not None:
+            AGENT_TURN_DURATION.labels(agent.name).observe(time.perf_counter() - started)
+
+    async def on_tool_start(self, context, agent, tool) -> None:
+        self._tool_started.setdefault(tool.name, []).append(time.perf_counter())
+
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        started = self._tool_started.get(tool.name)
+        if started:
+            TOOL_CALL_DURATION.labels(tool.name).observe(time.perf_counter() - started.pop(0))
 
 class GeminiSanitizedCompletions(AsyncCompletions):
     """
@@ -38,16 +147,17 @@ class GeminiSanitizedCompletions(AsyncCompletions):
         kwargs.pop("parallel_tool_calls", None) # Gemini handles tools, but sometimes strict parallel mode fails
         
         # Ensure model mapping is correct if needed, but SDK usually handles it
-        return await self._raw_create(*args, **kwargs)
+        # Rate budgets, retries and the circuit breaker (see llm_resilience)
+        return await get_llm_guard().call(self._raw_create, *args, **kwargs)
 
 class GeminiSanitizedClient(AsyncOpenAI):
     """
     Custom OpenAI Client that injects the sanitizer.
     """
-    @property
+    @cached_property
     def chat(self) -> AsyncChat:
         chat_resource = super().chat
-        # Monkey-patch the completions resource instance
+        # Monkey-patch the completions resource instance (once; the wrapper is reused)
         chat_resource.completions = GeminiSanitizedCompletions(self)
         return chat_resource
 
@@ -56,8 +166,10 @@ class GeminiAgent:
     Refactored Agent using REAL OpenAI Agents SDK with Gemini Compatibility.
     Now supports both Blog Generation and Image Generation.
     """
-    def __init__(self):
+    def __init__(self, transport: Optional[HTTPTransport] = None):
         current_time = datetime.now().strftime("%A, %B %d, %Y")
+        # Pooled HTTP clients shared by the model, search and image calls
+        self.transport = transport or get_http_transport()
         
         # Ensure fresh API Key from environment
         load_dotenv(override=True)
@@ -66,115 +178,373 @@ class GeminiAgent:
         # 1. Initialize Custom Client
         self.client = GeminiSanitizedClient(
             api_key=api_key,
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
+            base_url=GEMINI_BASE_URL,
+            # Retries are handled by the LLM guard, which also honours our quotas
+            max_retries=0,
+            http_client=self.transport.openai_http_client,
         )
 
         # 2. Define the Model using SDK's Class but with our Client
-        print(f"Initializing GeminiAgent with model: gemini-2.5-flash")
+        self.model_name = MODEL_NAME
+        self.prompt_version = PROMPT_VERSION
+        print(f"Initializing GeminiAgent with model: {self.model_name}")
         self.model = OpenAIChatCompletionsModel(
-            model="gemini-2.5-flash",
+            model=self.model_name,
             openai_client=self.client
         )
+
+        # Posts of at least this many words are polished section by section, concurrently
+        self.polish_section_threshold = int(os.getenv("POLISH_SECTION_THRESHOLD", "800"))
+        self.polish_section_min_words = int(os.getenv("POLISH_SECTION_MIN_WORDS", "120"))
+        self.polish_concurrency = int(os.getenv("POLISH_CONCURRENCY", "4"))
+        # Hedge a (non-streamed) polish call that is slower than this; 0 disables hedging
+        self.polish_hedge_after = float(os.getenv("POLISH_HEDGE_AFTER_SECONDS", "0"))
         
         # 3. Define the Agent (Real SDK Class)
         self.blog_agent = Agent(
             name="AI-Agent",
-            instructions=f"""You are a professional AI Assistant specializing in Blogs and Image Generation.
-Today's Date: {current_time}.
-
-Workflow:
-1. Determine if the user wants an image or a blog post.
-2. If requesting an IMAGE:
-   - Use 'image_tool' with a detailed prompt.
-   - Reply with a brief confirmation (e.g., "Generated your image of [description]").
-3. If requesting a BLOG:
-   - Use 'search_tool' for research.
-   - Write a high-quality blog post.
-   - ALWAYS call 'image_tool' at the end to generate one featured image.
-   - Return ONLY the blog content.
-4. For general talk, be polite and helpful in the user's language.
-""",
+            instructions=AGENT_INSTRUCTIONS.format(current_time=current_time),
             tools=[function_tool(self.search_tool), function_tool(self.image_tool)],
             model=self.model
         )
 
-    async def search_tool(self, topic: str) -> str:
+    async def search_tool(self, ctx: RunContextWrapper[GenerationContext], topic: str) -> str:
         """
         Perform deep web research on a blog topic. 
         """
-        search_service = WebSearchService()
-        results = await search_service.multi_search(topic)
+        started = time.perf_counter()
+        if ctx.context.research is not None:
+            results = ctx.context.research
+        else:
+            search_service = WebSearchService(transport=self.transport)
+            results = await search_service.multi_search(topic)
+        ctx.context.add_timing("search", started)
         if not results:
             return "No search results found."
-        return "\n\n".join([f"Source: {r['title']}\n{r['snippet']}" for r in results])
+        # Best-ranked, de-duplicated snippets within the token budget; only those are cited
+        research = build_research_context(topic, results)
+        print(
+            f"Research context: {len(research.sources)}/{len(results)} snippets, ~{research.tokens} tokens "
+            f"({research.duplicates_dropped} near-duplicates dropped)"
+        )
+        ctx.context.sources.extend(research.sources)
+        return research.text
 
-    async def image_tool(self, prompt: str) -> str:
+    async def image_tool(self, ctx: RunContextWrapper[GenerationContext], prompt: str) -> str:
         """
         Generate a high-quality AI image.
         """
-        global current_image_url
-        img_service = ImageService()
+        started = time.perf_counter()
+        img_service = ImageService(self.transport)
         url = await img_service.generate_image(prompt)
-        current_image_url = url
+        ctx.context.add_timing("image", started)
+        if url:
+            ctx.context.image_urls.append(url)
+            ctx.context.image_variants = await img_service.create_variants(url)
         return f"[Image Generated: {prompt}]"
 
-    async def process_topic(self, topic: str) -> Dict[str, Any]:
-        global current_image_url
-        current_image_url = None # Clear for new request
+    def _result(self, context: GenerationContext, blog_content: str) -> Dict[str, Any]:
+        return {
+            "blog_content": blog_content,
+            "image_url": context.image_url,
+            "image_variants": context.image_variants,
+            "sources": context.sources,
+            "timings": context.timings,
+        }
+
+    def _error_result(self, error: Exception) -> Dict[str, Any]:
+        result = {"blog_content": f"System Error: {str(error)}", "image_url": None, "error": str(error)}
+        if is_upstream_unavailable(error):
+            # Gemini is rate limiting or down; callers can ask the client to come back later
+            result["retry_after"] = retry_after_seconds(error) or 30
+        return result
+
+    async def process_topic(
+        self, topic: str, research: Optional[List[Dict[str, str]]] = None, polish: bool = True
+    ) -> Dict[str, Any]:
+        context = GenerationContext(topic=topic, research=research)
+        GENERATIONS_IN_FLIGHT.inc()
         try:
             # 4. Use the REAL Runner (Guaranteed SDK usage)
-            result = await Runner.run(self.blog_agent, topic)
+            started = time.perf_counter()
+            result = await Runner.run(self.blog_agent, topic, context=context, hooks=MetricsRunHooks())
+            context.add_timing("agent", started)
             
             raw_content = result.final_output
 
+            if not polish:
+                return self._result(context, raw_content)
+
             # 5. Polish with Gemini
+            started = time.perf_counter()
             polished_content = await self.polish_with_gemini(raw_content)
+            context.add_timing("polish", started)
 
-            return {
-                "blog_content": polished_content,
-                "image_url": current_image_url
-            }
+            return self._result(context, polished_content)
         except Exception as e:
             print(f"Agent Execution Error: {str(e)}")
-            return {
-                "blog_content": f"System Error: {str(e)}", 
-                "image_url": None
-            }
+            return self._error_result(e)
+        finally:
+            GENERATIONS_IN_FLIGHT.dec()
+
+    async def process_topic_stream(self, topic: str, polish: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streamed variant of process_topic.
+        Yields {"event": ..., "data": ...} dicts for each stage of the run:
+        tool calls, search start/finish, agent token deltas, polish deltas,
+        the generated image and finally the complete result.
+        """
+        context = GenerationContext(topic=topic)
+        tool_names: Dict[str, str] = {}
+        GENERATIONS_IN_FLIGHT.inc()
+        try:
+            started = time.perf_counter()
+            result = Runner.run_streamed(self.blog_agent, topic, context=context, hooks=MetricsRunHooks())
+            async for event in result.stream_events():
+                if event.type == "raw_response_event":
+                    if isinstance(event.data, ResponseTextDeltaEvent) and event.data.delta:
+                        yield {"event": "agent_delta", "data": {"delta": event.data.delta}}
+                elif event.type == "run_item_stream_event":
+                    raw_item = getattr(event.item, "raw_item", None)
+                    if event.name == "tool_called":
+                        name = getattr(raw_item, "name", "")
+                        call_id = getattr(raw_item, "call_id", "")
+                        tool_names[call_id] = name
+                        arguments = getattr(raw_item, "arguments", "") or ""
+                        try:
+                            arguments = json.loads(arguments)
+                        except ValueError:
+                            pass
+                        yield {"event": "tool_call", "data": {"tool": name, "arguments": arguments}}
+                        if name == "search_tool":
+                            yield {"event": "search_started", "data": {"arguments": arguments}}
+                    elif event.name == "tool_output":
+                        call_id = raw_item.get("call_id", "") if isinstance(raw_item, dict) else getattr(raw_item, "call_id", "")
+                        name = tool_names.get(call_id, "")
+                        yield {"event": "tool_output", "data": {"tool": name}}
+                        if name == "search_tool":
+                            yield {"event": "search_finished", "data": {}}
+                        elif name == "image_tool" and context.image_url:
+                            yield {
+                                "event": "image_ready",
+                                "data": {"image_url": context.image_url, "image_variants": context.image_variants},
+                            }
+
+            raw_content = result.final_output or ""
+            context.add_timing("agent", started)
+            yield {"event": "agent_done", "data": {"sources": context.sources}}
+
+            if not polish:
+                yield {"event": "result", "data": self._result(context, raw_content)}
+                return
+
+            started = time.perf_counter()
+            polished_content = raw_content
+            async for item in self.polish_with_gemini_stream(raw_content):
+                if "delta" in item:
+                    yield {"event": "polish_delta", "data": {"delta": item["delta"]}}
+                else:
+                    # Final text: sections whose stream failed midway hold their unpolished text
+                    polished_content = item["text"].strip() or raw_content
+            context.add_timing("polish", started)
+
+            yield {"event": "result", "data": self._result(context, polished_content)}
         except Exception as e:
             print(f"Agent Execution Error: {str(e)}")
-            return {
-                "blog_content": f"System Error: {str(e)}", 
-                "image_url": None
-            }
+            yield {"event": "result", "data": self._error_result(e)}
+        finally:
+            GENERATIONS_IN_FLIGHT.dec()
+
+    def _build_polish_prompt(self, content: str) -> str:
+        return POLISH_INSTRUCTIONS + content
+
+    def _build_section_polish_prompt(self, section: str) -> str:
+        return POLISH_SECTION_INSTRUCTIONS + section
+
+    def _should_polish(self, content: str) -> bool:
+        # If the content is too short (less than 150 words), it's probably a greeting or clarification, don't polish it as a blog.
+        return len(content.split()) >= 150
+
+    def _split_sections(self, content: str) -> List[str]:
+        """
+        Split markdown on heading lines (never inside code fences).
+        Sections shorter than polish_section_min_words are merged into the next one.
+        """
+        sections = []
+        current: List[str] = []
+        in_fence = False
+        for line in content.splitlines():
+            if line.lstrip().startswith("```"):
+                in_fence = not in_fence
+            elif not in_fence and _HEADING_RE.match(line) and "".join(current).strip():
+                sections.append("\n".join(current).strip())
+                current = []
+            current.append(line)
+        if "".join(current).strip():
+            sections.append("\n".join(current).strip())
+
+        merged: List[str] = []
+        for section in sections:
+            if merged and len(merged[-1].split()) < self.polish_section_min_words:
+                merged[-1] += "\n\n" + section
+            else:
+                merged.append(section)
+        return merged
+
+    def _polish_sections(self, content: str) -> List[str]:
+        """Sections to polish concurrently; a single item means whole-document polish"""
+        if len(content.split()) < self.polish_section_threshold:
+            return [content]
+        return self._split_sections(content) or [content]
+
+    async def _polish_request(self, prompt: str) -> str:
+        # Use the same client for polishing
+        response = await self.client.chat.completions.create(
+            model=self.model_name, 
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.choices[0].message.content.strip()
+
+    async def _hedged_polish_request(self, prompt: str) -> str:
+        """
+        Send a second identical request if the first hasn't answered within
+        polish_hedge_after seconds; whichever succeeds first wins.
+        """
+        primary = asyncio.create_task(self._polish_request(prompt))
+        done, _ = await asyncio.wait({primary}, timeout=self.polish_hedge_after)
+        # Only hedge with spare quota; a hedge that waits for budget helps nobody
+        if done or not get_llm_guard().has_headroom():
+            return await primary
+
+        print(f"Polish slower than {self.polish_hedge_after}s, sending hedged request")
+        pending = {primary, asyncio.create_task(self._polish_request(prompt))}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            return primary.result()  # both failed: surface the original error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _polish_text(self, prompt: str, fallback: str) -> str:
+        try:
+            if self.polish_hedge_after > 0:
+                return await self._hedged_polish_request(prompt)
+            return await self._polish_request(prompt)
+        except Exception as e:
+            print(f"Polishing Error: {e}")
+            return fallback # Fallback to raw content if polishing fails
 
     async def polish_with_gemini(self, content: str) -> str:
         """
         Uses Gemini to polish and refine the blog post generated by the SDK.
+        Long posts are split on headings and their sections polished concurrently.
         """
-        # If the content is too short (less than 150 words), it's probably a greeting or clarification, don't polish it as a blog.
-        if len(content.split()) < 150:
+        if not self._should_polish(content):
             return content
 
+        sections = self._polish_sections(content)
+        if len(sections) == 1:
+            return await self._polish_text(self._build_polish_prompt(content), content)
+
+        semaphore = asyncio.Semaphore(self.polish_concurrency)
+
+        async def polish_section(section: str) -> str:
+            async with semaphore:
+                return await self._polish_text(self._build_section_polish_prompt(section), section)
+
+        polished = await asyncio.gather(*(polish_section(section) for section in sections))
+        return "\n\n".join(polished)
+
+    async def _polish_text_stream(self, prompt: str, fallback: str) -> AsyncIterator[Any]:
+        """
+        Yields polished text deltas. If the stream fails, a final PolishFallback
+        carrying `fallback` replaces whatever this stream yielded before.
+        """
         try:
-            polish_prompt = (
-                "You are a professional blog editor. Please polish and refine the following blog post. "
-                "Improve the flow, grammar, and professional tone while keeping the core information intact. "
-                "CRITICAL: Return ONLY the polished blog post as plain text or markdown. "
-                "DO NOT include any introductory sentences, meta-talk, options, or explanations. "
-                "Just the final polished content.\n\n"
-                f"{content}"
-            )
-            
-            # Use the same client for polishing
-            response = await self.client.chat.completions.create(
-                model="gemini-2.5-flash", 
-                messages=[{"role": "user", "content": polish_prompt}]
+            stream = await self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
             )
-            return response.choices[0].message.content.strip()
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
         except Exception as e:
             print(f"Polishing Error: {e}")
-            return content # Fallback to raw content if polishing fails
-    
+            yield PolishFallback(fallback)
+
+    async def polish_with_gemini_stream(self, content: str) -> AsyncIterator[Dict[str, str]]:
+        """
+        Streamed variant of polish_with_gemini.
+        Yields {"delta": ...} items as text arrives, then one {"text": ...} item
+        with the complete result. Sections of long posts are polished
+        concurrently but emitted in order; a section whose stream fails keeps
+        its unpolished text in the result, even if part of it was streamed.
+        """
+        if not self._should_polish(content):
+            yield {"delta": content}
+            yield {"text": content}
+            return
+
+        sections = self._polish_sections(content)
+        if len(sections) == 1:
+            prompt = self._build_polish_prompt(content)
+            parts: List[str] = []
+            async for item in self._polish_text_stream(prompt, content):
+                if isinstance(item, PolishFallback):
+                    if not parts:
+                        yield {"delta": item.text}
+                    parts = [item.text]
+                else:
+                    parts.append(item)
+                    yield {"delta": item}
+            yield {"text": "".join(parts)}
+            return
+
+        semaphore = asyncio.Semaphore(self.polish_concurrency)
+        queues = [asyncio.Queue() for _ in sections]
+
+        async def pump(section: str, queue: asyncio.Queue):
+            try:
+                async with semaphore:
+                    prompt = self._build_section_polish_prompt(section)
+                    async for item in self._polish_text_stream(prompt, section):
+                        queue.put_nowait(item)
+            finally:
+                queue.put_nowait(None)
+
+        tasks = [asyncio.create_task(pump(section, queue)) for section, queue in zip(sections, queues)]
+        polished: List[str] = []
+        try:
+            # Later sections buffer while earlier ones are still being emitted
+            for index, queue in enumerate(queues):
+                if index:
+                    yield {"delta": "\n\n"}
+                parts = []
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    if isinstance(item, PolishFallback):
+                        if not parts:
+                            yield {"delta": item.text}
+                        parts = [item.text]
+                    else:
+                        parts.append(item)
+                        yield {"delta": item}
+                polished.append("".join(parts))
+        finally:
+            for task in tasks:
+                task.cancel()
+        yield {"text": "\n\n".join(polished)}
+
     async def _generate_with_fallback(self, prompt: str) -> str:
-        result = await Runner.run(self.blog_agent, prompt)
+        result = await Runner.run(self.blog_agent, prompt, context=GenerationContext(topic=prompt))
         return result.final_output
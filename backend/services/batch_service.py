@@ -0,0 +1,163 @@
+"""
+Batch blog generation.
+BatchGenerator runs many topics through GeminiAgent.process_topic with a
+concurrency limit and a per-batch rate budget, serving repeats from the
+generation cache when one is given. Web research is fetched once per
+distinct set of topic terms and handed to the agent, so reworded topics in
+a batch ("AI in healthcare", "healthcare AI") share their searches, and a
+topic repeated in a batch is generated once. Persistence is left to the
+caller.
+"""
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from backend.services.generation_cache import GenerationCache, make_generation_key
+from backend.services.research_context import tokenize
+from backend.services.search_cache import normalize_query
+from backend.services.search_service import WebSearchService
+
+
+class RateBudget:
+    """Spaces out acquisitions so no more than `per_minute` happen per minute (0 = unlimited)"""
+
+    def __init__(self, per_minute: float = 0):
+        self.interval = 60.0 / per_minute if per_minute and per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def research_key(topic: str) -> str:
+    """Topic terms, sorted and without stopwords, so word order and filler words don't matter"""
+    return " ".join(sorted(set(tokenize(topic)))) or normalize_query(topic)
+
+
+class SharedResearch:
+    """Runs the web research for each distinct set of topic terms once per batch"""
+
+    def __init__(self, search_service: Optional[WebSearchService] = None):
+        self.search_service = search_service or WebSearchService()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.requests = 0
+
+    async def get(self, topic: str) -> List[Dict]:
+        self.requests += 1
+        key = research_key(topic)
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.search_service.multi_search(topic))
+            self._tasks[key] = task
+        # Shielded so one cancelled item doesn't cancel the search for its siblings
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "searches": len(self._tasks)}
+
+    def cancel(self):
+        """Stop searches still running (the shield keeps them alive past their callers)"""
+        for task in self._tasks.values():
+            task.cancel()
+
+
+class BatchGenerator:
+    """
+    Generates blogs for a list of topics, yielding (index, result) pairs as
+    each one finishes. A failed item yields a result carrying an "error" key;
+    it never stops the rest of the batch.
+    """
+
+    def __init__(
+        self,
+        agent,
+        concurrency: Optional[int] = None,
+        rate_per_minute: Optional[float] = None,
+        research: Optional[SharedResearch] = None,
+        cache: Optional[GenerationCache] = None,
+        use_cache: bool = True,
+        refresh: bool = False,
+    ):
+        self.agent = agent
+        self.concurrency = concurrency or int(os.getenv("BATCH_CONCURRENCY", "4"))
+        if rate_per_minute is None:
+            rate_per_minute = float(os.getenv("BATCH_RATE_PER_MINUTE", "0"))
+        self.rate = RateBudget(rate_per_minute)
+        self.research = research or SharedResearch()
+        self.cache = cache if use_cache else None
+        self.refresh = refresh
+        # Results of generations in progress, by cache key, so repeated topics wait for the first
+        self._generations: Dict[str, asyncio.Future] = {}
+
+    async def _generate(
+        self, semaphore: asyncio.Semaphore, index: int, topic: str, on_start=None
+    ) -> Tuple[int, Dict[str, Any]]:
+        key = None
+        if self.cache is not None:
+            key = make_generation_key(topic, self.agent.model_name, self.agent.prompt_version)
+            shared = self._generations.get(key)
+            if shared is not None:
+                # Shielded so this item's cancellation leaves the first item's result intact
+                result = dict(await asyncio.shield(shared))
+                try:
+                    if on_start is not None:
+                        await on_start(index)
+                except Exception as e:
+                    print(f"Batch item '{topic}' failed: {e}")
+                    result = {"blog_content": "", "image_url": None, "error": str(e)}
+                return index, result
+            shared = self._generations[key] = asyncio.get_running_loop().create_future()
+
+        result = {"blog_content": "", "image_url": None, "error": "Generation cancelled"}
+        try:
+            async with semaphore:
+                try:
+                    if on_start is not None:
+                        await on_start(index)
+                    # Cache hits cost no model calls, so they don't draw on the rate budget
+                    if self.cache is not None and not self.refresh:
+                        cached = await self.cache.lookup(self.agent, topic)
+                        if cached is not None:
+                            result = cached
+                            return index, result
+                    await self.rate.acquire()
+                    research = await self.research.get(topic)
+                    result = await self.agent.process_topic(topic, research=research)
+                    if self.cache is not None:
+                        await self.cache.store(self.agent, topic, result)
+                except Exception as e:
+                    print(f"Batch item '{topic}' failed: {e}")
+                    result = {"blog_content": "", "image_url": None, "error": str(e)}
+                return index, result
+        finally:
+            if key is not None:
+                self._generations.pop(key, None)
+                if not shared.done():
+                    shared.set_result(result)
+
+    async def run(self, topics: List[str], on_start=None) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Generate every topic, at most `concurrency` at a time.
+        `on_start(index)` is awaited when an item leaves the queue.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [
+            asyncio.create_task(self._generate(semaphore, index, topic, on_start))
+            for index, topic in enumerate(topics)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.research.cancel()
+            print(f"Batch research shared: {self.research.stats()}")
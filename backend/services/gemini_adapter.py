@@ -2,8 +2,9 @@
 Gemini API Adapter for OpenAI Agents SDK
 This adapter allows using Gemini API with OpenAI Agent architecture
 """
+import asyncio
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, Optional
 import google.generativeai as genai
 from dotenv import load_dotenv
 
@@ -13,57 +14,86 @@ class GeminiModelAdapter:
     """
     Adapter to make Gemini API compatible with OpenAI Agents SDK
     This allows agents to use Gemini while maintaining OpenAI Agent architecture
+
+    Async calls use the library's native async client, so they never block
+    the event loop; at most `max_concurrency` run at once per adapter.
+    Every call may name its own model; GenerativeModel objects are cached per name.
     """
     
-    def __init__(self, model_name: str = "gemini-pro"):
+    def __init__(self, model_name: Optional[str] = None, max_concurrency: Optional[int] = None):
         self.api_key = os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("❌ GEMINI_API_KEY not found in environment variables")
         
         genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(model_name)
-        self.model_name = model_name
-        print(f"✅ Gemini Model '{model_name}' initialized successfully")
+        self.model_name = model_name or os.getenv("GEMINI_ADAPTER_MODEL", "gemini-pro")
+        self.max_concurrency = max_concurrency or int(os.getenv("GEMINI_ADAPTER_CONCURRENCY", "8"))
+        self._models: Dict[str, genai.GenerativeModel] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.model = self._get_model(self.model_name)
+        print(f"✅ Gemini Model '{self.model_name}' initialized successfully")
+
+    def _get_model(self, model_name: Optional[str] = None) -> genai.GenerativeModel:
+        name = model_name or self.model_name
+        model = self._models.get(name)
+        if model is None:
+            model = genai.GenerativeModel(name)
+            self._models[name] = model
+        return model
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created on first async use so it belongs to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _generation_config(self, temperature: float, max_tokens: Optional[int]):
+        return genai.types.GenerationConfig(
+            temperature=temperature,
+            max_output_tokens=max_tokens or 2048,
+        )
+
+    def _completion(self, text: str, model_name: str) -> Dict[str, Any]:
+        """Return in OpenAI-like format"""
+        return {
+            "id": "gemini-completion",
+            "object": "chat.completion",
+            "model": model_name,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {
+                        "role": "assistant",
+                        "content": text
+                    },
+                    "finish_reason": "stop"
+                }
+            ]
+        }
     
     def create_completion(
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Create a completion using Gemini API
+        Create a completion using Gemini API (blocking; use create_completion_async inside the server)
         Compatible with OpenAI's chat completion format
         """
+        model_name = model or self.model_name
         try:
             # Convert OpenAI format messages to Gemini prompt
             prompt = self._convert_messages_to_prompt(messages)
             
             # Generate content
-            response = self.model.generate_content(
+            response = self._get_model(model_name).generate_content(
                 prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=temperature,
-                    max_output_tokens=max_tokens or 2048,
-                )
+                generation_config=self._generation_config(temperature, max_tokens)
             )
-            
-            # Return in OpenAI-like format
-            return {
-                "id": "gemini-completion",
-                "object": "chat.completion",
-                "model": self.model_name,
-                "choices": [
-                    {
-                        "index": 0,
-                        "message": {
-                            "role": "assistant",
-                            "content": response.text
-                        },
-                        "finish_reason": "stop"
-                    }
-                ]
-            }
+            return self._completion(response.text, model_name)
         except Exception as e:
             print(f"❌ Gemini API Error: {str(e)}")
             raise
@@ -72,12 +102,51 @@ class GeminiModelAdapter:
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None
     ) -> Dict[str, Any]:
         """Async version of create_completion"""
-        # Note: google-generativeai doesn't have native async, 
-        # but we wrap it for compatibility
-        return self.create_completion(messages, temperature, max_tokens)
+        model_name = model or self.model_name
+        prompt = self._convert_messages_to_prompt(messages)
+        try:
+            async with self.semaphore:
+                response = await self._get_model(model_name).generate_content_async(
+                    prompt,
+                    generation_config=self._generation_config(temperature, max_tokens)
+                )
+            return self._completion(response.text, model_name)
+        except Exception as e:
+            print(f"❌ Gemini API Error: {str(e)}")
+            raise
+
+    async def create_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Streamed completion: yields text deltas as Gemini produces them"""
+        model_name = model or self.model_name
+        prompt = self._convert_messages_to_prompt(messages)
+        try:
+            async with self.semaphore:
+                response = await self._get_model(model_name).generate_content_async(
+                    prompt,
+                    generation_config=self._generation_config(temperature, max_tokens),
+                    stream=True
+                )
+                async for chunk in response:
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. the final finish-reason chunk)
+                        continue
+                    if text:
+                        yield text
+        except Exception as e:
+            print(f"❌ Gemini API Error: {str(e)}")
+            raise
     
     def _convert_messages_to_prompt(self, messages: List[Dict[str, str]]) -> str:
         """
@@ -103,8 +172,8 @@ class GeminiModelAdapter:
 _gemini_adapter: Optional[GeminiModelAdapter] = None
 
 def get_gemini_adapter() -> GeminiModelAdapter:
-    """Get or create global Gemini adapter instance"""
+    """Get or create global Gemini adapter instance (pass model= per call to use other models)"""
     global _gemini_adapter
     if _gemini_adapter is None:
         _gemini_adapter = GeminiModelAdapter()
-    return _gemini_adapter
\ No newline at end of file
+    return _gemini_adapter
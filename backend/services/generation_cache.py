@@ -0,0 +1,164 @@
+"""
+Cache of final blog generation results.
+Entries live in the database (generation_cache table) so every worker shares
+them. Keys combine the normalized topic, the model name, the agent's prompt
+version and whether the post was polished, so changing either prompt or
+model never serves stale output.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from backend.database.database import AsyncSessionLocal
+from backend.models.models import GenerationCacheEntry
+from backend.services.metrics import register_cache
+from backend.services.search_cache import normalize_query
+
+
+def make_generation_key(topic: str, model: str, prompt_version: str, polish: bool = True) -> str:
+    raw = f"{normalize_query(topic)}|{model}|{prompt_version}"
+    if not polish:
+        raw += "|unpolished"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """TTL + size-bounded (least recently used first) result cache backed by the database"""
+
+    def __init__(self, ttl_seconds: float = 86400, max_entries: int = 1000, enabled: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.bypasses = 0
+
+    async def lookup(self, agent, topic: str, polish: bool = True) -> Optional[Dict[str, Any]]:
+        """Cached result for this agent's model/prompts, or None. Counts the hit in the same statement."""
+        if not self.enabled:
+            return None
+        key = make_generation_key(topic, agent.model_name, agent.prompt_version, polish)
+        now = datetime.utcnow()
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    update(GenerationCacheEntry)
+                    .where(GenerationCacheEntry.key == key, GenerationCacheEntry.expires_at > now)
+                    .values(hits=GenerationCacheEntry.hits + 1, last_used_at=now)
+                    .returning(GenerationCacheEntry.result)
+                )
+                cached = result.scalar()
+                await db.commit()
+        except Exception as e:
+            print(f"Generation cache lookup failed: {e}")
+            return None
+
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        print(f"Generation cache hit for '{topic}'")
+        return {**json.loads(cached), "cached": True}
+
+    async def store(self, agent, topic: str, result: Dict[str, Any], polish: bool = True):
+        """Save a successful result (errors are never cached) and prune expired/excess entries"""
+        if not self.enabled or result.get("error") or not result.get("blog_content"):
+            return
+        key = make_generation_key(topic, agent.model_name, agent.prompt_version, polish)
+        now = datetime.utcnow()
+        values = {
+            "key": key,
+            "topic": normalize_query(topic)[:500],
+            "model": agent.model_name,
+            "prompt_version": agent.prompt_version,
+            "result": json.dumps({k: v for k, v in result.items() if k != "cached"}),
+            "hits": 0,
+            "created_at": now,
+            "last_used_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl_seconds),
+        }
+        try:
+            async with AsyncSessionLocal() as db:
+                dialect_insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+                stmt = dialect_insert(GenerationCacheEntry).values(**values)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[GenerationCacheEntry.key],
+                    set_={k: stmt.excluded[k] for k in values if k != "key"},
+                )
+                await db.execute(stmt)
+                # Keep the newest max_entries by last use; drop expired ones
+                overflow = (
+                    select(GenerationCacheEntry.key)
+                    .order_by(GenerationCacheEntry.last_used_at.desc())
+                    .offset(self.max_entries)
+                )
+                await db.execute(
+                    delete(GenerationCacheEntry).where(
+                        or_(GenerationCacheEntry.expires_at <= now, GenerationCacheEntry.key.in_(overflow))
+                    )
+                )
+                await db.commit()
+            self.writes += 1
+        except Exception as e:
+            print(f"Generation cache store failed: {e}")
+
+    async def generate(
+        self, agent, topic: str, use_cache: bool = True, refresh: bool = False, polish: bool = True, **kwargs
+    ) -> Dict[str, Any]:
+        """
+        agent.process_topic behind the cache.
+        use_cache=False skips the cache entirely; refresh=True regenerates and overwrites the entry.
+        """
+        if not use_cache:
+            self.bypasses += 1
+            return await agent.process_topic(topic, polish=polish, **kwargs)
+        if not refresh:
+            cached = await self.lookup(agent, topic, polish)
+            if cached is not None:
+                return cached
+        result = await agent.process_topic(topic, polish=polish, **kwargs)
+        await self.store(agent, topic, result, polish)
+        return result
+
+    async def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "writes": self.writes,
+            "bypasses": self.bypasses,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+        }
+        try:
+            async with AsyncSessionLocal() as db:
+                stats["entries"] = (await db.execute(select(func.count()).select_from(GenerationCacheEntry))).scalar()
+        except Exception as e:
+            print(f"Generation cache stats failed: {e}")
+        return stats
+
+
+# Global cache instance
+_generation_cache: Optional[GenerationCache] = None
+
+
+def get_generation_cache() -> GenerationCache:
+    """Get or create the process-wide generation cache configured from environment"""
+    global _generation_cache
+    if _generation_cache is None:
+        _generation_cache = GenerationCache(
+            ttl_seconds=float(os.getenv("GENERATION_CACHE_TTL", "86400")),
+            max_entries=int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "1000")),
+            enabled=os.getenv("GENERATION_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on"),
+        )
+        cache = _generation_cache
+        register_cache("generation", lambda: (cache.hits, cache.misses))
+    return _generation_cache
@@ -0,0 +1,114 @@
+"""
+Shared outbound HTTP transport.
+One HTTPTransport per process owns the pooled clients every service talks
+through, so connections (and their TLS sessions) are reused across requests:
+
+- an httpx client for the Gemini OpenAI-compatible API (HTTP/2 when the
+  optional `h2` package is installed)
+- an aiohttp session for image downloads and the JSON search backend, with
+  per-host limits and a DNS cache
+- a DuckDuckGo AsyncDDGS client, whose own session keeps connections alive
+
+It is started on application startup and closed on shutdown; services
+create anything missing lazily, so scripts can use them without a startup.
+"""
+import importlib.util
+import os
+from typing import Optional
+import aiohttp
+import httpx
+from duckduckgo_search import AsyncDDGS
+
+
+class HTTPTransport:
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        max_per_host: Optional[int] = None,
+        keepalive_seconds: Optional[float] = None,
+        dns_ttl_seconds: Optional[int] = None,
+        http2: Optional[bool] = None,
+    ):
+        self.max_connections = max_connections or int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+        self.max_per_host = max_per_host or int(os.getenv("HTTP_MAX_PER_HOST", "20"))
+        self.keepalive_seconds = keepalive_seconds or float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+        self.dns_ttl_seconds = dns_ttl_seconds or int(os.getenv("HTTP_DNS_TTL", "300"))
+        if http2 is None:
+            http2 = os.getenv("HTTP_HTTP2", "true").strip().lower() in ("1", "true", "yes", "on")
+        if http2 and importlib.util.find_spec("h2") is None:
+            print("HTTP/2 requested but the 'h2' package is not installed, using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+
+        self._openai_client: Optional[httpx.AsyncClient] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ddgs: Optional[AsyncDDGS] = None
+
+    @property
+    def openai_http_client(self) -> httpx.AsyncClient:
+        """httpx client handed to AsyncOpenAI (safe to create before the event loop starts)"""
+        if self._openai_client is None or self._openai_client.is_closed:
+            self._openai_client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    # Everything goes to one host, so the per-host cap bounds idle connections
+                    max_keepalive_connections=self.max_per_host,
+                    keepalive_expiry=self.keepalive_seconds,
+                ),
+                # openai's defaults: long reads for slow generations, quick connects
+                timeout=httpx.Timeout(600.0, connect=5.0),
+                follow_redirects=True,
+            )
+        return self._openai_client
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Pooled aiohttp session (must be first used inside the event loop)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_per_host,
+                keepalive_timeout=self.keepalive_seconds,
+                ttl_dns_cache=self.dns_ttl_seconds,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    @property
+    def ddgs(self) -> AsyncDDGS:
+        if self._ddgs is None:
+            self._ddgs = AsyncDDGS(timeout=int(float(os.getenv("SEARCH_QUERY_TIMEOUT", "10"))))
+        return self._ddgs
+
+    async def start(self):
+        """Open the pools up front (call on application startup)"""
+        self.openai_http_client
+        self.session
+        self.ddgs
+        print(f"HTTP transport ready (HTTP/2 {'on' if self.http2 else 'off'}, {self.max_connections} connections)")
+
+    async def close(self):
+        """Close every pooled client (call on application shutdown)"""
+        if self._openai_client is not None and not self._openai_client.is_closed:
+            await self._openai_client.aclose()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        if self._ddgs is not None:
+            # AsyncDDGS.__aexit__ returns this coroutine without awaiting it
+            await self._ddgs._asession.close()
+        self._openai_client = None
+        self._session = None
+        self._ddgs = None
+
+
+# Global transport instance
+_http_transport: Optional[HTTPTransport] = None
+
+
+def get_http_transport() -> HTTPTransport:
+    """Get or create the process-wide transport configured from environment"""
+    global _http_transport
+    if _http_transport is None:
+        _http_transport = HTTPTransport()
+    return _http_transport
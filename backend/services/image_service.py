@@ -1,42 +1,187 @@
 import os
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 import aiohttp
 import aiofiles
-from datetime import datetime
 import uuid
+from typing import Dict, List, Optional
+from urllib.parse import quote
+from backend.services.http_transport import HTTPTransport, get_http_transport
+from backend.services.metrics import observe_stage
+
+# Pollinations.ai by default; any server exposing GET /prompt/{prompt} works
+IMAGE_API_URL = os.getenv("IMAGE_API_URL", "https://image.pollinations.ai").rstrip("/")
+IMAGE_WIDTH = 1024
+IMAGE_HEIGHT = 1024
+CHUNK_SIZE = 64 * 1024
+
+# Responsive derivatives generated for every saved image: name -> max width
+VARIANT_WIDTHS = {"thumbnail": 320, "card": 640, "full": 1024}
+VARIANT_FORMATS = [
+    fmt.strip().lower()
+    for fmt in os.getenv("IMAGE_VARIANT_FORMATS", "webp,jpeg").split(",")
+    if fmt.strip()
+]
+VARIANT_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+
+def _build_variants(source_path: str, widths: Dict[str, int], formats: List[str]) -> Dict[str, Dict[str, str]]:
+    """
+    Resize one image into the configured widths and formats.
+    Runs inside a worker process; returns {variant: {format: filename}}.
+    """
+    from PIL import Image
+
+    output_dir = os.path.dirname(source_path)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    variants: Dict[str, Dict[str, str]] = {}
+
+    with Image.open(source_path) as original:
+        image = original.convert("RGB")
+        for name, width in widths.items():
+            resized = image
+            if image.width > width:
+                height = round(image.height * width / image.width)
+                resized = image.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                filename = f"{stem}_{name}.{VARIANT_EXTENSIONS.get(fmt, fmt)}"
+                target = os.path.join(output_dir, filename)
+                if not os.path.exists(target):
+                    tmp_path = f"{target}.{uuid.uuid4().hex}.part"
+                    options = {"quality": 80}
+                    if fmt == "jpeg":
+                        options.update(optimize=True, progressive=True)
+                    resized.save(tmp_path, format=fmt.upper(), **options)
+                    os.replace(tmp_path, target)
+                variants.setdefault(name, {})[fmt] = filename
+    return variants
+
 
 class ImageService:
-    def __init__(self):
+    # Downloads in progress, keyed by target filename, so identical prompts share one request
+    _in_flight: Dict[str, asyncio.Future] = {}
+    # Worker processes for CPU-bound image resizing, kept off the event loop
+    _pool: Optional[ProcessPoolExecutor] = None
+
+    def __init__(self, transport: Optional[HTTPTransport] = None):
+        # Pooled session shared with the rest of the app
+        self.transport = transport or get_http_transport()
         # Find project root (one level up from 'backend' or two from 'backend/services')
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         self.output_dir = os.path.join(base_dir, "frontend", "static", "images")
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir, exist_ok=True)
+        self.timeout = float(os.getenv("IMAGE_TIMEOUT", "60"))
+        self.max_bytes = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+
+    @classmethod
+    def _get_pool(cls) -> ProcessPoolExecutor:
+        if cls._pool is None:
+            cls._pool = ProcessPoolExecutor(max_workers=int(os.getenv("IMAGE_VARIANT_WORKERS", "2")))
+        return cls._pool
+
+    @classmethod
+    def shutdown_pool(cls):
+        """Stop the resize worker processes (call on application shutdown)"""
+        if cls._pool is not None:
+            cls._pool.shutdown(wait=False, cancel_futures=True)
+        cls._pool = None
+
+    @staticmethod
+    def _filename_for(prompt: str, params: Dict[str, str]) -> str:
+        """Content-addressed filename: the same prompt and params map to the same file"""
+        key = prompt.strip() + "|" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+        return f"image_{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}.png"
 
     async def generate_image(self, prompt: str) -> str:
         """
         Generate an image based on the prompt.
         Uses Pollinations.ai for high-quality AI images without extra keys.
-        Saves locally to make it downloadable.
+        Saves locally to make it downloadable; repeated prompts reuse the saved file.
         """
+        params = {
+            "width": str(IMAGE_WIDTH),
+            "height": str(IMAGE_HEIGHT),
+            "nologo": "true",
+            "enhance": "true",
+        }
+        filename = self._filename_for(prompt, params)
+        filepath = os.path.join(self.output_dir, filename)
+
+        if os.path.exists(filepath):
+            return f"/static/images/{filename}"
+
+        in_flight = self._in_flight.get(filename)
+        if in_flight is not None:
+            return await asyncio.shield(in_flight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[filename] = future
+        # Waiters get an empty URL if this download fails or is cancelled
+        url = ""
         try:
-            # High-quality image generation via Pollinations.ai
-            # We encode the prompt for URL
-            safe_prompt = prompt.replace(" ", "%20").replace("\n", "%20")
-            image_url = f"https://image.pollinations.ai/prompt/{safe_prompt}?width=1024&height=1024&nologo=true&enhance=true"
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url) as resp:
-                    if resp.status == 200:
-                        filename = f"image_{uuid.uuid4().hex}.png"
-                        filepath = os.path.join(self.output_dir, filename)
-                        
-                        f = await aiofiles.open(filepath, mode='wb')
-                        await f.write(await resp.read())
-                        await f.close()
-                        
-                        # Return relative URL for frontend
-                        return f"/static/images/{filename}"
-            return ""
+            with observe_stage("image"):
+                url = await self._download(prompt, params, filepath)
         except Exception as e:
             print(f"Image generation error: {e}")
-            return ""
+        finally:
+            if not future.done():
+                future.set_result(url)
+            self._in_flight.pop(filename, None)
+        return url
+
+    async def _download(self, prompt: str, params: Dict[str, str], filepath: str) -> str:
+        # High-quality image generation via Pollinations.ai
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        image_url = f"{IMAGE_API_URL}/prompt/{quote(prompt, safe='')}?{query}"
+
+        session = self.transport.session
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with session.get(image_url, timeout=timeout) as resp:
+            if resp.status != 200:
+                print(f"Image service returned HTTP {resp.status}")
+                return ""
+            if resp.content_length and resp.content_length > self.max_bytes:
+                print(f"Image too large: {resp.content_length} bytes")
+                return ""
+
+            # Stream to a temp file and rename once complete so readers never see partial files
+            tmp_path = f"{filepath}.{uuid.uuid4().hex}.part"
+            size = 0
+            try:
+                async with aiofiles.open(tmp_path, mode="wb") as f:
+                    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise ValueError(f"image exceeds {self.max_bytes} bytes")
+                        await f.write(chunk)
+                os.replace(tmp_path, filepath)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        # Return relative URL for frontend
+        return f"/static/images/{os.path.basename(filepath)}"
+
+    async def create_variants(self, image_url: str) -> Dict[str, Dict[str, str]]:
+        """
+        Produce thumbnail/card/full WebP and JPEG derivatives for a saved image.
+        Returns {variant: {format: url}}, or an empty dict if resizing fails.
+        """
+        if not image_url:
+            return {}
+        source_path = os.path.join(self.output_dir, os.path.basename(image_url))
+        try:
+            loop = asyncio.get_running_loop()
+            with observe_stage("image_variants"):
+                filenames = await loop.run_in_executor(
+                    self._get_pool(), _build_variants, source_path, VARIANT_WIDTHS, VARIANT_FORMATS
+                )
+        except Exception as e:
+            print(f"Image variant error: {e}")
+            return {}
+        return {
+            name: {fmt: f"/static/images/{filename}" for fmt, filename in formats.items()}
+            for name, formats in filenames.items()
+        }
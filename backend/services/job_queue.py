@@ -0,0 +1,107 @@
+"""
+Background job queue for blog generation.
+JobQueue is the backend interface; LocalJobQueue runs jobs on a bounded pool
+of asyncio workers inside the API process. An external broker can be plugged
+in later by implementing the same interface.
+"""
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, List, Optional
+
+JobHandler = Callable[[str], Awaitable[None]]
+
+
+class QueueFullError(Exception):
+    """Raised when a job cannot be accepted because the queue is at capacity"""
+
+
+class JobQueue(ABC):
+    """Interface for job queue backends"""
+
+    def __init__(self):
+        self.handler: Optional[JobHandler] = None
+
+    def set_handler(self, handler: JobHandler):
+        """Register the coroutine that executes a job given its id"""
+        self.handler = handler
+
+    @abstractmethod
+    async def enqueue(self, job_id: str):
+        """Accept a job for execution; raises QueueFullError when at capacity"""
+
+    @abstractmethod
+    async def start(self):
+        """Start consuming jobs"""
+
+    @abstractmethod
+    async def stop(self):
+        """Stop consuming jobs; unfinished ones stay queued in the database"""
+
+
+class LocalJobQueue(JobQueue):
+    """In-process queue drained by a fixed number of asyncio workers"""
+
+    def __init__(self, concurrency: int = 2, max_size: int = 100):
+        super().__init__()
+        self.concurrency = concurrency
+        self.max_size = max_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        if self._workers:
+            return
+        # Created here so the queue binds to the server's running event loop
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.concurrency)
+        ]
+        print(f"Job queue started with {self.concurrency} workers")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        print("Job queue stopped")
+
+    async def enqueue(self, job_id: str):
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.max_size} pending jobs)")
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                print(f"Worker {worker_id} running job {job_id}")
+                await self.handler(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The handler records failures itself; this only guards the worker
+                print(f"Job {job_id} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+
+# Global queue instance
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Get or create the process-wide job queue configured from environment"""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = LocalJobQueue(
+            concurrency=int(os.getenv("JOB_WORKERS", "2")),
+            max_size=int(os.getenv("JOB_QUEUE_MAX_SIZE", "100")),
+        )
+    return _job_queue
@@ -0,0 +1,301 @@
+"""
+Resilience layer for Gemini chat completion calls.
+Every request made through GeminiSanitizedClient passes through one
+process-wide LLMGuard, which
+- waits for client-side requests-per-minute and tokens-per-minute budgets,
+  so bursts queue at the quota ceiling instead of collecting 429s
+- retries rate limits, 5xx and connection errors with jittered exponential
+  backoff, honouring Retry-After (and Gemini's retryDelay) when given
+- opens a circuit breaker after repeated upstream failures and fails fast
+  until a probe request succeeds again
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+import openai
+from backend.services.metrics import LLM_CIRCUIT_OPEN, LLM_REQUESTS, LLM_THROTTLE_WAIT
+
+_RETRY_DELAY_RE = re.compile(r'"retryDelay"\s*:\s*"(\d+(?:\.\d+)?)s"')
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit breaker is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Gemini is unavailable (circuit open), retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units per minute up to one minute's worth (0 = unlimited).
+    Waiters are served in arrival order.
+    """
+
+    def __init__(self, per_minute: float = 0):
+        self.rate = per_minute / 60.0 if per_minute and per_minute > 0 else 0.0
+        self.capacity = float(per_minute or 0)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1) -> float:
+        """Take `amount` units, sleeping until they are available; returns seconds waited"""
+        if not self.rate:
+            return 0.0
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        # Holding the lock while sleeping keeps later callers queued behind this one
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                wait = (amount - self.tokens) / self.rate
+                await asyncio.sleep(wait)
+                waited += wait
+                self._refill()
+            self.tokens -= amount
+        return waited
+
+    def adjust(self, amount: float):
+        """Charge (or refund, if negative) units after the fact, e.g. once real usage is known"""
+        if not self.rate:
+            return
+        self._refill()
+        self.tokens = max(-self.capacity, min(self.capacity, self.tokens - amount))
+
+    def pause(self, seconds: float):
+        """Empty the bucket so nothing is admitted for roughly `seconds` (after a 429)"""
+        if not self.rate:
+            return
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half-open after `reset_seconds`, letting one probe through;
+    the probe's outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_call(self) -> bool:
+        """Admit a call or raise CircuitOpenError; True if the call is the half-open probe"""
+        if self.state == "closed" or not self.failure_threshold:
+            return False
+        remaining = self._opened_at + self.reset_seconds - time.monotonic()
+        if self.state == "open" and remaining <= 0:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        raise CircuitOpenError(max(remaining, 1.0))
+
+    def record_success(self):
+        if self.state != "closed":
+            print("Gemini circuit closed")
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+        LLM_CIRCUIT_OPEN.set(0)
+
+    def release_probe(self):
+        """Free the half-open probe slot without an outcome (the probe was cancelled)"""
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or (self.failure_threshold and self.failures >= self.failure_threshold):
+            if self.state != "open":
+                print(f"Gemini circuit opened after {self.failures} failures")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            LLM_CIRCUIT_OPEN.set(1)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and (error.status_code >= 500 or error.status_code == 408)
+
+
+def _counts_against_circuit(error: Exception) -> bool:
+    # 429s mean "over quota", not "down"; only server errors and timeouts trip the breaker
+    return _is_retryable(error) and not isinstance(error, openai.RateLimitError)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-requested delay from Retry-After(-ms) headers or a Gemini RetryInfo body, if any"""
+    if isinstance(error, CircuitOpenError):
+        return error.retry_after
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    body = getattr(error, "body", None)
+    if body is not None:
+        match = _RETRY_DELAY_RE.search(body if isinstance(body, str) else json.dumps(body, default=str))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def is_upstream_unavailable(error: Exception) -> bool:
+    """True for errors meaning "try again later" (open circuit, exhausted retries on 429/5xx)"""
+    return isinstance(error, CircuitOpenError) or _is_retryable(error)
+
+
+def _estimate_tokens(kwargs: Dict[str, Any], expected_completion: int) -> int:
+    # ~4 characters per token over the prompt, tool schemas included
+    size = len(json.dumps(kwargs.get("messages", []), default=str))
+    if kwargs.get("tools"):
+        size += len(json.dumps(kwargs["tools"], default=str))
+    completion = kwargs.get("max_completion_tokens") or kwargs.get("max_tokens") or expected_completion
+    return size // 4 + int(completion)
+
+
+class LLMGuard:
+    """Applies rate budgets, retries and the circuit breaker around one upstream call"""
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_retries: int = 4,
+        retry_base_seconds: float = 1.0,
+        retry_max_seconds: float = 30.0,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        expected_completion_tokens: int = 1024,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.expected_completion_tokens = expected_completion_tokens
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        requested = retry_after_seconds(error)
+        # Full jitter spreads synchronized retries from concurrent generations
+        delay = random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+        if requested is not None:
+            delay = max(delay, requested + random.uniform(0, self.retry_base_seconds))
+        return delay
+
+    async def _admit(self, estimated_tokens: int):
+        waited = await self.requests.acquire(1)
+        waited += await self.tokens.acquire(estimated_tokens)
+        if waited:
+            LLM_THROTTLE_WAIT.observe(waited)
+
+    async def call(self, create: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Run `create(*args, **kwargs)` (a chat.completions.create) under the guard"""
+        estimated = _estimate_tokens(kwargs, self.expected_completion_tokens)
+        attempt = 0
+        while True:
+            try:
+                is_probe = self.breaker.before_call()
+            except CircuitOpenError:
+                LLM_REQUESTS.labels("circuit_open").inc()
+                raise
+            try:
+                await self._admit(estimated)
+                response = await create(*args, **kwargs)
+            except Exception as e:
+                if _counts_against_circuit(e):
+                    self.breaker.record_failure()
+                elif self.breaker.state == "half_open":
+                    # A 4xx/429 still proves the upstream is reachable
+                    self.breaker.record_success()
+                if isinstance(e, openai.RateLimitError):
+                    LLM_REQUESTS.labels("rate_limited").inc()
+                    self.requests.pause(retry_after_seconds(e) or self.retry_base_seconds)
+                if not _is_retryable(e) or attempt >= self.max_retries or self.breaker.state == "open":
+                    LLM_REQUESTS.labels("error").inc()
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                LLM_REQUESTS.labels("retry").inc()
+                print(f"Gemini call failed ({type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled (client disconnect, batch cancel): says nothing about the upstream,
+                # but a cancelled probe must free its slot or the circuit never closes
+                if is_probe:
+                    self.breaker.release_probe()
+                raise
+
+            self.breaker.record_success()
+            LLM_REQUESTS.labels("success").inc()
+            usage = getattr(response, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None):
+                self.tokens.adjust(usage.total_tokens - estimated)
+            return response
+
+    def has_headroom(self) -> bool:
+        """True when an extra (hedged) request would neither queue for budget nor hit an open circuit"""
+        if self.breaker.state != "closed":
+            return False
+        if self.requests.rate:
+            self.requests._refill()
+            return self.requests.tokens >= 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "request_budget": round(self.requests.tokens, 1) if self.requests.rate else None,
+            "token_budget": round(self.tokens.tokens) if self.tokens.rate else None,
+        }
+
+
+# Global guard instance (quotas are per API key, so shared by every client in the process)
+_llm_guard: Optional[LLMGuard] = None
+
+
+def get_llm_guard() -> LLMGuard:
+    """Get or create the process-wide guard configured from environment"""
+    global _llm_guard
+    if _llm_guard is None:
+        _llm_guard = LLMGuard(
+            requests_per_minute=float(os.getenv("GEMINI_RPM", "0")),
+            tokens_per_minute=float(os.getenv("GEMINI_TPM", "0")),
+            max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "4")),
+            retry_base_seconds=float(os.getenv("GEMINI_RETRY_BASE_SECONDS", "1")),
+            retry_max_seconds=float(os.getenv("GEMINI_RETRY_MAX_SECONDS", "30")),
+            failure_threshold=int(os.getenv("GEMINI_CIRCUIT_FAILURES", "5")),
+            reset_seconds=float(os.getenv("GEMINI_CIRCUIT_RESET_SECONDS", "30")),
+            expected_completion_tokens=int(os.getenv("GEMINI_EXPECTED_COMPLETION_TOKENS", "1024")),
+        )
+    return _llm_guard
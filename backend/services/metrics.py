@@ -0,0 +1,174 @@
+"""
+Prometheus metrics.
+Histograms for each generation stage, agent turn, tool call, DB statement and
+HTTP request, plus in-flight generations and cache hit counters. Recording is
+a handful of in-memory increments; text is only rendered when /metrics is
+scraped, and cache counters are read from the caches at that moment.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+
+# Generation stages take seconds to minutes
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+# DB statements and HTTP handlers are usually far faster
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_DURATION = Histogram(
+    "blog_stage_duration_seconds",
+    "Duration of generation stages (search queries, agent runs, polish, images)",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+STAGE_ERRORS = Counter("blog_stage_errors_total", "Generation stages that raised or timed out", ["stage"])
+AGENT_TURN_DURATION = Histogram(
+    "blog_agent_turn_duration_seconds", "Model call time per agent turn", ["agent"], buckets=STAGE_BUCKETS
+)
+TOOL_CALL_DURATION = Histogram(
+    "blog_tool_call_duration_seconds", "Agent tool call duration", ["tool"], buckets=STAGE_BUCKETS
+)
+GENERATIONS_IN_FLIGHT = Gauge("blog_generations_in_flight", "Blog generations currently running")
+LLM_REQUESTS = Counter(
+    "blog_llm_requests_total",
+    "Gemini call attempts by outcome (success, retry, rate_limited, error, circuit_open)",
+    ["outcome"],
+)
+LLM_THROTTLE_WAIT = Histogram(
+    "blog_llm_throttle_wait_seconds",
+    "Time Gemini calls waited for the client-side RPM/TPM budget",
+    buckets=STAGE_BUCKETS,
+)
+LLM_CIRCUIT_OPEN = Gauge("blog_llm_circuit_open", "1 while the Gemini circuit breaker is open")
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Database statement duration by operation and the API route that issued it",
+    ["operation", "route"],
+    buckets=FAST_BUCKETS,
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template (streamed responses until the last byte)",
+    ["method", "route", "status"],
+    buckets=FAST_BUCKETS,
+)
+
+# ASGI scope of the request being served, so DB statements can be attributed to a route
+_current_scope: ContextVar[Optional[dict]] = ContextVar("metrics_scope", default=None)
+
+_DB_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "PRAGMA"}
+
+
+@contextmanager
+def observe_stage(stage: str):
+    """Time the enclosed block into blog_stage_duration_seconds; exceptions also count as errors"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_DURATION.labels(stage).observe(time.perf_counter() - started)
+
+
+def _route_label(scope: Optional[dict]) -> str:
+    if scope is None:
+        return "background"
+    # FastAPI stores the matched route in the scope; the template keeps label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "other"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        token = _current_scope.set(scope)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_DURATION.labels(scope["method"], _route_label(scope), str(status["code"])).observe(
+                time.perf_counter() - started
+            )
+            _current_scope.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("metrics_started")
+    if not stack:
+        return
+    elapsed = time.perf_counter() - stack.pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    if operation not in _DB_OPERATIONS:
+        operation = "OTHER"
+    DB_QUERY_DURATION.labels(operation, _route_label(_current_scope.get())).observe(elapsed)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("metrics_started"):
+        conn.info["metrics_started"].pop()
+
+
+def instrument_engine(sync_engine):
+    """Time every statement run on an engine (pass async_engine.sync_engine for async engines)"""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# name -> callable returning (hits, misses), read at scrape time
+_cache_sources: Dict[str, Callable[[], Tuple[int, int]]] = {}
+
+
+def register_cache(name: str, counters: Callable[[], Tuple[int, int]]):
+    """Expose a cache's hit/miss counters (and hit ratio) under the given name"""
+    _cache_sources[name] = counters
+
+
+class _CacheCollector:
+    def collect(self):
+        hits = CounterMetricFamily("blog_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("blog_cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("blog_cache_hit_ratio", "Cache hits / lookups since start", labels=["cache"])
+        for name, counters in list(_cache_sources.items()):
+            cache_hits, cache_misses = counters()
+            hits.add_metric([name], cache_hits)
+            misses.add_metric([name], cache_misses)
+            lookups = cache_hits + cache_misses
+            ratio.add_metric([name], cache_hits / lookups if lookups else 0.0)
+        yield hits
+        yield misses
+        yield ratio
+
+
+REGISTRY.register(_CacheCollector())
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition-format payload and its content type"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
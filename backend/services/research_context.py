@@ -0,0 +1,150 @@
+"""
+Research context for the blog agent.
+Turns raw search hits into a compact prompt section: snippets are ranked
+against the topic with BM25, near-duplicates (MinHash over word shingles)
+are dropped, and the best remaining ones are packed into a token budget.
+The sources actually used are returned for citation.
+"""
+import hashlib
+import math
+import os
+import random
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+# Universal hashing (a*x + b) mod p over 64-bit shingle hashes; fixed seed so signatures are stable
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(128)]
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in _WORD_RE.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4 + 1 if text else 0
+
+
+def bm25_scores(query: str, documents: Sequence[List[str]], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """Okapi BM25 score of each tokenized document for the query"""
+    if not documents:
+        return []
+    terms = set(tokenize(query))
+    avg_length = sum(len(doc) for doc in documents) / len(documents) or 1.0
+    doc_freq = {term: sum(1 for doc in documents if term in doc) for term in terms}
+    count = len(documents)
+    scores = []
+    for doc in documents:
+        counts: Dict[str, int] = {}
+        for word in doc:
+            if word in terms:
+                counts[word] = counts.get(word, 0) + 1
+        score = 0.0
+        for term, tf in counts.items():
+            idf = math.log(1 + (count - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avg_length))
+        scores.append(score)
+    return scores
+
+
+def minhash_signature(words: List[str], shingle_size: int = 2, num_perm: int = 64) -> List[int]:
+    """MinHash signature over word shingles (the whole text if shorter than one shingle)"""
+    if len(words) < shingle_size:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for shingle in shingles
+    ]
+    return [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS[:num_perm]
+    ]
+
+
+def estimated_similarity(left: List[int], right: List[int]) -> float:
+    """Jaccard similarity estimated from two MinHash signatures"""
+    return sum(1 for x, y in zip(left, right) if x == y) / len(left) if left else 0.0
+
+
+@dataclass
+class ResearchContext:
+    text: str
+    sources: List[Dict[str, str]] = field(default_factory=list)
+    tokens: int = 0
+    duplicates_dropped: int = 0
+    over_budget_dropped: int = 0
+
+
+def build_research_context(
+    topic: str,
+    results: List[Dict[str, str]],
+    token_budget: Optional[int] = None,
+    duplicate_threshold: Optional[float] = None,
+    num_perm: int = 64,
+) -> ResearchContext:
+    """
+    Rank `results` ({"title", "snippet", "link"}) for `topic` and pack them into `token_budget`.
+    Snippets at least `duplicate_threshold` similar to a better-ranked one are dropped.
+    """
+    token_budget = token_budget or int(os.getenv("RESEARCH_CONTEXT_TOKENS", "1200"))
+    if duplicate_threshold is None:
+        # Two-word shingles: lightly reworded copies of a snippet score ~0.6, distinct ones under 0.2
+        duplicate_threshold = float(os.getenv("RESEARCH_DUPLICATE_THRESHOLD", "0.5"))
+    if not results:
+        return ResearchContext(text="")
+
+    documents = [tokenize(f"{r.get('title', '')} {r.get('snippet', '')}") for r in results]
+    scores = bm25_scores(topic, documents)
+    # Ties (e.g. no topic words anywhere) keep the search order
+    ranked = sorted(range(len(results)), key=lambda i: -scores[i])
+    if scores[ranked[0]] > 0:
+        # Snippets sharing no term with the topic are off-topic noise
+        ranked = [i for i in ranked if scores[i] > 0]
+
+    kept: List[int] = []
+    signatures: Dict[int, List[int]] = {}
+    blocks: List[str] = []
+    used = 0
+    context = ResearchContext(text="")
+    for index in ranked:
+        result = results[index]
+        snippet = (result.get("snippet") or "").strip()
+        if not snippet:
+            continue
+        signature = minhash_signature(tokenize(snippet), num_perm=num_perm)
+        if any(estimated_similarity(signature, signatures[other]) >= duplicate_threshold for other in kept):
+            context.duplicates_dropped += 1
+            continue
+
+        header = f"[{len(kept) + 1}] {result.get('title', '')} ({result.get('link', '')})"
+        block = f"{header}\n{snippet}"
+        cost = estimate_tokens(block) + 1
+        if used + cost > token_budget:
+            if kept:
+                # Smaller, lower-ranked snippets may still fit
+                context.over_budget_dropped += 1
+                continue
+            # Always keep the best snippet, trimmed to the budget at a word boundary
+            room = max(0, (token_budget - estimate_tokens(header) - 2) * 4)
+            block = f"{header}\n{snippet[:room].rsplit(' ', 1)[0]}..."
+            cost = estimate_tokens(block) + 1
+
+        kept.append(index)
+        signatures[index] = signature
+        blocks.append(block)
+        used += cost
+        context.sources.append({"title": result.get("title", ""), "link": result.get("link", "")})
+
+    context.text = "\n\n".join(blocks)
+    context.tokens = used
+    return context
@@ -0,0 +1,188 @@
+"""
+TTL/LRU cache for web search results.
+Keeps hot queries in memory and can optionally persist them to a local SQLite
+file so cached results survive restarts and are shared between workers.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Optional, Any
+from backend.services.metrics import register_cache
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share a key"""
+    return " ".join(query.lower().split())
+
+
+def make_cache_key(query: str, max_results: int) -> str:
+    return f"{normalize_query(query)}|{max_results}"
+
+
+class SearchCache:
+    """
+    In-memory LRU with per-entry TTL, optionally backed by SQLite.
+    All public methods are thread-safe.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600,
+        db_path: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if db_path:
+            self._init_db()
+
+    def _init_db(self):
+        try:
+            self._conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        except Exception as e:
+            print(f"Search cache DB disabled: {e}")
+            self._conn = None
+
+    def get_local(self, key: str) -> Optional[List[Dict]]:
+        """Look up the in-memory layer only (safe to call on the event loop)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        """Look up memory first, then the SQLite layer; counts a miss if both fail"""
+        value = self.get_local(key)
+        if value is not None:
+            return value
+
+        value, expires_at = self._db_get(key)
+        if value is not None:
+            with self._lock:
+                self.disk_hits += 1
+            self._store_local(key, value, expires_at)
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: List[Dict]):
+        expires_at = time.time() + self.ttl_seconds
+        self._store_local(key, value, expires_at)
+        self._db_set(key, value, expires_at)
+
+    def _store_local(self, key: str, value: List[Dict], expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _db_get(self, key: str):
+        if self._conn is None:
+            return None, None
+        try:
+            with self._db_lock:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM search_cache WHERE key = ?", (key,)
+                ).fetchone()
+            if row is None or row[1] <= time.time():
+                return None, None
+            return json.loads(row[0]), row[1]
+        except Exception as e:
+            print(f"Search cache read error: {e}")
+            return None, None
+
+    def _db_set(self, key: str, value: List[Dict], expires_at: float):
+        if self._conn is None:
+            return
+        try:
+            with self._db_lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at),
+                )
+                self._writes += 1
+                # Prune expired rows every so often to bound the file size
+                if self._writes % 100 == 0:
+                    self._conn.execute(
+                        "DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),)
+                    )
+                self._conn.commit()
+        except Exception as e:
+            print(f"Search cache write error: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._conn is not None:
+            with self._db_lock:
+                self._conn.execute("DELETE FROM search_cache")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "persistent": self._conn is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+# Global cache instance
+_search_cache: Optional[SearchCache] = None
+
+
+def get_search_cache() -> SearchCache:
+    """Get or create the process-wide search cache configured from environment"""
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = SearchCache(
+            max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "512")),
+            ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+            db_path=os.getenv("SEARCH_CACHE_DB") or None,
+        )
+        cache = _search_cache
+        register_cache("search", lambda: (cache.hits + cache.disk_hits, cache.misses))
+    return _search_cache
@@ -1,66 +1,168 @@
-from duckduckgo_search import DDGS
-from typing import List, Dict
+from typing import List, Dict, Optional
 import asyncio
+import os
+import aiohttp
+from backend.services.http_transport import HTTPTransport, get_http_transport
+from backend.services.metrics import observe_stage
+from backend.services.search_cache import SearchCache, get_search_cache, make_cache_key
+
+# Optional JSON search backend used instead of DuckDuckGo (e.g. a local stand-in for
+# benchmarks): GET {SEARCH_API_URL}?q=...&max_results=N -> [{"title", "body", "href"}]
+SEARCH_API_URL = os.getenv("SEARCH_API_URL")
+
 
 class WebSearchService:
-    def __init__(self):
-        pass
+    # Searches currently running, keyed by cache key, so concurrent identical
+    # queries (e.g. overlapping topics in a batch) share one lookup
+    _in_flight: Dict[str, asyncio.Future] = {}
 
-    async def _run_search(self, query: str, max_results: int) -> List[Dict]:
-        """Runs the search in a thread-safe way"""
-        try:
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, max_results=max_results))
-                return [
-                    {
-                        "title": r.get("title", ""),
-                        "snippet": r.get("body", ""),
-                        "link": r.get("href", ""),
-                    }
-                    for r in results
-                ]
-        except Exception as e:
-            print(f"Search execution error: {e}")
-            return []
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        query_timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        cache: Optional[SearchCache] = None,
+        transport: Optional[HTTPTransport] = None,
+    ):
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("SEARCH_MAX_CONCURRENCY", "3")
+        )
+        self.query_timeout = query_timeout or float(
+            os.getenv("SEARCH_QUERY_TIMEOUT", "10")
+        )
+        # Overall budget for one multi_search (0 = wait for every query)
+        self.deadline = deadline if deadline is not None else float(
+            os.getenv("SEARCH_DEADLINE", "0")
+        )
+        self.cache = cache or get_search_cache()
+        # Pooled clients shared with the rest of the app
+        self.transport = transport or get_http_transport()
 
     async def search_topic(self, query: str, max_results: int = 5) -> List[Dict]:
         """
-        Perform web search on a given topic using synchronous DDGS wrapped in thread
+        Perform web search on a given topic through the shared DuckDuckGo client.
+        Results are served from the search cache when a fresh entry exists.
         """
-        return await asyncio.to_thread(self._sync_search, query, max_results)
+        key = make_cache_key(query, max_results)
+        cached = self.cache.get_local(key)
+        if cached is not None:
+            return cached
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            return await asyncio.shield(in_flight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        # Waiters get an empty list if this lookup is cancelled (e.g. a timeout)
+        results: List[Dict] = []
+        try:
+            results = await self._search_cached(key, query, max_results)
+        finally:
+            future.set_result(results)
+            self._in_flight.pop(key, None)
+        return results
+
+    async def _search_cached(self, key: str, query: str, max_results: int) -> List[Dict]:
+        # A disk-backed cache reads/writes its SQLite file, so keep that off the event loop
+        on_disk = bool(self.cache.db_path)
+        cached = await asyncio.to_thread(self.cache.get, key) if on_disk else self.cache.get(key)
+        if cached is not None:
+            return cached
+        results = await self._search(query, max_results)
+        # Empty lists usually mean a transient failure, so don't pin them
+        if results:
+            if on_disk:
+                await asyncio.to_thread(self.cache.set, key, results)
+            else:
+                self.cache.set(key, results)
+        return results
+
+    async def _http_search(self, query: str, max_results: int) -> List[Dict]:
+        timeout = aiohttp.ClientTimeout(total=self.query_timeout)
+        params = {"q": query, "max_results": str(max_results)}
+        async with self.transport.session.get(SEARCH_API_URL, params=params, timeout=timeout) as resp:
+            resp.raise_for_status()
+            return await resp.json()
 
-    def _sync_search(self, query: str, max_results: int) -> List[Dict]:
+    async def _search(self, query: str, max_results: int) -> List[Dict]:
         try:
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, max_results=max_results))
-                return [
-                    {
-                        "title": r.get("title", ""),
-                        "snippet": r.get("body", ""),
-                        "link": r.get("href", ""),
-                    }
-                    for r in results
-                ]
+            if SEARCH_API_URL:
+                results = await self._http_search(query, max_results)
+            else:
+                results = [r async for r in self.transport.ddgs.text(query, max_results=max_results)]
+            return [
+                {
+                    "title": r.get("title", ""),
+                    "snippet": r.get("body", ""),
+                    "link": r.get("href", ""),
+                }
+                for r in results
+            ]
         except Exception as e:
-            print(f"Sync Search error: {e}")
+            print(f"Search error: {e}")
             return []
 
-    async def multi_search(self, topic: str, num_searches: int = 3) -> List[Dict]:
+    async def _bounded_search(
+        self, semaphore: asyncio.Semaphore, query: str, max_results: int
+    ) -> List[Dict]:
+        async with semaphore:
+            print(f"Searching web for: {query}...")
+            try:
+                with observe_stage("search_query"):
+                    results = await asyncio.wait_for(
+                        self.search_topic(query, max_results=max_results),
+                        timeout=self.query_timeout,
+                    )
+            except asyncio.TimeoutError:
+                print(f"Search timed out after {self.query_timeout}s for '{query}'")
+                return []
+            print(f"Found {len(results)} results for '{query}'")
+            return results
+
+    async def multi_search(
+        self,
+        topic: str,
+        num_searches: int = 3,
+        max_results: int = 3,
+        deadline: Optional[float] = None,
+    ) -> List[Dict]:
         """
-        Perform multiple searches with different query variations
+        Perform multiple searches with different query variations concurrently.
+
+        At most ``max_concurrency`` queries run at once and each is bounded by
+        ``query_timeout``. When a ``deadline`` (seconds, defaulting to
+        SEARCH_DEADLINE) is set, whatever has finished by then is returned and
+        the remaining queries are abandoned.
         """
+        if deadline is None:
+            deadline = self.deadline
         queries = [
             f"{topic}",
             f"{topic} latest research",
             f"{topic} current trends",
         ]
 
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [
+            asyncio.create_task(self._bounded_search(semaphore, query, max_results))
+            for query in queries[:num_searches]
+        ]
+
+        if not deadline:
+            await asyncio.wait(tasks)
+        else:
+            _, pending = await asyncio.wait(tasks, timeout=deadline)
+            if pending:
+                print(f"Search deadline of {deadline}s reached, {len(pending)} queries dropped")
+            for task in pending:
+                task.cancel()
+
+        # Collect in query order so the most relevant variation stays first
         all_results = []
-        for query in queries[:num_searches]:
-            print(f"Searching web for: {query}...")
-            results = await self.search_topic(query, max_results=3)
-            print(f"Found {len(results)} results for '{query}'")
-            all_results.extend(results)
+        for task in tasks:
+            if task.done() and not task.cancelled() and task.exception() is None:
+                all_results.extend(task.result())
 
         # Remove duplicates based on title
         unique_results = []
@@ -0,0 +1 @@
+"""Offline benchmarks: fake upstream servers and a load driver for the API"""
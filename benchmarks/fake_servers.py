@@ -0,0 +1,256 @@
+"""
+Local stand-ins for the services a generation depends on:
+
+- an OpenAI-compatible chat completions endpoint (POST /v1/chat/completions)
+  that replays a scripted sequence of tool calls before answering, with
+  configurable latency and token rate, streamed or not
+- a JSON search backend (GET /search) for SEARCH_API_URL
+- an image server (GET /prompt/{prompt}) for IMAGE_API_URL
+
+Run standalone with `python -m benchmarks.fake_servers --port 9100`.
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+from aiohttp import web
+
+
+@dataclass
+class FakeConfig:
+    llm_latency_ms: float = 400  # time to first token
+    tokens_per_second: float = 200
+    blog_words: int = 900
+    # Tools the fake model calls, one per turn, before writing the post
+    tool_script: List[str] = field(default_factory=lambda: ["search_tool", "image_tool"])
+    # Fraction of LLM requests rejected with 429 + Retry-After (exercises the client's retries)
+    llm_error_rate: float = 0.0
+    llm_retry_after: float = 1.0
+    search_latency_ms: float = 150
+    search_results: int = 3
+    image_latency_ms: float = 800
+    image_size: int = 1024
+
+
+def _words_to_tokens(text: str) -> int:
+    # Rough English average, good enough to pace the fake stream
+    return max(1, int(len(text.split()) * 1.3))
+
+
+def _topic_from(messages: List[Dict[str, Any]]) -> str:
+    for message in messages:
+        if message.get("role") == "user" and isinstance(message.get("content"), str):
+            return message["content"].strip()[:120]
+    return "benchmark topic"
+
+
+def _blog_post(topic: str, words: int) -> str:
+    sections = max(1, words // 150)
+    per_section = max(1, words // sections)
+    filler = "benchmark text describing the topic in useful detail"
+    parts = [f"# {topic}"]
+    for index in range(sections):
+        body = " ".join((filler.split() * (per_section // 8 + 1))[:per_section])
+        parts.append(f"## Section {index + 1}\n\n{body}.")
+    return "\n\n".join(parts)
+
+
+def _tool_arguments(tool: str, topic: str) -> Dict[str, str]:
+    if tool == "search_tool":
+        return {"topic": topic}
+    if tool == "image_tool":
+        return {"prompt": f"Featured illustration for {topic}"}
+    return {}
+
+
+class FakeLLM:
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        self.requests = 0
+        self.rejected = 0
+
+    def _reply(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Next scripted step: a tool call, the blog post, or (no tools) an echoed polish"""
+        messages = body.get("messages", [])
+        if body.get("tools"):
+            done = sum(1 for message in messages if message.get("role") == "tool")
+            topic = _topic_from(messages)
+            if done < len(self.config.tool_script):
+                tool = self.config.tool_script[done]
+                return {
+                    "tool_call": {
+                        "id": f"call_{uuid.uuid4().hex[:12]}",
+                        "type": "function",
+                        "function": {"name": tool, "arguments": json.dumps(_tool_arguments(tool, topic))},
+                    }
+                }
+            return {"content": _blog_post(topic, self.config.blog_words)}
+        # Polish requests: instructions, a blank line, then the text to edit
+        prompt = messages[-1].get("content", "") if messages else ""
+        return {"content": prompt.split("\n\n", 1)[-1]}
+
+    def _delay(self, content: str) -> float:
+        return self.config.llm_latency_ms / 1000 + _words_to_tokens(content) / self.config.tokens_per_second
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        if self.config.llm_error_rate and random.random() < self.config.llm_error_rate:
+            self.rejected += 1
+            return web.json_response(
+                {"error": {"code": 429, "message": "Resource has been exhausted", "status": "RESOURCE_EXHAUSTED"}},
+                status=429,
+                headers={"Retry-After": str(self.config.llm_retry_after)},
+            )
+        reply = self._reply(body)
+        model = body.get("model", "fake-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        content = reply.get("content", "")
+        usage = {
+            "prompt_tokens": sum(_words_to_tokens(str(m.get("content", ""))) for m in body.get("messages", [])),
+            "completion_tokens": _words_to_tokens(content) if content else 10,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not body.get("stream"):
+            await asyncio.sleep(self._delay(content))
+            message: Dict[str, Any] = {"role": "assistant", "content": content or None}
+            if "tool_call" in reply:
+                message["tool_calls"] = [reply["tool_call"]]
+            return web.json_response({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if "tool_call" in reply else "stop",
+                }],
+                "usage": usage,
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def send(delta: Dict[str, Any], finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        await asyncio.sleep(self.config.llm_latency_ms / 1000)
+        if "tool_call" in reply:
+            call = dict(reply["tool_call"], index=0)
+            await send({"role": "assistant", "tool_calls": [call]})
+            await send({}, "tool_calls")
+        else:
+            await send({"role": "assistant", "content": ""})
+            words = content.split(" ")
+            # ~8 words per chunk, paced at tokens_per_second
+            for start in range(0, len(words), 8):
+                piece = " ".join(words[start:start + 8]) + (" " if start + 8 < len(words) else "")
+                await asyncio.sleep(_words_to_tokens(piece) / self.config.tokens_per_second)
+                await send({"content": piece})
+            await send({}, "stop")
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+
+class FakeSearch:
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        self.requests = 0
+
+    async def search(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        query = request.query.get("q", "")
+        count = min(int(request.query.get("max_results", self.config.search_results)), self.config.search_results)
+        await asyncio.sleep(self.config.search_latency_ms / 1000)
+        return web.json_response([
+            {
+                "title": f"{query} - result {index + 1}",
+                "body": f"Background on {query}: finding {index + 1} with supporting detail.",
+                "href": f"https://example.com/{index + 1}?q={query}",
+            }
+            for index in range(count)
+        ])
+
+
+class FakeImages:
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        self.requests = 0
+        self._png = None
+
+    def _image_bytes(self) -> bytes:
+        if self._png is None:
+            from PIL import Image
+
+            buffer = io.BytesIO()
+            size = self.config.image_size
+            Image.new("RGB", (size, size), (64, 96, 160)).save(buffer, format="PNG")
+            self._png = buffer.getvalue()
+        return self._png
+
+    async def prompt(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.config.image_latency_ms / 1000)
+        return web.Response(body=self._image_bytes(), content_type="image/png")
+
+
+def build_app(config: FakeConfig) -> web.Application:
+    llm, search, images = FakeLLM(config), FakeSearch(config), FakeImages(config)
+    app = web.Application()
+    app["fakes"] = {"llm": llm, "search": search, "images": images}
+    app.router.add_post("/v1/chat/completions", llm.chat_completions)
+    app.router.add_get("/search", search.search)
+    app.router.add_get("/prompt/{prompt:.*}", images.prompt)
+    return app
+
+
+def request_counts(app: web.Application) -> Dict[str, int]:
+    counts = {name: fake.requests for name, fake in app["fakes"].items()}
+    counts["llm_rejected"] = app["fakes"]["llm"].rejected
+    return counts
+
+
+async def start_fake_servers(config: FakeConfig, host: str = "127.0.0.1", port: int = 9100) -> web.AppRunner:
+    """Serve the fakes on host:port; call `await runner.cleanup()` to stop"""
+    runner = web.AppRunner(build_app(config), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake LLM/search/image servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--llm-latency-ms", type=float, default=FakeConfig.llm_latency_ms)
+    parser.add_argument("--tokens-per-second", type=float, default=FakeConfig.tokens_per_second)
+    parser.add_argument("--blog-words", type=int, default=FakeConfig.blog_words)
+    parser.add_argument("--llm-error-rate", type=float, default=FakeConfig.llm_error_rate)
+    args = parser.parse_args()
+    config = FakeConfig(
+        llm_latency_ms=args.llm_latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        blog_words=args.blog_words,
+        llm_error_rate=args.llm_error_rate,
+    )
+    web.run_app(build_app(config), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
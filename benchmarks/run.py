@@ -0,0 +1,304 @@
+"""
+Offline benchmark for the API.
+Starts the fake LLM/search/image servers, launches the app with uvicorn
+against them and a throwaway SQLite database, then drives each scenario at
+the requested concurrency and reports throughput and latency percentiles.
+
+    python -m benchmarks.run --concurrency 8 --requests 40
+    python -m benchmarks.run --compare benchmarks/results/baseline.json
+
+Results are saved as JSON; --compare exits non-zero when a scenario's p95
+latency or throughput regresses by more than --threshold percent.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import aiohttp
+from benchmarks.fake_servers import FakeConfig, request_counts, start_fake_servers
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+IMAGES_DIR = os.path.join(ROOT_DIR, "frontend", "static", "images")
+SCENARIOS = ["generate", "blogs", "messages"]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    completed = len(ordered)
+    return {
+        "requests": completed + errors,
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(completed / elapsed, 3) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / completed * 1000, 2) if completed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if completed else 0.0,
+    }
+
+
+async def run_scenario(
+    session: aiohttp.ClientSession,
+    name: str,
+    send: Callable[[aiohttp.ClientSession, int], Any],
+    total: int,
+    concurrency: int,
+    validate: Optional[Callable[[bytes], bool]] = None,
+) -> Dict[str, Any]:
+    """
+    Issue `total` requests from `concurrency` workers; `send(session, i)` returns a request context.
+    `validate(body)` can reject successful-looking responses.
+    """
+    latencies: List[float] = []
+    errors = 0
+    next_index = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for index in next_index:
+            started = time.perf_counter()
+            try:
+                async with send(session, index) as resp:
+                    body = await resp.read()
+                    ok = resp.status < 400 and (validate is None or validate(body))
+            except Exception as e:
+                print(f"  {name} #{index} failed: {e}")
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    stats = summarize(latencies, errors, time.perf_counter() - started)
+    print(
+        f"{name:>10}: {stats['requests']} req, {stats['errors']} err, "
+        f"{stats['throughput_rps']} req/s, p50 {stats['p50_ms']} ms, "
+        f"p95 {stats['p95_ms']} ms, p99 {stats['p99_ms']} ms"
+    )
+    return stats
+
+
+async def wait_for_app(base_url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"App exited during startup with code {process.returncode}")
+            try:
+                async with session.get(f"{base_url}/api/health") as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"App did not become healthy within {timeout}s")
+
+
+def start_app(args, workdir: str) -> subprocess.Popen:
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "GEMINI_API_KEY": "benchmark",
+        "GEMINI_BASE_URL": f"{fake_url}/v1/",
+        "SEARCH_API_URL": f"{fake_url}/search",
+        "IMAGE_API_URL": fake_url,
+    })
+    env.pop("SEARCH_CACHE_DB", None)
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    log = open(os.path.join(workdir, "app.log"), "w")
+    command = [
+        sys.executable, "-m", "uvicorn", "backend.main:app",
+        "--host", "127.0.0.1", "--port", str(args.app_port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return None
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    config = FakeConfig(
+        llm_latency_ms=args.llm_latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        blog_words=args.blog_words,
+        tool_script=[tool for tool in args.tool_script.split(",") if tool],
+        search_latency_ms=args.search_latency_ms,
+        image_latency_ms=args.image_latency_ms,
+        llm_error_rate=args.llm_error_rate,
+    )
+    fakes = await start_fake_servers(config, port=args.fake_port)
+    workdir = tempfile.mkdtemp(prefix="blog-bench-")
+    os.makedirs(IMAGES_DIR, exist_ok=True)
+    images_before = set(os.listdir(IMAGES_DIR))
+    process = start_app(args, workdir)
+    base_url = f"http://127.0.0.1:{args.app_port}"
+    run_id = uuid.uuid4().hex[:8]
+    results: Dict[str, Any] = {}
+
+    try:
+        await wait_for_app(base_url, process)
+        timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        async with aiohttp.ClientSession(base_url=base_url, timeout=timeout, connector=connector) as session:
+            chat_ids: List[int] = []
+
+            def generate(session, index):
+                # Unique topics unless --distinct-topics makes them repeat (exercises the caches)
+                slot = index % args.distinct_topics if args.distinct_topics else index
+                return session.post("/api/generate-blog", json={"topic": f"Benchmark topic {run_id} {slot}"})
+
+            def generated(body):
+                # Agent failures still answer 200, with the error as the content
+                return not json.loads(body).get("content", "").startswith("System Error")
+
+            def blogs(session, index):
+                return session.get("/api/blogs")
+
+            def messages(session, index):
+                return session.get(f"/api/chats/{chat_ids[index % len(chat_ids)]}/messages")
+
+            for scenario in args.scenarios:
+                if scenario == "messages":
+                    async with session.get("/api/chats") as resp:
+                        chat_ids = [chat["id"] for chat in await resp.json()]
+                    if not chat_ids:
+                        print("  messages: skipped, no chats (run 'generate' first)")
+                        continue
+                send = {"generate": generate, "blogs": blogs, "messages": messages}[scenario]
+                total = args.generate_requests if scenario == "generate" else args.requests
+                validate = generated if scenario == "generate" else None
+                results[scenario] = await run_scenario(session, scenario, send, total, args.concurrency, validate)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        upstream = request_counts(fakes.app)
+        await fakes.cleanup()
+        if not args.keep_images:
+            for filename in set(os.listdir(IMAGES_DIR)) - images_before:
+                os.remove(os.path.join(IMAGES_DIR, filename))
+        print(f"App log: {os.path.join(workdir, 'app.log')}")
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "compare")
+        },
+        "upstream_requests": upstream,
+        "scenarios": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    """Print per-scenario deltas against a baseline; True if anything regressed beyond threshold"""
+    regressed = False
+    print(f"\nComparison with baseline {baseline.get('git_commit')} ({baseline.get('timestamp')}):")
+    for name, stats in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            print(f"{name:>10}: no baseline")
+            continue
+        for metric, higher_is_worse in (("p95_ms", True), ("p99_ms", True), ("throughput_rps", False)):
+            old, new = base.get(metric) or 0, stats.get(metric) or 0
+            change = (new - old) / old * 100 if old else 0.0
+            worse = change > threshold if higher_is_worse else change < -threshold
+            # p99 is noisy on short runs; gate on p95 and throughput only
+            flag = "REGRESSION" if worse and metric != "p99_ms" else ""
+            regressed = regressed or bool(flag)
+            print(f"{name:>10} {metric:>15}: {old:>10} -> {new:>10} ({change:+.1f}%) {flag}")
+        if stats.get("errors", 0) > base.get("errors", 0):
+            print(f"{name:>10}: errors increased {base.get('errors', 0)} -> {stats['errors']} REGRESSION")
+            regressed = True
+    return regressed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline API benchmark against local fake upstreams")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated, run in order: {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per read scenario")
+    parser.add_argument("--generate-requests", type=int, default=24, help="requests for the generate scenario")
+    parser.add_argument("--distinct-topics", type=int, default=0,
+                        help="cycle this many topics in 'generate' (0 = every topic unique)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--request-timeout", type=float, default=300)
+    parser.add_argument("--llm-latency-ms", type=float, default=FakeConfig.llm_latency_ms)
+    parser.add_argument("--tokens-per-second", type=float, default=FakeConfig.tokens_per_second)
+    parser.add_argument("--blog-words", type=int, default=FakeConfig.blog_words)
+    parser.add_argument("--tool-script", default="search_tool,image_tool",
+                        help="tools the fake model calls, in order, before answering")
+    parser.add_argument("--llm-error-rate", type=float, default=FakeConfig.llm_error_rate,
+                        help="fraction of LLM calls answered with 429 + Retry-After")
+    parser.add_argument("--search-latency-ms", type=float, default=FakeConfig.search_latency_ms)
+    parser.add_argument("--image-latency-ms", type=float, default=FakeConfig.image_latency_ms)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the app (repeatable), e.g. --env POLISH_CONCURRENCY=8")
+    parser.add_argument("--keep-images", action="store_true", help="keep images the run downloaded")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/bench-<time>.json)")
+    parser.add_argument("--compare", help="baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed regression, percent")
+    args = parser.parse_args(argv)
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmark(args))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
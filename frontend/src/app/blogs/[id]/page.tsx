@@ -3,7 +3,7 @@
 import { useState, useEffect, use } from 'react';
 import Navbar from '@/components/Navbar';
 import Footer from '@/components/Footer';
-import { blogApi, Blog } from '@/lib/api';
+import { blogApi, Blog, BlogSummary } from '@/lib/api';
 import { motion, useScroll, useSpring } from 'framer-motion';
 import ReactMarkdown from 'react-markdown';
 import { Clock, Share2, ArrowLeft, Bookmark, Sparkles, Cpu, Facebook, Twitter, Linkedin, Link2, ArrowRight } from 'lucide-react';
@@ -13,7 +13,7 @@ import { formatDate } from '@/lib/utils';
 export default function BlogDetailPage({ params }: { params: Promise<{ id: string }> }) {
     const { id } = use(params);
     const [blog, setBlog] = useState<Blog | null>(null);
-    const [relatedBlogs, setRelatedBlogs] = useState<Blog[]>([]);
+    const [relatedBlogs, setRelatedBlogs] = useState<BlogSummary[]>([]);
     const [isLoading, setIsLoading] = useState(true);
 
     const { scrollYProgress } = useScroll();
@@ -26,12 +26,12 @@ export default function BlogDetailPage({ params }: { params: Promise<{ id: strin
     useEffect(() => {
         const fetchData = async () => {
             try {
-                const blogs = await blogApi.getAll();
-                const foundBlog = blogs.find(b => b.id === parseInt(id));
-                setBlog(foundBlog || null);
-
-                // Set some related blogs (excluding current)
-                setRelatedBlogs(blogs.filter(b => b.id !== parseInt(id)).slice(0, 3));
+                const [foundBlog, related] = await Promise.all([
+                    blogApi.getById(parseInt(id)),
+                    blogApi.getRelated(parseInt(id), 3)
+                ]);
+                setBlog(foundBlog);
+                setRelatedBlogs(related);
             } catch (error) {
                 console.error('Error fetching blog:', error);
             } finally {
@@ -3,7 +3,7 @@
 import { useState, useEffect, useMemo } from 'react';
 import Navbar from '@/components/Navbar';
 import Footer from '@/components/Footer';
-import { blogApi, chatApi, Blog, Chat } from '@/lib/api';
+import { blogApi, chatApi, assetUrl, BlogSummary, Chat } from '@/lib/api';
 import { motion, AnimatePresence } from 'framer-motion';
 import { Search, ChevronLeft, ChevronRight, User, Sparkles, Filter, Clock, Tag, BookOpen, ArrowRight, MessageSquare, History } from 'lucide-react';
 import Link from 'next/link';
@@ -13,9 +13,11 @@ import { formatDate, cn } from '@/lib/utils';
 const CATEGORIES = ['All', 'AI', 'Technology', 'Innovation', 'Design', 'Marketing'];
 
 export default function BlogsPage() {
-    const [blogs, setBlogs] = useState<Blog[]>([]);
+    const [blogs, setBlogs] = useState<BlogSummary[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const [chats, setChats] = useState<Chat[]>([]);
     const [searchTerm, setSearchTerm] = useState('');
+    const [searchResults, setSearchResults] = useState<BlogSummary[] | null>(null);
     const [selectedCategory, setSelectedCategory] = useState('All');
     const [isLoading, setIsLoading] = useState(true);
     const [currentPage, setCurrentPage] = useState(1);
@@ -24,12 +26,13 @@ export default function BlogsPage() {
     useEffect(() => {
         const fetchData = async () => {
             try {
-                const [blogData, chatData] = await Promise.all([
-                    blogApi.getAll(),
-                    chatApi.getAll()
+                const [blogPage, chatPage] = await Promise.all([
+                    blogApi.getSummaries(blogsPerPage * 4),
+                    chatApi.getPage(4)
                 ]);
-                setBlogs(blogData);
-                setChats(chatData);
+                setBlogs(blogPage.items);
+                setNextCursor(blogPage.next_cursor);
+                setChats(chatPage.items);
             } catch (error) {
                 console.error('Error fetching data:', error);
             } finally {
@@ -39,6 +42,36 @@ export default function BlogsPage() {
         fetchData();
     }, []);
 
+    // Server-side full-text search, debounced while typing
+    useEffect(() => {
+        const term = searchTerm.trim();
+        if (!term) {
+            setSearchResults(null);
+            return;
+        }
+        const handle = setTimeout(async () => {
+            try {
+                setSearchResults(await blogApi.search(term));
+            } catch (error) {
+                console.error('Error searching blogs:', error);
+            }
+        }, 250);
+        return () => clearTimeout(handle);
+    }, [searchTerm]);
+
+    // Fetch the next server page of summaries and move to the following client page
+    const loadMore = async () => {
+        if (!nextCursor) return;
+        try {
+            const blogPage = await blogApi.getSummaries(blogsPerPage * 4, nextCursor);
+            setBlogs(prev => [...prev, ...blogPage.items]);
+            setNextCursor(blogPage.next_cursor);
+            setCurrentPage(p => p + 1);
+        } catch (error) {
+            console.error('Error fetching more blogs:', error);
+        }
+    };
+
     // Helper to "assign" a category based on topic for filtering
     const getBlogCategory = (topic: string) => {
         const t = topic.toLowerCase();
@@ -50,13 +83,11 @@ export default function BlogsPage() {
     };
 
     const filteredBlogs = useMemo(() => {
-        return blogs.filter(blog => {
-            const matchesSearch = blog.topic.toLowerCase().includes(searchTerm.toLowerCase());
+        return (searchResults ?? blogs).filter(blog => {
             const category = getBlogCategory(blog.topic);
-            const matchesCategory = selectedCategory === 'All' || category === selectedCategory;
-            return matchesSearch && matchesCategory;
+            return selectedCategory === 'All' || category === selectedCategory;
         });
-    }, [blogs, searchTerm, selectedCategory]);
+    }, [blogs, searchResults, selectedCategory]);
 
     const totalPages = Math.ceil(filteredBlogs.length / blogsPerPage);
     const currentBlogs = filteredBlogs.slice((currentPage - 1) * blogsPerPage, currentPage * blogsPerPage);
@@ -191,7 +222,7 @@ export default function BlogsPage() {
                                                     {/* Featured Image Replacement */}
                                                     <div className="relative h-40 rounded-[16px] overflow-hidden mb-6 border border-white/5">
                                                         <img
-                                                            src={`https://images.unsplash.com/photo-${1600000000000 + blog.id % 1000}?auto=format&fit=crop&q=80&w=800`}
+                                                            src={blog.thumbnail_url ? assetUrl(blog.thumbnail_url) : `https://images.unsplash.com/photo-${1600000000000 + blog.id % 1000}?auto=format&fit=crop&q=80&w=800`}
                                                             alt={blog.topic}
                                                             className="w-full h-full object-cover grayscale-[0.5] group-hover:grayscale-0 group-hover:scale-110 transition-all duration-700"
                                                         />
@@ -214,7 +245,7 @@ export default function BlogsPage() {
                                                     </h3>
 
                                                     <p className="text-slate-400 font-normal text-[11px] leading-relaxed line-clamp-3 mb-6 uppercase tracking-tight">
-                                                        {blog.content.substring(0, 150).replace(/[#*]/g, '')}...
+                                                        {blog.excerpt}
                                                     </p>
 
                                                     <div className="mt-auto pt-8 border-t border-white/5 flex items-center justify-between">
@@ -231,7 +262,7 @@ export default function BlogsPage() {
                             </div>
 
                             {/* Pagination */}
-                            {totalPages > 1 && (
+                            {(totalPages > 1 || (nextCursor && searchResults === null)) && (
                                 <div className="mt-24 flex items-center justify-center gap-6">
                                     <button
                                         disabled={currentPage === 1}
@@ -257,8 +288,8 @@ export default function BlogsPage() {
                                         ))}
                                     </div>
                                     <button
-                                        disabled={currentPage === totalPages}
-                                        onClick={() => setCurrentPage(p => p + 1)}
+                                        disabled={currentPage >= totalPages && (!nextCursor || searchResults !== null)}
+                                        onClick={() => (currentPage >= totalPages ? loadMore() : setCurrentPage(p => p + 1))}
                                         className="w-14 h-14 rounded-2xl bg-white/5 border border-white/10 flex items-center justify-center disabled:opacity-20 hover:border-blue-500/50 transition-all"
                                     >
                                         <ChevronRight size={24} />
@@ -1,23 +1,54 @@
 import axios from 'axios';
 
 const API_BASE_URL = 'http://localhost:8000/api'; // Adjust if needed
+const ASSET_BASE_URL = API_BASE_URL.replace(/\/api$/, '');
+
+// Image paths from the backend are relative to its origin (e.g. /static/images/...)
+export const assetUrl = (path: string) => (path.startsWith('/') ? `${ASSET_BASE_URL}${path}` : path);
 
 export const api = axios.create({
     baseURL: API_BASE_URL,
 });
 
+export type ImageVariants = Record<string, Record<string, string>>;
+
 export interface Blog {
     id: number;
     topic: string;
     content: string;
+    image_url?: string;
+    image_variants?: ImageVariants;
+    thumbnail_url?: string;
+    timestamp: string;
+}
+
+export interface BlogSummary {
+    id: number;
+    topic: string;
+    excerpt?: string;
+    word_count?: number;
+    image_url?: string;
+    image_variants?: ImageVariants;
+    thumbnail_url?: string;
     timestamp: string;
 }
 
+export interface BlogSearchHit extends BlogSummary {
+    snippet?: string;
+    rank?: number | null;
+}
+
+export interface Page<T> {
+    items: T[];
+    next_cursor: string | null;
+}
+
 export interface Message {
     id: number;
     role: 'user' | 'assistant';
     content: string;
     image_url?: string;
+    image_variants?: ImageVariants;
     created_at: string;
 }
 
@@ -25,6 +56,7 @@ export interface Chat {
     id: number;
     title: string;
     created_at: string;
+    updated_at?: string;
 }
 
 export const blogApi = {
@@ -32,6 +64,22 @@ export const blogApi = {
         const res = await api.get('/blogs');
         return res.data;
     },
+    getById: async (id: number): Promise<Blog> => {
+        const res = await api.get(`/blogs/${id}`);
+        return res.data;
+    },
+    getRelated: async (id: number, limit = 3): Promise<BlogSummary[]> => {
+        const res = await api.get(`/blogs/${id}/related`, { params: { limit } });
+        return res.data;
+    },
+    search: async (q: string, limit = 50): Promise<BlogSearchHit[]> => {
+        const res = await api.get('/blogs/search', { params: { q, limit } });
+        return res.data;
+    },
+    getSummaries: async (limit = 24, cursor?: string | null): Promise<Page<BlogSummary>> => {
+        const res = await api.get('/blogs/summaries', { params: { limit, cursor: cursor || undefined } });
+        return res.data;
+    },
     generate: async (topic: string, chatId?: number) => {
         const res = await api.post('/generate-blog', { topic, chat_id: chatId });
         return res.data;
@@ -43,6 +91,10 @@ export const chatApi = {
         const res = await api.get('/chats');
         return res.data;
     },
+    getPage: async (limit = 20, cursor?: string | null): Promise<Page<Chat>> => {
+        const res = await api.get('/chats/page', { params: { limit, cursor: cursor || undefined } });
+        return res.data;
+    },
     getMessages: async (chatId: number): Promise<Message[]> => {
         const res = await api.get(`/chats/${chatId}/messages`);
         return res.data;
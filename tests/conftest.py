@@ -0,0 +1,32 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# backend.routes.api builds a GeminiAgent at import time; no request ever reaches Gemini in tests
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from backend.database import fulltext  # noqa: E402
+from backend.database.database import AsyncSessionLocal  # noqa: E402
+from backend.database.migrations import run_migrations  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Migrated SQLite database with user 1, bound to AsyncSessionLocal for the test"""
+    path = tmp_path / "app.db"
+    engine = create_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username, email) VALUES (1, 'u', 'u@example.com')"))
+    engine.dispose()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    monkeypatch.setattr(fulltext, "_fts_ready", True)
+    previous = AsyncSessionLocal.kw.get("bind")
+    AsyncSessionLocal.configure(bind=async_engine)
+    yield async_engine
+    AsyncSessionLocal.configure(bind=previous)
+    asyncio.run(async_engine.dispose())
@@ -0,0 +1,98 @@
+import asyncio
+import sys
+import types
+
+import pytest
+
+try:
+    import google.generativeai  # noqa: F401
+except ImportError:
+    # The Gemini SDK is optional and these agents never call it: stand in for its adapter
+    sys.modules.setdefault(
+        "backend.services.gemini_adapter",
+        types.SimpleNamespace(get_gemini_adapter=lambda: None),
+    )
+
+from backend.services import agent_sdk  # noqa: E402
+from backend.services.agent_sdk import Agent, AgentPipeline, RunResult  # noqa: E402
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """Replace model calls: each agent answers '<name>(<input>)' and its start is recorded"""
+    started = []
+    active = {"now": 0, "peak": 0}
+
+    async def fake_run_async(agent, user_input):
+        started.append(agent.name)
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+        return RunResult(agent_name=agent.name, final_output=f"{agent.name}({user_input})", conversation_history=[])
+
+    monkeypatch.setattr(agent_sdk.Runner, "run_async", staticmethod(fake_run_async))
+    return started, active
+
+
+def test_agents_chain_in_order_by_default(runs):
+    pipeline = AgentPipeline("chain")
+    for name in ("a", "b", "c"):
+        pipeline.add_agent(Agent(name, name))
+
+    result = asyncio.run(pipeline.run_pipeline("x"))
+
+    assert result["final_output"] == "c(b(a(x)))"
+    assert list(result["agent_outputs"]) == ["a", "b", "c"]
+    assert result["skipped"] == []
+
+
+def test_independent_branches_run_concurrently_and_fan_in(runs):
+    started, active = runs
+    pipeline = AgentPipeline("fan", max_concurrency=2)
+    for name in ("r0", "r1", "r2"):
+        pipeline.add_agent(Agent(name, name), depends_on=[])
+    pipeline.add_agent(
+        Agent("writer", "w"),
+        depends_on=["r0", "r1", "r2"],
+        merge=lambda task, outputs: "+".join(outputs.values()),
+    )
+
+    result = asyncio.run(pipeline.run_pipeline("x"))
+
+    assert active["peak"] == 2
+    assert started[-1] == "writer"
+    assert result["final_output"] == "writer(r0(x)+r1(x)+r2(x))"
+
+
+def test_handoff_conditions_skip_unmatched_branches(runs):
+    pipeline = AgentPipeline("route")
+    pipeline.add_agent(Agent("classify", "c"), depends_on=[])
+    pipeline.add_agent(Agent("tech", "t"), depends_on=[])
+    pipeline.add_agent(Agent("general", "g"), depends_on=[])
+    pipeline.add_agent(Agent("after_general", "x"))
+    pipeline.add_handoff("classify", "tech", "classify")
+    pipeline.add_handoff("classify", "general", lambda output: "nothing" in output)
+
+    result = asyncio.run(pipeline.run_pipeline("x"))
+
+    assert list(result["agent_outputs"]) == ["classify", "tech"]
+    assert sorted(result["skipped"]) == ["after_general", "general"]
+    assert result["final_output"] == "tech(classify(x))"
+
+
+def test_cycles_and_unknown_agents_are_rejected(runs):
+    started, _ = runs
+    cyclic = AgentPipeline("cycle")
+    cyclic.add_agent(Agent("x", "x"))
+    cyclic.add_agent(Agent("y", "y"))
+    cyclic.add_handoff("y", "x")
+    with pytest.raises(ValueError, match="cycle"):
+        asyncio.run(cyclic.run_pipeline("z"))
+
+    unknown = AgentPipeline("unknown")
+    unknown.add_agent(Agent("x", "x"), depends_on=["missing"])
+    with pytest.raises(ValueError, match="unknown agent 'missing'"):
+        asyncio.run(unknown.run_pipeline("z"))
+
+    assert started == []
@@ -0,0 +1,120 @@
+import asyncio
+
+from sqlalchemy import select
+
+from backend.database.database import AsyncSessionLocal
+from backend.models.models import Blog, GenerationBatch, GenerationJob
+from backend.routes import api
+
+GOOD = {"blog_content": "A post about {topic}.", "image_url": None}
+# NULL content violates blogs.content NOT NULL, so saving this item fails
+BAD = {"blog_content": None, "image_url": None}
+
+
+class FakeGenerator:
+    """Stands in for BatchGenerator: returns canned results for each topic in order"""
+
+    results = {}
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def run(self, topics, on_start=None):
+        for index, topic in enumerate(topics):
+            await on_start(index)
+            result = dict(self.results[topic])
+            if result.get("blog_content"):
+                result["blog_content"] = result["blog_content"].format(topic=topic)
+            yield index, result
+
+
+async def create_batch(topics):
+    async with AsyncSessionLocal() as db:
+        batch = GenerationBatch(
+            id="batch1", user_id=1, status="queued", total=len(topics), succeeded=0, failed=0,
+            concurrency=1, rate_per_minute=0, use_cache=False, refresh=False,
+        )
+        db.add(batch)
+        for i, topic in enumerate(topics):
+            db.add(GenerationJob(
+                id=f"job{i}", user_id=1, batch_id="batch1", topic=topic, status="queued", stage="queued", progress=0,
+            ))
+        await db.commit()
+
+
+async def load_outcome():
+    async with AsyncSessionLocal() as db:
+        batch = await db.get(GenerationBatch, "batch1")
+        jobs = (await db.execute(select(GenerationJob).order_by(GenerationJob.id))).scalars().all()
+        blogs = (await db.execute(select(Blog.topic).order_by(Blog.id))).scalars().all()
+        return batch, {job.topic: job for job in jobs}, blogs
+
+
+def test_one_bad_item_fails_alone(database, monkeypatch):
+    topics = ["alpha", "bad", "gamma", "delta", "epsilon"]
+    FakeGenerator.results = {topic: BAD if topic == "bad" else GOOD for topic in topics}
+    monkeypatch.setattr(api, "BatchGenerator", FakeGenerator)
+    # Several write groups, so items after the failed group must still be saved
+    monkeypatch.setattr(api, "BATCH_WRITE_SIZE", 2)
+
+    async def scenario():
+        await create_batch(topics)
+        await api.run_batch("batch1")
+        return await load_outcome()
+
+    batch, jobs, blogs = asyncio.run(scenario())
+
+    assert batch.status == "completed"
+    assert (batch.succeeded, batch.failed) == (4, 1)
+    assert blogs == ["alpha", "gamma", "delta", "epsilon"]
+    assert jobs["bad"].status == "failed"
+    assert jobs["bad"].error.startswith("Saving failed")
+    for topic in ["alpha", "gamma", "delta", "epsilon"]:
+        assert jobs[topic].status == "succeeded"
+        assert jobs[topic].blog_id is not None
+        assert jobs[topic].chat_id is not None
+
+
+def test_generation_errors_are_recorded_without_saving(database, monkeypatch):
+    topics = ["alpha", "broken"]
+    FakeGenerator.results = {"alpha": GOOD, "broken": {"blog_content": "System Error: quota", "error": "quota"}}
+    monkeypatch.setattr(api, "BatchGenerator", FakeGenerator)
+
+    async def scenario():
+        await create_batch(topics)
+        await api.run_batch("batch1")
+        return await load_outcome()
+
+    batch, jobs, blogs = asyncio.run(scenario())
+
+    assert (batch.succeeded, batch.failed) == (1, 1)
+    assert blogs == ["alpha"]
+    assert (jobs["broken"].status, jobs["broken"].error) == ("failed", "quota")
+
+
+class CrashingGenerator(FakeGenerator):
+    """Finishes the first topic, then fails the way a lost database connection would"""
+
+    async def run(self, topics, on_start=None):
+        await on_start(0)
+        yield 0, {"blog_content": f"A post about {topics[0]}.", "image_url": None}
+        raise RuntimeError("database is locked")
+
+
+def test_unexpected_failure_marks_batch_and_unfinished_jobs_failed(database, monkeypatch):
+    monkeypatch.setattr(api, "BatchGenerator", CrashingGenerator)
+    monkeypatch.setattr(api, "BATCH_WRITE_SIZE", 1)
+
+    async def scenario():
+        await create_batch(["alpha", "beta", "gamma"])
+        await api.run_batch("batch1")
+        return await load_outcome()
+
+    batch, jobs, blogs = asyncio.run(scenario())
+
+    assert batch.status == "failed"
+    assert (batch.succeeded, batch.failed) == (1, 2)
+    assert blogs == ["alpha"]
+    assert jobs["alpha"].status == "succeeded"
+    for topic in ["beta", "gamma"]:
+        assert (jobs[topic].status, jobs[topic].error) == ("failed", "database is locked")
@@ -0,0 +1,117 @@
+import asyncio
+
+from backend.services.batch_service import BatchGenerator, SharedResearch
+
+RESEARCH = [{"title": "t", "snippet": "s", "link": "l"}]
+
+
+class FakeSearchService:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.topics = []
+
+    async def multi_search(self, topic):
+        self.topics.append(topic)
+        await asyncio.sleep(self.delay)
+        return RESEARCH
+
+
+class FakeAgent:
+    model_name = "fake-model"
+    prompt_version = "1"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.topics = []
+
+    async def process_topic(self, topic, research=None):
+        self.topics.append(topic)
+        await asyncio.sleep(self.delay)
+        return {"blog_content": f"A post about {topic}.", "image_url": None}
+
+
+class FakeCache:
+    """In-memory stand-in for GenerationCache's lookup/store"""
+
+    def __init__(self):
+        self.entries = {}
+
+    async def lookup(self, agent, topic, polish=True):
+        return self.entries.get(topic)
+
+    async def store(self, agent, topic, result, polish=True):
+        self.entries[topic] = result
+
+
+def make_generator(agent, search=None, **kwargs):
+    research = SharedResearch(search or FakeSearchService())
+    return BatchGenerator(agent, concurrency=2, rate_per_minute=0, research=research, **kwargs)
+
+
+async def collect(generator, topics, on_start=None):
+    return dict([item async for item in generator.run(topics, on_start=on_start)])
+
+
+def test_failed_start_callback_fails_only_that_item():
+    async def on_start(index):
+        if index == 1:
+            raise RuntimeError("database is locked")
+
+    results = asyncio.run(collect(make_generator(FakeAgent()), ["alpha", "beta", "gamma"], on_start))
+
+    assert results[1]["error"] == "database is locked"
+    assert results[0]["blog_content"] == "A post about alpha."
+    assert results[2]["blog_content"] == "A post about gamma."
+
+
+def test_reworded_topics_share_research():
+    search = FakeSearchService(delay=0.01)
+    generator = make_generator(FakeAgent(), search)
+
+    asyncio.run(collect(generator, ["AI in healthcare", "Healthcare AI", "the AI of healthcare", "solar power"]))
+
+    assert search.topics == ["AI in healthcare", "solar power"]
+    assert generator.research.stats() == {"requests": 4, "searches": 2}
+
+
+def test_repeated_topic_is_generated_once():
+    agent = FakeAgent(delay=0.01)
+    started = []
+
+    async def on_start(index):
+        started.append(index)
+
+    generator = make_generator(agent, cache=FakeCache())
+    results = asyncio.run(collect(generator, ["solar", "wind", "Solar ", "solar"], on_start))
+
+    assert agent.topics == ["solar", "wind"]
+    assert sorted(started) == [0, 1, 2, 3]
+    assert results[2] == results[3] == results[0]
+    assert results[2] is not results[0]
+
+
+def test_repeated_topic_is_generated_each_time_without_cache():
+    agent = FakeAgent()
+
+    asyncio.run(collect(make_generator(agent, cache=FakeCache(), use_cache=False), ["solar", "solar"]))
+
+    assert agent.topics == ["solar", "solar"]
+
+
+def test_stopping_a_batch_cancels_its_research():
+    async def scenario():
+        generator = make_generator(FakeAgent(), FakeSearchService(delay=10))
+        run = generator.run(["solar", "wind"])
+        consumer = asyncio.create_task(run.__anext__())
+        await asyncio.sleep(0.01)
+        searches = list(generator.research._tasks.values())
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+        await run.aclose()
+        await asyncio.sleep(0)
+        return searches
+
+    searches = asyncio.run(scenario())
+
+    assert len(searches) == 2
+    assert all(task.cancelled() for task in searches)
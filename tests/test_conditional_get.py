@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+
+from starlette.requests import Request
+
+from backend.routes.api import _not_modified
+
+ETAG = '"abc123"'
+LAST_MODIFIED = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+def make_request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw})
+
+
+def test_strong_weak_and_wildcard_validators_match():
+    assert _not_modified(make_request(if_none_match='"abc123"'), ETAG, LAST_MODIFIED)
+    assert _not_modified(make_request(if_none_match='W/"abc123"'), ETAG, LAST_MODIFIED)
+    assert _not_modified(make_request(if_none_match='"other", W/"abc123"'), ETAG, LAST_MODIFIED)
+    assert _not_modified(make_request(if_none_match="*"), ETAG, LAST_MODIFIED)
+
+
+def test_other_validators_do_not_match():
+    assert not _not_modified(make_request(if_none_match='"other"'), ETAG, LAST_MODIFIED)
+    assert not _not_modified(make_request(if_none_match='W/"abc1234"'), ETAG, LAST_MODIFIED)
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    request = make_request(if_none_match='"other"', if_modified_since="Tue, 02 Jan 2024 03:04:05 GMT")
+    assert not _not_modified(request, ETAG, LAST_MODIFIED)
+    assert _not_modified(make_request(if_modified_since="Tue, 02 Jan 2024 03:04:05 GMT"), ETAG, LAST_MODIFIED)
@@ -0,0 +1,22 @@
+import asyncio
+
+from sqlalchemy import text
+
+from backend.database import database
+
+
+def test_get_sync_db_binds_engines_on_first_use(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{tmp_path / 'script.db'}")
+    monkeypatch.setattr(database, "engine", None)
+    monkeypatch.setattr(database, "async_engine", None)
+    previous = (database.SessionLocal.kw.get("bind"), database.AsyncSessionLocal.kw.get("bind"))
+    try:
+        sessions = database.get_sync_db()
+        db = next(sessions)
+        assert db.execute(text("SELECT 1")).scalar() == 1
+        sessions.close()
+        assert database.SessionLocal.kw["bind"] is database.engine
+    finally:
+        asyncio.run(database.dispose_engines())
+        database.SessionLocal.configure(bind=previous[0])
+        database.AsyncSessionLocal.configure(bind=previous[1])
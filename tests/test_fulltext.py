@@ -0,0 +1,83 @@
+import asyncio
+
+from backend.database import fulltext
+from backend.database.database import AsyncSessionLocal
+from backend.models.models import Chat
+from backend.routes import api
+
+
+async def seed():
+    """Chat 1 with a blog and its prompt/reply messages, indexed as the API writes them"""
+    async with AsyncSessionLocal() as db:
+        db.add(Chat(id=1, user_id=1, title="Energy"))
+        await db.flush()
+        await api._add_user_message(db, 1, "solar panels")
+        await api._save_generations(
+            db, 1,
+            [(1, "Solar panels", {"blog_content": "Photovoltaic cells convert sunlight into electricity."}),
+             (1, "Wind farms", {"blog_content": "Turbines harvest offshore wind at scale."})],
+        )
+        await db.commit()
+
+
+async def search(kind, query):
+    async with AsyncSessionLocal() as db:
+        if kind == "blogs":
+            return await api.search_blogs(q=query, user_id=1, limit=10, offset=0, db=db)
+        return await api.search_messages(q=query, user_id=1, limit=10, offset=0, db=db)
+
+
+def test_blog_search_ranks_and_highlights(database):
+    async def scenario():
+        await seed()
+        return await search("blogs", "sunlight"), await search("blogs", "turbine"), await search("blogs", "nuclear")
+
+    sunlight, turbine, nuclear = asyncio.run(scenario())
+
+    assert [hit["topic"] for hit in sunlight] == ["Solar panels"]
+    assert "<mark>sunlight</mark>" in sunlight[0]["snippet"]
+    # Porter stemming: "turbine" matches "Turbines"
+    assert [hit["topic"] for hit in turbine] == ["Wind farms"]
+    assert nuclear == []
+
+
+def test_edited_and_deleted_messages_are_reindexed(database):
+    async def scenario():
+        await seed()
+        [hit] = await search("messages", "photovoltaic")
+        async with AsyncSessionLocal() as db:
+            await api.edit_message(hit["id"], "Geothermal plants tap heat from deep rock.", db=db)
+        after_edit = await search("messages", "photovoltaic"), await search("messages", "geothermal")
+        async with AsyncSessionLocal() as db:
+            await api.delete_message(hit["id"], db=db)
+        return after_edit, await search("messages", "geothermal")
+
+    (old_text, new_text), after_delete = asyncio.run(scenario())
+
+    assert old_text == []
+    assert len(new_text) == 1
+    assert after_delete == []
+
+
+def test_search_input_cannot_inject_fts_syntax(database):
+    async def scenario():
+        await seed()
+        return await search("blogs", 'sunlight" OR content:*'), await search("blogs", "***")
+
+    injected, punctuation_only = asyncio.run(scenario())
+
+    assert injected == []
+    assert punctuation_only == []
+
+
+def test_like_fallback_when_fulltext_is_unavailable(database, monkeypatch):
+    async def scenario():
+        await seed()
+        monkeypatch.setattr(fulltext, "_fts_ready", False)
+        return await search("blogs", "offshore wind")
+
+    hits = asyncio.run(scenario())
+
+    assert [hit["topic"] for hit in hits] == ["Wind farms"]
+    assert hits[0]["rank"] is None
+    assert "<mark>offshore</mark>" in hits[0]["snippet"]
@@ -0,0 +1,47 @@
+import asyncio
+
+from backend.services.image_service import ImageService
+
+
+class SlowImageService(ImageService):
+    def __init__(self, output_dir):
+        super().__init__()
+        self.output_dir = str(output_dir)
+        self.downloads = 0
+
+    async def _download(self, prompt, params, filepath):
+        self.downloads += 1
+        await asyncio.sleep(10)
+        return "/static/images/never.png"
+
+
+def test_waiters_are_released_when_owner_is_cancelled(tmp_path):
+    async def scenario():
+        service = SlowImageService(tmp_path)
+        owner = asyncio.create_task(service.generate_image("a lighthouse at dusk"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(service.generate_image("a lighthouse at dusk"))
+        await asyncio.sleep(0)
+
+        owner.cancel()
+        assert await asyncio.wait_for(waiter, timeout=1) == ""
+        assert service.downloads == 1
+        assert not ImageService._in_flight
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_identical_prompts_share_one_download(tmp_path):
+    class FastImageService(SlowImageService):
+        async def _download(self, prompt, params, filepath):
+            self.downloads += 1
+            await asyncio.sleep(0.01)
+            return "/static/images/shared.png"
+
+    async def scenario():
+        service = FastImageService(tmp_path)
+        urls = await asyncio.gather(*(service.generate_image("same prompt") for _ in range(5)))
+        assert urls == ["/static/images/shared.png"] * 5
+        assert service.downloads == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from backend.services.job_queue import LocalJobQueue, QueueFullError
+
+
+def test_runs_jobs_with_bounded_concurrency():
+    async def scenario():
+        queue = LocalJobQueue(concurrency=2, max_size=10)
+        running, peak, done = 0, 0, []
+
+        async def handler(job_id):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            done.append(job_id)
+
+        queue.set_handler(handler)
+        await queue.start()
+        for i in range(6):
+            await queue.enqueue(f"job{i}")
+        await queue._queue.join()
+        await queue.stop()
+        return peak, sorted(done)
+
+    peak, done = asyncio.run(scenario())
+
+    assert peak == 2
+    assert done == [f"job{i}" for i in range(6)]
+
+
+def test_rejects_jobs_beyond_capacity():
+    async def scenario():
+        queue = LocalJobQueue(concurrency=1, max_size=2)
+        release = asyncio.Event()
+
+        async def handler(job_id):
+            await release.wait()
+
+        queue.set_handler(handler)
+        await queue.start()
+        await queue.enqueue("running")
+        await asyncio.sleep(0)
+        await queue.enqueue("pending1")
+        await queue.enqueue("pending2")
+        with pytest.raises(QueueFullError):
+            await queue.enqueue("overflow")
+        release.set()
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_enqueue_before_start_fails():
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await LocalJobQueue().enqueue("job")
+
+    asyncio.run(scenario())
+
+
+def test_a_crashing_job_does_not_stop_its_worker():
+    async def scenario():
+        queue = LocalJobQueue(concurrency=1, max_size=10)
+        done = []
+
+        async def handler(job_id):
+            if job_id == "bad":
+                raise ValueError("boom")
+            done.append(job_id)
+
+        queue.set_handler(handler)
+        await queue.start()
+        for job_id in ["bad", "good"]:
+            await queue.enqueue(job_id)
+        await queue._queue.join()
+        await queue.stop()
+        return done
+
+    assert asyncio.run(scenario()) == ["good"]
@@ -0,0 +1,80 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+from backend.database.database import AsyncSessionLocal
+from backend.models.models import Blog, Chat, GenerationJob
+from backend.routes import api
+
+
+class FakeAgent:
+    """Streams a canned result without calling Gemini; counts generations"""
+
+    model_name = "fake-model"
+    prompt_version = "test"
+
+    def __init__(self, result):
+        self.result = result
+        self.runs = []
+
+    async def process_topic_stream(self, topic, polish=True):
+        self.runs.append((topic, polish))
+        yield {"event": "search_started", "data": {}}
+        yield {"event": "result", "data": dict(self.result, blog_content=self.result["blog_content"].format(topic=topic))}
+
+
+async def run_job(**options):
+    job_id = f"job-{options.pop('name')}"
+    async with AsyncSessionLocal() as db:
+        if await db.get(Chat, 1) is None:
+            db.add(Chat(id=1, user_id=1, title="solar power"))
+        db.add(GenerationJob(
+            id=job_id, user_id=1, chat_id=1, topic="solar power", status="queued", stage="queued",
+            progress=0, **options,
+        ))
+        await db.commit()
+    await api.run_generation_job(job_id)
+    async with AsyncSessionLocal() as db:
+        job = await db.get(GenerationJob, job_id)
+        blogs = await db.scalar(select(func.count()).select_from(Blog))
+        return job, blogs
+
+
+def test_jobs_use_the_generation_cache(database, monkeypatch):
+    agent = FakeAgent({"blog_content": "A post about {topic}.", "image_url": None})
+    monkeypatch.setattr(api, "ai_agent", agent)
+
+    async def scenario():
+        first, _ = await run_job(name="first")
+        second, _ = await run_job(name="second")
+        uncached, _ = await run_job(name="uncached", use_cache=False)
+        refreshed, blogs = await run_job(name="refreshed", refresh=True)
+        return first, second, uncached, refreshed, blogs
+
+    first, second, uncached, refreshed, blogs = asyncio.run(scenario())
+
+    assert [job.status for job in (first, second, uncached, refreshed)] == ["succeeded"] * 4
+    assert blogs == 4
+    # "second" was served from the cache entry "first" stored
+    assert len(agent.runs) == 3
+
+
+def test_polish_option_is_passed_to_the_agent(database, monkeypatch):
+    agent = FakeAgent({"blog_content": "Draft about {topic}.", "image_url": None})
+    monkeypatch.setattr(api, "ai_agent", agent)
+
+    job, _ = asyncio.run(run_job(name="draft", polish=False, use_cache=False))
+
+    assert job.status == "succeeded"
+    assert agent.runs == [("solar power", False)]
+
+
+def test_failed_generation_fails_the_job_without_saving(database, monkeypatch):
+    agent = FakeAgent({"blog_content": "System Error: quota", "image_url": None, "error": "quota", "retry_after": 30})
+    monkeypatch.setattr(api, "ai_agent", agent)
+
+    job, blogs = asyncio.run(run_job(name="quota"))
+
+    assert (job.status, job.stage, job.error) == ("failed", "failed", "quota")
+    assert job.blog_id is None
+    assert blogs == 0
@@ -0,0 +1,173 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from backend.services.llm_resilience import CircuitOpenError, LLMGuard
+
+RESET_SECONDS = 0.05
+
+
+def server_error() -> openai.InternalServerError:
+    response = httpx.Response(503, request=httpx.Request("POST", "http://gemini.test"))
+    return openai.InternalServerError("unavailable", response=response, body=None)
+
+
+def rate_limited() -> openai.RateLimitError:
+    response = httpx.Response(429, request=httpx.Request("POST", "http://gemini.test"))
+    return openai.RateLimitError("quota", response=response, body=None)
+
+
+class FakeUpstream:
+    """Stands in for chat.completions.create: fails with queued errors, then answers"""
+
+    def __init__(self, errors=(), delay: float = 0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def make_guard(**overrides) -> LLMGuard:
+    options = dict(max_retries=0, retry_base_seconds=0, failure_threshold=3, reset_seconds=RESET_SECONDS)
+    options.update(overrides)
+    return LLMGuard(**options)
+
+
+async def open_circuit(guard: LLMGuard):
+    upstream = FakeUpstream([server_error() for _ in range(guard.breaker.failure_threshold)])
+    for _ in range(guard.breaker.failure_threshold):
+        with pytest.raises(openai.InternalServerError):
+            await guard.call(upstream.create)
+    assert guard.breaker.state == "open"
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    async def scenario():
+        guard = make_guard()
+        await open_circuit(guard)
+        upstream = FakeUpstream()
+        with pytest.raises(CircuitOpenError):
+            await guard.call(upstream.create)
+        assert upstream.calls == 0
+
+    asyncio.run(scenario())
+
+
+def test_successful_probe_closes_the_circuit():
+    async def scenario():
+        guard = make_guard()
+        await open_circuit(guard)
+        await asyncio.sleep(RESET_SECONDS)
+
+        assert await guard.call(FakeUpstream().create) == "ok"
+        assert guard.breaker.state == "closed"
+        assert guard.breaker.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_probe_reopens_the_circuit():
+    async def scenario():
+        guard = make_guard()
+        await open_circuit(guard)
+        await asyncio.sleep(RESET_SECONDS)
+
+        with pytest.raises(openai.InternalServerError):
+            await guard.call(FakeUpstream([server_error()]).create)
+        assert guard.breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            await guard.call(FakeUpstream().create)
+
+    asyncio.run(scenario())
+
+
+def test_half_open_lets_a_single_probe_through():
+    async def scenario():
+        guard = make_guard()
+        await open_circuit(guard)
+        await asyncio.sleep(RESET_SECONDS)
+
+        probe = asyncio.create_task(guard.call(FakeUpstream(delay=0.05).create))
+        await asyncio.sleep(0.01)
+        assert guard.breaker.state == "half_open"
+        with pytest.raises(CircuitOpenError):
+            await guard.call(FakeUpstream().create)
+        assert await probe == "ok"
+        assert guard.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_probe_lets_the_next_call_probe():
+    async def scenario():
+        guard = make_guard()
+        await open_circuit(guard)
+        await asyncio.sleep(RESET_SECONDS)
+
+        probe = asyncio.create_task(guard.call(FakeUpstream(delay=10).create))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        # The cancellation is not an upstream failure, and the probe slot is free again
+        assert guard.breaker.state == "half_open"
+        assert await guard.call(FakeUpstream().create) == "ok"
+        assert guard.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_probe_cancelled_while_waiting_for_rate_budget_frees_the_slot():
+    async def scenario():
+        guard = make_guard(requests_per_minute=60)
+        await open_circuit(guard)
+        await asyncio.sleep(RESET_SECONDS)
+
+        guard.requests.pause(60)
+        probe = asyncio.create_task(guard.call(FakeUpstream().create))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        guard.requests.tokens = guard.requests.capacity
+        assert await guard.call(FakeUpstream().create) == "ok"
+        assert guard.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_rate_limits_are_retried_without_opening_the_circuit():
+    async def scenario():
+        guard = make_guard(max_retries=5, failure_threshold=2)
+        upstream = FakeUpstream([rate_limited() for _ in range(4)])
+
+        assert await guard.call(upstream.create) == "ok"
+        assert upstream.calls == 5
+        assert guard.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_client_errors_are_not_retried():
+    async def scenario():
+        guard = make_guard(max_retries=5)
+        response = httpx.Response(400, request=httpx.Request("POST", "http://gemini.test"))
+        upstream = FakeUpstream([openai.BadRequestError("bad", response=response, body=None)])
+
+        with pytest.raises(openai.BadRequestError):
+            await guard.call(upstream.create)
+        assert upstream.calls == 1
+        assert guard.breaker.failures == 0
+
+    asyncio.run(scenario())
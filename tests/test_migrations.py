@@ -0,0 +1,90 @@
+from sqlalchemy import create_engine, inspect, text
+
+from backend.database.migrations import LATEST_VERSION, MIGRATIONS, run_migrations
+from backend.models.models import Base
+
+
+def make_engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+
+
+def applied_versions(engine):
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+
+def test_fresh_database_matches_models(tmp_path):
+    engine = make_engine(tmp_path)
+    run_migrations(engine)
+
+    assert applied_versions(engine) == list(range(1, LATEST_VERSION + 1))
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        assert {column.name for column in table.columns} <= columns, table.name
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= indexes, table.name
+    assert inspector.has_table("blogs_fts")
+    assert inspector.has_table("messages_fts")
+
+
+def test_second_run_applies_nothing(tmp_path, capsys):
+    engine = make_engine(tmp_path)
+    run_migrations(engine)
+    capsys.readouterr()
+
+    run_migrations(engine)
+    assert "Applying migration" not in capsys.readouterr().out
+    assert applied_versions(engine) == list(range(1, LATEST_VERSION + 1))
+
+
+def test_upgrades_a_database_that_predates_migrations(tmp_path):
+    engine = make_engine(tmp_path)
+    # Schema written by the app's original create_all, without any schema_migrations table
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(100) NOT NULL UNIQUE, "
+            "email VARCHAR(100) NOT NULL UNIQUE, created_at DATETIME)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE chats (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), "
+            "title VARCHAR(200) NOT NULL, created_at DATETIME, updated_at DATETIME)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE messages (id INTEGER PRIMARY KEY, chat_id INTEGER NOT NULL REFERENCES chats (id), "
+            "role VARCHAR(20) NOT NULL, content TEXT NOT NULL, created_at DATETIME)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE blogs (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), "
+            "chat_id INTEGER REFERENCES chats (id), topic VARCHAR(500) NOT NULL, content TEXT NOT NULL, "
+            "timestamp DATETIME)"
+        ))
+        conn.execute(text("INSERT INTO users (id, username, email) VALUES (1, 'u', 'u@example.com')"))
+        conn.execute(text("INSERT INTO chats (id, user_id, title) VALUES (1, 1, 'Solar')"))
+        conn.execute(text(
+            "INSERT INTO blogs (id, user_id, chat_id, topic, content) "
+            "VALUES (1, 1, 1, 'Solar power', '# Solar\nPanels turn sunlight into power.')"
+        ))
+
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT excerpt, word_count FROM blogs WHERE id = 1")).one()
+        assert row.word_count == 7
+        assert row.excerpt == "Solar Panels turn sunlight into power."
+        hits = conn.execute(text("SELECT rowid FROM blogs_fts WHERE blogs_fts MATCH 'sunlight'")).all()
+        assert [hit[0] for hit in hits] == [1]
+    assert "image_variants" in {column["name"] for column in inspect(engine).get_columns("messages")}
+
+
+def test_initial_migration_is_pinned_to_the_original_schema(tmp_path):
+    engine = make_engine(tmp_path)
+    with engine.begin() as conn:
+        MIGRATIONS[0].upgrade(conn)
+
+    inspector = inspect(engine)
+    assert set(inspector.get_table_names()) == {"users", "chats", "messages", "blogs", "generation_jobs"}
+    # Added by later migrations, so they must not exist yet
+    assert "excerpt" not in {column["name"] for column in inspector.get_columns("blogs")}
+    assert "batch_id" not in {column["name"] for column in inspector.get_columns("generation_jobs")}
+    assert "ix_messages_chat_id_created_at" not in {index["name"] for index in inspector.get_indexes("messages")}
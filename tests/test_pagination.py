@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from backend.database.database import AsyncSessionLocal
+from backend.models.models import Blog, Chat
+from backend.routes import api
+
+START = datetime(2024, 5, 1, 12, 0, 0)
+
+
+async def add_blogs(timestamps):
+    async with AsyncSessionLocal() as db:
+        for i, timestamp in enumerate(timestamps, start=1):
+            db.add(Blog(id=i, user_id=1, topic=f"topic {i}", content=f"content {i}", timestamp=timestamp,
+                        **Blog.summary_fields(f"content {i}")))
+        await db.commit()
+
+
+async def walk_blog_pages(limit):
+    pages, cursor = [], None
+    async with AsyncSessionLocal() as db:
+        while True:
+            page = await api.get_blog_summaries(user_id=1, limit=limit, cursor=cursor, db=db)
+            pages.append([item.id for item in page["items"]])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages
+
+
+def test_blog_pages_are_newest_first_and_break_ties_by_id(database):
+    # Blogs 2-4 share a timestamp, so the id decides their order and the page boundary
+    timestamps = [START, START + timedelta(minutes=1), START + timedelta(minutes=1),
+                  START + timedelta(minutes=1), START + timedelta(minutes=2)]
+
+    async def scenario():
+        await add_blogs(timestamps)
+        return await walk_blog_pages(limit=2)
+
+    assert asyncio.run(scenario()) == [[5, 4], [3, 2], [1]]
+
+
+def test_exact_multiple_of_the_page_size_has_no_empty_last_page(database):
+    async def scenario():
+        await add_blogs([START + timedelta(minutes=i) for i in range(4)])
+        return await walk_blog_pages(limit=2)
+
+    assert asyncio.run(scenario()) == [[4, 3], [2, 1]]
+
+
+def test_chat_pages_follow_updated_at(database):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            for i, minutes in enumerate([3, 1, 2], start=1):
+                stamp = START + timedelta(minutes=minutes)
+                db.add(Chat(id=i, user_id=1, title=f"chat {i}", created_at=START, updated_at=stamp))
+            await db.commit()
+            first = await api.get_chats_page(user_id=1, limit=2, cursor=None, db=db)
+            second = await api.get_chats_page(user_id=1, limit=2, cursor=first["next_cursor"], db=db)
+        return [chat.id for chat in first["items"]], [chat.id for chat in second["items"]], second["next_cursor"]
+
+    assert asyncio.run(scenario()) == ([1, 3], [2], None)
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        api._decode_cursor("not-a-cursor")
+    assert error.value.status_code == 400
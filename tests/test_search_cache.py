@@ -0,0 +1,41 @@
+import time
+
+from backend.services.search_cache import SearchCache, make_cache_key
+
+RESULTS = [{"title": "t", "snippet": "s", "link": "l"}]
+
+
+def test_equivalent_queries_share_a_key():
+    assert make_cache_key("  Solar   POWER ", 3) == make_cache_key("solar power", 3)
+    assert make_cache_key("solar power", 3) != make_cache_key("solar power", 5)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SearchCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", RESULTS)
+    cache.set("b", RESULTS)
+    cache.get("a")
+    cache.set("c", RESULTS)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == RESULTS
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire(monkeypatch):
+    cache = SearchCache(max_entries=10, ttl_seconds=60)
+    cache.set("a", RESULTS)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_disk_layer_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "search.db")
+    SearchCache(db_path=path).set("a", RESULTS)
+
+    fresh = SearchCache(db_path=path)
+    assert fresh.get("a") == RESULTS
+    assert fresh.stats()["disk_hits"] == 1
@@ -0,0 +1,45 @@
+import asyncio
+
+from backend.services.search_cache import SearchCache
+from backend.services.search_service import WebSearchService
+
+RESULTS = [{"title": "t", "snippet": "s", "link": "l"}]
+
+
+class FakeSearchService(WebSearchService):
+    def __init__(self, delay):
+        super().__init__(cache=SearchCache(max_entries=10, ttl_seconds=60))
+        self.delay = delay
+        self.searches = 0
+
+    async def _search(self, query, max_results):
+        self.searches += 1
+        await asyncio.sleep(self.delay)
+        return RESULTS
+
+
+def test_concurrent_identical_searches_share_one_lookup():
+    async def scenario():
+        service = FakeSearchService(delay=0.01)
+        results = await asyncio.gather(*(service.search_topic("solar") for _ in range(4)))
+        return service.searches, results
+
+    searches, results = asyncio.run(scenario())
+
+    assert searches == 1
+    assert results == [RESULTS] * 4
+
+
+def test_waiters_are_released_when_the_search_owner_is_cancelled():
+    async def scenario():
+        service = FakeSearchService(delay=10)
+        owner = asyncio.create_task(service.search_topic("wind"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(service.search_topic("wind"))
+        await asyncio.sleep(0)
+
+        owner.cancel()
+        assert await asyncio.wait_for(waiter, timeout=1) == []
+        assert not WebSearchService._in_flight
+
+    asyncio.run(scenario())
@@ -0,0 +1,122 @@
+import asyncio
+import re
+from types import SimpleNamespace
+
+from backend.services.ai_agent import GeminiAgent
+
+BODY = " ".join(["word"] * 60)
+
+
+def make_agent(client=None, min_words=20, threshold=0):
+    """GeminiAgent with only the polish settings (and optionally a fake client) set"""
+    agent = GeminiAgent.__new__(GeminiAgent)
+    agent.client = client
+    agent.model_name = "fake-model"
+    agent.polish_section_threshold = threshold
+    agent.polish_section_min_words = min_words
+    agent.polish_concurrency = 4
+    agent.polish_hedge_after = 0
+    return agent
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeCompletions:
+    """Polishes a section to 'Polished <heading>.' after a per-heading delay; failing headings break mid-stream"""
+
+    def __init__(self, delays=None, failing=()):
+        self.delays = delays or {}
+        self.failing = set(failing)
+
+    async def create(self, model, messages, stream=False):
+        name = re.search(r"^## (\w+)", messages[0]["content"], re.M).group(1)
+        if stream:
+            return self._stream(name)
+        await asyncio.sleep(self.delays.get(name, 0))
+        if name in self.failing:
+            raise RuntimeError("polish failed")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"Polished {name}."))])
+
+    async def _stream(self, name):
+        await asyncio.sleep(self.delays.get(name, 0))
+        yield chunk("Polished ")
+        if name in self.failing:
+            raise RuntimeError("stream dropped")
+        yield chunk(f"{name}.")
+
+
+def fake_client(**kwargs):
+    return SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(**kwargs)))
+
+
+def post(*names):
+    return "\n\n".join(f"## {name}\n{BODY}" for name in names)
+
+
+async def collect(stream):
+    return [item async for item in stream]
+
+
+def test_split_sections_on_headings():
+    sections = make_agent()._split_sections(f"Intro {BODY}\n# One\n{BODY}\n### Two\n{BODY}")
+
+    assert len(sections) == 3
+    assert sections[0].startswith("Intro")
+    assert sections[1].startswith("# One\n")
+    assert sections[2].startswith("### Two\n")
+
+
+def test_split_sections_ignores_headings_in_code_fences():
+    content = f"## One\n{BODY}\n```python\n# not a heading\nprint(1)\n```\n## Two\n{BODY}"
+
+    sections = make_agent()._split_sections(content)
+
+    assert len(sections) == 2
+    assert "# not a heading" in sections[0]
+    assert sections[1].startswith("## Two")
+
+
+def test_split_sections_merges_short_sections_into_the_next():
+    content = f"## Short\ntoo few words\n## Long\n{BODY}\n## Tail\n{BODY}"
+
+    sections = make_agent()._split_sections(content)
+
+    assert len(sections) == 2
+    assert sections[0].startswith("## Short\ntoo few words\n\n## Long")
+    assert sections[1].startswith("## Tail")
+
+
+def test_short_posts_are_polished_whole():
+    content = post("One", "Two", "Three")
+
+    assert make_agent(threshold=1000)._polish_sections(content) == [content]
+
+
+def test_failed_section_keeps_its_draft():
+    agent = make_agent(fake_client(failing={"Two"}))
+
+    polished = asyncio.run(agent.polish_with_gemini(post("One", "Two", "Three")))
+
+    assert polished == f"Polished One.\n\n## Two\n{BODY}\n\nPolished Three."
+
+
+def test_streamed_sections_are_emitted_in_document_order():
+    # The first section finishes last, so the others must buffer behind it
+    agent = make_agent(fake_client(delays={"One": 0.05, "Two": 0.01}))
+
+    items = asyncio.run(collect(agent.polish_with_gemini_stream(post("One", "Two", "Three"))))
+
+    deltas = "".join(item["delta"] for item in items if "delta" in item)
+    assert deltas == "Polished One.\n\nPolished Two.\n\nPolished Three."
+    assert items[-1] == {"text": deltas}
+
+
+def test_streamed_section_failure_keeps_its_draft_in_the_result():
+    agent = make_agent(fake_client(delays={"One": 0.02}, failing={"Two"}))
+
+    items = asyncio.run(collect(agent.polish_with_gemini_stream(post("One", "Two", "Three"))))
+
+    # "Polished " was already streamed for Two; the final text carries its draft instead
+    assert items[-1] == {"text": f"Polished One.\n\n## Two\n{BODY}\n\nPolished Three."}